@@ -1,53 +1,304 @@
 import os
+import json
+import argparse
+import hashlib
+import sqlite3
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import time
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+from datetime import datetime, timezone
 
 # URL of the webpage containing the PDF links
 url = 'https://www.archives.gov/research/jfk/release-2025'
 
 # Create a directory to save the downloaded PDFs
 output_dir = Path(__file__).resolve().parent.parent / 'corpus' / 'mlk_documents'
-output_dir.mkdir(parents=True, exist_ok=True)
 
-# Send a GET request to the webpage
-response = requests.get(url)
-response.raise_for_status()
+# Records URL, size, ETag/Last-Modified and SHA-256 of every downloaded file, kept next to the PDF directory
+MANIFEST_NAME = 'download_manifest.sqlite'
 
-# Parse the webpage content
-soup = BeautifulSoup(response.text, 'html.parser')
+# document_id -> original URL for every listed PDF, written next to the PDF directory on each run.
+# Later stages (e.g. web/mysql/import.py) join against it instead of rewriting documents to add URLs.
+URL_INDEX_NAME = 'document_urls.json'
 
-# Find all PDF links in the table
-pdf_links = soup.select('table a[href$=".pdf"]')
-base_url = 'https://www.archives.gov'
+# Download tuning
+MAX_WORKERS = 8             # Requests in flight at once (also the keep-alive pool size)
+REQUESTS_PER_SECOND = 0     # Start at most this many requests per second, 0 = unlimited
+CHUNK_SIZE = 1024 * 1024    # Bytes written to disk per chunk, keeps memory flat for large PDFs
+TIMEOUT = (10, 60)          # (connect, read) seconds
 
-print(f"Found {len(pdf_links)} PDF links.")
 
-for link in pdf_links:
-    relative_href = link['href']
-    pdf_url = base_url + relative_href
-    pdf_path = output_dir / Path(relative_href).name
+class RateLimiter:
+    """Spaces out request starts so at most `rate` begin per second across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_start = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DownloadManifest:
+    """SQLite manifest of downloaded files, safe to share between download threads."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                name TEXT PRIMARY KEY,
+                url TEXT,
+                size INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                sha256 TEXT,
+                complete INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+            """)
+
+    def get(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM files WHERE name=?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, name, url, size=None, etag=None, last_modified=None, sha256=None, complete=False):
+        with self.lock, self.conn:
+            self.conn.execute("""
+            INSERT INTO files (name, url, size, etag, last_modified, sha256, complete, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET url=excluded.url, size=excluded.size, etag=excluded.etag,
+                last_modified=excluded.last_modified, sha256=excluded.sha256,
+                complete=excluded.complete, updated_at=excluded.updated_at
+            """, (name, url, size, etag, last_modified, sha256, int(complete), time.time()))
+
+    def close(self):
+        self.conn.close()
+
+
+def sha256_file(path, hasher=None):
+    """Hash a file in chunks; pass `hasher` to keep feeding an existing hash object."""
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher
+
+
+def expected_size(response):
+    """Full size of the remote file, from Content-Range on 206 or Content-Length on 200."""
+    if response.status_code == 206:
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    if response.headers.get('Content-Encoding'):
+        return None  # iter_content decodes the body, so the header won't match bytes on disk
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def make_session(pool_size):
+    """Session with a bounded pool of keep-alive connections and retries on transient errors."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retries, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def find_pdf_links(session, page_url):
+    """Return absolute URLs of every PDF linked from the release table."""
+    response = session.get(page_url, timeout=TIMEOUT)
+    response.raise_for_status()
+
+    # Parse the webpage content
+    soup = BeautifulSoup(response.text, 'html.parser')
+
+    # Find all PDF links in the table
+    pdf_links = soup.select('table a[href$=".pdf"]')
+    return [urljoin(page_url, link['href']) for link in pdf_links]
+
+
+def document_id_from_url(pdf_url):
+    return os.path.splitext(os.path.basename(urlparse(pdf_url).path))[0]
+
+
+def write_url_index(pdf_urls, page_url, index_path):
+    """Writes the compact document_id -> URL index plus where and when the listing was fetched."""
+    index = {
+        "source": page_url,
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "count": len(pdf_urls),
+        "urls": {document_id_from_url(u): u for u in pdf_urls},
+    }
+    index_path = Path(index_path)
+    tmp_path = index_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+    print(f"🔗 Wrote {len(index['urls'])} document URLs to {index_path}")
+
+
+def download_pdf(session, limiter, manifest, pdf_url, pdf_path, revalidate=True, verify=False):
+    """Bring one PDF up to date with the server, moving only new or changed bytes.
+
+    Complete files known to the manifest are revalidated with a conditional GET,
+    partial `.part` files are resumed with a Range request, and the body is streamed
+    to disk in chunks. Returns a (status, bytes transferred) tuple.
+    """
+    name = pdf_path.name
+    part_path = pdf_path.with_name(name + '.part')
+    entry = manifest.get(name)
+    headers = {}
+    adopt = False
 
     if pdf_path.exists():
-        print(f"✅ Skipping {pdf_path.name}, already downloaded.")
-        continue
+        local_size = pdf_path.stat().st_size
+        if entry and entry['complete'] and entry['size'] == local_size:
+            if verify and sha256_file(pdf_path).hexdigest() != entry['sha256']:
+                print(f"⚠️  {name} failed checksum verification, downloading again.")
+            elif not revalidate:
+                return 'unchanged', 0
+            else:
+                if entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry['last_modified']:
+                    headers['If-Modified-Since'] = entry['last_modified']
+        elif not entry:
+            # Downloaded before the manifest existed: keep it if the server agrees on the size
+            adopt = True
+    elif part_path.exists() and entry and not entry['complete'] and (entry['etag'] or entry['last_modified']):
+        headers['Range'] = f"bytes={part_path.stat().st_size}-"
+        headers['If-Range'] = entry['etag'] or entry['last_modified']
 
-    try:
-        print(f"⬇️  Downloading {pdf_path.name}...")
-        pdf_response = requests.get(pdf_url)
+    limiter.wait()
+    with session.get(pdf_url, headers=headers, stream=True, timeout=TIMEOUT) as pdf_response:
+        if pdf_response.status_code == 304:
+            return 'unchanged', 0
+        if pdf_response.status_code == 416:
+            # The partial file no longer fits the remote one, start over. Release this response's
+            # connection first: the pool blocks at one connection per worker, so retrying while
+            # holding it could wait forever when every worker hits a 416 at once
+            pdf_response.close()
+            part_path.unlink(missing_ok=True)
+            manifest.record(name, pdf_url)
+            return download_pdf(session, limiter, manifest, pdf_url, pdf_path, revalidate, verify)
         pdf_response.raise_for_status()
-        
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_response.content)
 
-        print(f"✅ {pdf_path.name} downloaded successfully.")
-    except Exception as e:
-        print(f"❌ Failed to download {pdf_url}: {e}")
+        etag = pdf_response.headers.get('ETag')
+        last_modified = pdf_response.headers.get('Last-Modified')
+        total = expected_size(pdf_response)
+
+        if adopt and total == local_size:
+            digest = sha256_file(pdf_path).hexdigest()
+            manifest.record(name, pdf_url, local_size, etag, last_modified, digest, complete=True)
+            return 'unchanged', 0
+
+        resumed = pdf_response.status_code == 206
+        hasher = sha256_file(part_path) if resumed else hashlib.sha256()
+        size = part_path.stat().st_size if resumed else 0
+        transferred = 0
+
+        # Remember the validators before streaming so an interrupted download can resume
+        manifest.record(name, pdf_url, None, etag, last_modified)
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in pdf_response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    transferred += len(chunk)
+        size += transferred
+
+    if total is not None and size != total:
+        raise IOError(f"incomplete download ({size} of {total} bytes), will resume on next run")
+
+    os.replace(part_path, pdf_path)
+    manifest.record(name, pdf_url, size, etag, last_modified, hasher.hexdigest(), complete=True)
+    return ('resumed' if resumed else 'downloaded'), transferred
+
+
+def download_all(page_url=url, out_dir=output_dir, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                 manifest_file=None, revalidate=True, verify=False, url_index=None, links_only=False):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = manifest_file or out_dir.parent / MANIFEST_NAME
+
+    session = make_session(max_workers)
+    pdf_urls = find_pdf_links(session, page_url)
+    print(f"Found {len(pdf_urls)} PDF links.")
+    write_url_index(pdf_urls, page_url, url_index or out_dir.parent / URL_INDEX_NAME)
+    if links_only:
+        session.close()
+        return
+
+    limiter = RateLimiter(rate)
+    manifest = DownloadManifest(manifest_file)
 
-    #time.sleep(0.01)  # Be polite to the server
+    started = time.monotonic()
+    total_bytes = 0
+    counts = {'downloaded': 0, 'resumed': 0, 'unchanged': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for pdf_url in pdf_urls:
+            pdf_path = out_dir / Path(pdf_url).name
+            fut = executor.submit(download_pdf, session, limiter, manifest, pdf_url, pdf_path, revalidate, verify)
+            futures[fut] = (pdf_url, pdf_path)
+        for fut in as_completed(futures):
+            pdf_url, pdf_path = futures[fut]
+            try:
+                status, transferred = fut.result()
+                counts[status] += 1
+                total_bytes += transferred
+                if status == 'unchanged':
+                    print(f"✅ Skipping {pdf_path.name}, unchanged.")
+                else:
+                    print(f"✅ {pdf_path.name} {status} successfully.")
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"❌ Failed to download {pdf_url}: {e}")
 
-print("🎉 All PDFs have been processed.")
+    elapsed = time.monotonic() - started
+    mb = total_bytes / (1024 * 1024)
+    print(f"⬇️  {counts['downloaded']} downloaded, {counts['resumed']} resumed, {counts['unchanged']} unchanged, "
+          f"{counts['failed']} failed; {mb:.1f} MB in {elapsed:.1f}s ({mb / elapsed if elapsed else 0:.1f} MB/s)")
+    manifest.close()
+    session.close()
 
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the release PDFs listed on the archives.gov page.")
+    parser.add_argument('--url', default=url, help="Page listing the PDFs (point at a local server for testing)")
+    parser.add_argument('--output-dir', type=Path, default=output_dir)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Concurrent requests / pooled connections")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="Max requests started per second (0 = unlimited)")
+    parser.add_argument('--manifest', type=Path, help=f"Defaults to {MANIFEST_NAME} next to the output directory")
+    parser.add_argument('--no-revalidate', action='store_true',
+                        help="Trust complete manifest entries without asking the server if they changed")
+    parser.add_argument('--verify', action='store_true', help="Re-hash local files against the manifest SHA-256")
+    parser.add_argument('--url-index', type=Path, help=f"Defaults to {URL_INDEX_NAME} next to the output directory")
+    parser.add_argument('--links-only', action='store_true', help="Only refresh the document URL index")
+    args = parser.parse_args()
 
+    download_all(args.url, args.output_dir, args.workers, args.rate,
+                 args.manifest, not args.no_revalidate, args.verify, args.url_index, args.links_only)
+    print("🎉 All PDFs have been processed.")
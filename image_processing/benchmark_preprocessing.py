@@ -0,0 +1,103 @@
+import argparse
+import time
+import logging
+import random
+from pathlib import Path
+import cv2
+import numpy as np
+from img_to_text_v2 import (IMAGE_DIR, PreprocessBuffers, deskew, deskew_fast, preprocess_image_fast,
+                            preprocess_image_for_ocr)
+
+# Compares the original preprocess_image_for_ocr with preprocess_image_fast stage by stage
+# on a sample of page images. No OCR is run, so Tesseract doesn't need to be installed.
+#
+#   python benchmark_preprocessing.py --limit 50 --deskew
+#   python benchmark_preprocessing.py --image-dir /path/to/sample_pages
+
+STAGES = ['read', 'grayscale', 'deskew', 'denoise', 'contrast', 'sharpen', 'threshold']
+
+
+def list_images(image_dir, limit, seed):
+    images = sorted(f for f in Path(image_dir).iterdir()
+                    if f.is_file() and f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff'])
+    if limit and len(images) > limit:
+        images = sorted(random.Random(seed).sample(images, limit))
+    return images
+
+
+def run_pipeline(images, pipeline, **params):
+    """Runs one pipeline over every image. Returns (per-stage seconds, total seconds, outputs)."""
+    timings = {}
+    outputs = []
+    start = time.perf_counter()
+    for image_path in images:
+        binary = pipeline(image_path, timings=timings, **params)
+        # The fast pipeline's output buffer is reused, keep a copy for the comparison
+        outputs.append(None if binary is None else binary.copy())
+    return timings, time.perf_counter() - start, outputs
+
+
+def time_deskew_estimators(images):
+    """Times the original full-resolution deskew against the fast estimator on the same grayscale pages."""
+    legacy, fast = 0.0, 0.0
+    for image_path in images:
+        gray = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        start = time.perf_counter()
+        deskew(gray)
+        legacy += time.perf_counter() - start
+        start = time.perf_counter()
+        deskew_fast(gray)
+        fast += time.perf_counter() - start
+    return legacy, fast
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage timing of the original vs fast preprocessing.")
+    parser.add_argument('--image-dir', type=Path, default=IMAGE_DIR)
+    parser.add_argument('--limit', type=int, default=50, help="Random sample size (0 = all images)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--deskew', action='store_true', help="Include deskew in both pipelines")
+    parser.add_argument('--denoise', action='store_true', help="Include median blur in both pipelines")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    images = list_images(args.image_dir, args.limit, args.seed)
+    if not images:
+        print(f"No images found in {args.image_dir}")
+        return
+    params = {"apply_deskew": args.deskew, "apply_noise_reduction": args.denoise}
+
+    legacy_timings, legacy_total, legacy_out = run_pipeline(images, preprocess_image_for_ocr, **params)
+    fast_timings, fast_total, fast_out = run_pipeline(images, preprocess_image_fast,
+                                                      buffers=PreprocessBuffers(), **params)
+
+    n = len(images)
+    print(f"\n{n} pages from {args.image_dir}\n")
+    print(f"{'stage':<12}{'original ms/page':>18}{'fast ms/page':>15}{'speedup':>10}")
+    for stage in STAGES:
+        if stage not in legacy_timings and stage not in fast_timings:
+            continue
+        legacy_ms = legacy_timings.get(stage, 0.0) / n * 1000
+        fast_ms = fast_timings.get(stage, 0.0) / n * 1000
+        speedup = f"{legacy_ms / fast_ms:.1f}x" if fast_ms else "-"
+        print(f"{stage:<12}{legacy_ms:>18.2f}{fast_ms:>15.2f}{speedup:>10}")
+    print(f"{'total':<12}{legacy_total / n * 1000:>18.2f}{fast_total / n * 1000:>15.2f}"
+          f"{legacy_total / fast_total if fast_total else 0:>9.1f}x")
+    print(f"\nPages/sec: original {n / legacy_total:.1f}, fast {n / fast_total:.1f}")
+
+    # How close the outputs are (they differ slightly in grayscale decode and, with deskew, rotation angle)
+    agreement = [np.mean(a == b) for a, b in zip(legacy_out, fast_out)
+                 if a is not None and b is not None and a.shape == b.shape]
+    if agreement:
+        print(f"Binary output pixel agreement: mean {np.mean(agreement):.4f}, min {np.min(agreement):.4f}")
+
+    if args.deskew:
+        legacy_deskew, fast_deskew = time_deskew_estimators(images)
+        print(f"Deskew only: original {legacy_deskew / n * 1000:.1f} ms/page, "
+              f"fast {fast_deskew / n * 1000:.1f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
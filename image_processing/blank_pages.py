@@ -0,0 +1,108 @@
+import argparse
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+
+# --- Blank / near-blank page detection ---
+#
+# Blank backs, empty cover sheets and the like are recognised before any preprocessing or
+# OCR from a small downsampled copy of the page: ink density from the histogram plus the
+# number of text-sized connected components. The OCR scripts write a stub JSON for these
+# pages so document page numbering stays intact.
+#
+#   python blank_pages.py --image-dir ../corpus/jfk_documents_imgs   (report only)
+
+CLASSIFY_MAX_DIM = 600        # Longest side of the copy the page is classified on
+MARGIN = 0.04                 # Fraction trimmed from each edge (scanner borders, punch holes)
+INK_LEVEL = 160               # Gray level below which a pixel counts as ink
+BLANK_MAX_INK = 0.0015        # Ink fraction of a blank page
+BLANK_MAX_COMPONENTS = 4      # Text-sized specks allowed on a blank page
+NEAR_BLANK_MAX_INK = 0.006
+NEAR_BLANK_MAX_COMPONENTS = 25
+MIN_COMPONENT_AREA = 3        # Pixels at classification size; smaller specks are scanner noise
+
+BLANK = 'blank'
+NEAR_BLANK = 'near_blank'
+CONTENT = 'content'
+
+
+def classify_page(gray, max_dim=CLASSIFY_MAX_DIM):
+    """Classifies a grayscale (or BGR) page as blank, near_blank or content.
+
+    Returns (class, stats) where stats holds the ink fraction and component count.
+    """
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_dim / max(h, w))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    mh, mw = int(small.shape[0] * MARGIN), int(small.shape[1] * MARGIN)
+    small = small[mh:small.shape[0] - mh, mw:small.shape[1] - mw]
+
+    histogram = np.bincount(small.ravel(), minlength=256)
+    ink_fraction = float(histogram[:INK_LEVEL].sum()) / max(small.size, 1)
+
+    components = 0
+    if ink_fraction <= NEAR_BLANK_MAX_INK:
+        # Only pages that are already nearly empty need the (still cheap) component count
+        ink = (small < INK_LEVEL).astype(np.uint8)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        areas = stats[1:, cv2.CC_STAT_AREA]  # Row 0 is the background
+        components = int(np.count_nonzero(areas >= MIN_COMPONENT_AREA))
+
+    stats = {"ink_fraction": round(ink_fraction, 5), "components": components}
+    if ink_fraction <= BLANK_MAX_INK and components <= BLANK_MAX_COMPONENTS:
+        return BLANK, stats
+    if ink_fraction <= NEAR_BLANK_MAX_INK and components <= NEAR_BLANK_MAX_COMPONENTS:
+        return NEAR_BLANK, stats
+    return CONTENT, stats
+
+
+def should_skip(page_class, skip_near_blank=False):
+    return page_class == BLANK or (skip_near_blank and page_class == NEAR_BLANK)
+
+
+class BlankPageStats:
+    """Counts skipped pages and estimates the OCR time they would have cost."""
+
+    def __init__(self):
+        self.skipped = 0
+        self.ocr_pages = 0
+        self.ocr_seconds = 0.0
+
+    def add(self, skipped, seconds):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.ocr_pages += 1
+            self.ocr_seconds += seconds
+
+    def summary(self):
+        total = self.skipped + self.ocr_pages
+        per_page = self.ocr_seconds / self.ocr_pages if self.ocr_pages else 0.0
+        return (f"Blank pages skipped: {self.skipped}/{total} ({self.skipped / total if total else 0:.1%}), "
+                f"estimated OCR time saved: {self.skipped * per_page:.1f}s ({per_page:.2f}s per OCR'd page)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report blank and near-blank pages in an image directory.")
+    parser.add_argument('--image-dir', type=Path, default=(Path.cwd().parent / 'corpus' / 'jfk_documents_imgs').resolve())
+    parser.add_argument('--list', action='store_true', help="Print every non-content page")
+    args = parser.parse_args()
+
+    counts = {BLANK: 0, NEAR_BLANK: 0, CONTENT: 0}
+    start = time.perf_counter()
+    images = sorted(f for f in args.image_dir.iterdir() if f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff'])
+    for image_path in images:
+        gray = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        page_class, stats = classify_page(gray)
+        counts[page_class] += 1
+        if args.list and page_class != CONTENT:
+            print(f"{page_class:<11}{image_path.name}  ink={stats['ink_fraction']} components={stats['components']}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(images)} pages in {elapsed:.1f}s: {counts[BLANK]} blank, {counts[NEAR_BLANK]} near blank, "
+          f"{counts[CONTENT]} content")
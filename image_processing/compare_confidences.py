@@ -1,150 +1,225 @@
 import os
+import csv
 import json
-import cv2
-import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
-import pytesseract
-import platform
+import time
+import argparse
 from pathlib import Path
-import sys
-from statistics import median
-
-
-
-def get_file_contents(json_dir, file_path):
-    with open(json_dir / file_path, 'r') as file:
-        return json.load(file)
-
-# Only set path manually if needed (e.g., not in PATH)
-if platform.system() == 'Windows':
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-elif platform.system() == 'Darwin':  # macOS
-    pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'  # or /usr/local/bin
-elif platform.system() == 'Linux':
-    pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
+try:
+    import orjson  # Several times faster than json for page-sized documents
+    def load_json(path):
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+except ImportError:
+    def load_json(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rapidfuzz_levenshtein
+except ImportError:
+    _rapidfuzz_levenshtein = None
+
+# --- OCR run comparator ---
+#
+# Compares two or more OCR output directories page by page: confidence statistics for each
+# run and the character error rate of every run against the first one (the reference).
+# Pages are read in parallel and the per-page results are written as a columnar report
+# (CSV, or Parquet when the output ends in .parquet and pyarrow is installed).
+#
+#   python compare_confidences.py ../corpus/jfk_documents_json_v1 ../corpus/jfk_documents_json_v2
+#   python compare_confidences.py v1 v2 cascade --report compare.parquet
 
 JSON_DIR_1 = (Path.cwd().parent / 'corpus' / 'jfk_documents_json_v1').resolve()
-JSON_DIR_2 =  (Path.cwd().parent / 'corpus' / 'jfk_documents_json_v2').resolve()
-
-
-
-
-json_files_1 = sorted([
-    f for f in os.listdir(JSON_DIR_1)
-    if f.lower().endswith('.json') and not f.lower().startswith(".")
-])
-
-json_files_2 = sorted([
-    f for f in os.listdir(JSON_DIR_2)
-    if f.lower().endswith('.json') and not f.lower().startswith(".")
-])
-
-file_mapping = {}
-
-for i in range(len(json_files_1)):
-    j1 = json_files_1[i]
-    j2 = json_files_2[i]
-    if os.path.basename(j1) != os.path.basename(j2):
-        break
-    file_mapping[j1] = j2
-
-if len(file_mapping) != len(json_files_1):
-    print("Unmatched files in sorting")
-    sys.exit(1)
-
-
-
-# {
-#   "filename": "104-10004-10213_page_0003.png",
-#   "text": "13-00000\n\n* 6. In response ty a question from Mr. Slawsoa I stated that most\nof the'26 cases upon which we based Gur statements involved foreign\n’ students, exchange teachers and other relatively transient persons,\n- and while a number of cases have certain points is common, they bear\n* Little similarity to the OSWALD case in that none involved a defector who -\n‘married prior to repatriating. I noted that paragraph 6 of our 6 April\n1964 memorandum to the Commission had pointed this out. Mr. Slawson\n‘indicated that hg was now satisfied on this matter. ‘\n\n‘9. Concerning the length of time taken by Soviet authorities to\nprocess exit visas for Suvict citizens married to foreign nationals\n(question 3c above), I stated that, in my upinion, the information\nprovided by State (in the third enclosure to Mr. Meeker's letter)\nsubstantially corresponded to the views expressed in paragraphs 6 and 7\nof our memorandum to the Commission dated 6 April 1964. Mr. Slawson\nasked if it would be possible to elaborate paragraph 7 of our memorandum\nof 6 April by providing 2 statistical breakdown of the cases on which our\nstatements were based. ] indicated that this could be done.\n\n8. At this point Mr. Slawson stated that as a result of our discussion\n\nhe felt that the question of possible inconsistenciés had been resolved.\n\n- However, he asked that «e send a brief written reply to the Commission's\nletter of 3 July 1964 embodying the substance of what [had said concerning\nthe basis for staternente included in our 6 April 1965 memorandum. [This\nwould include the gist of the draft reply to the Commission which I showed\nto C/SR on 8 July plus an elaboration of our statements concerning Soviet\n\nvisa applications. ]\n\n9. Mr. Slawson indicated that he would be sending parts of his report\ndealing with the Sovict inteHigence services to CIA for checking as to\ntheir accuracy. ‘He did nut say when this would ocaar.\n\n10. After concluding the meeting with Mr. Slawson, I yead Volume 52\nof the transcript cf testimony before the Commissiom. TjGs included the\nreinterview of Marina OSWALD.\n\nt-\n\n‘Lee H. Wigren\nC/SR/Ci/Research",
-#   "metadata": {
-#     "page_number": 12,
-#     "dimensions": [
-#       2544,
-#       3319
-#     ],
-#     "avg_confidence": 0.899,
-#     "median_confidence": 0.95,
-#     "ocr_engine": "Tesseract 5.5.0",
-#     "tesseract_config": "-l eng --oem 3 --psm 3"
-#   }    
-
-
-avg_confidence_j1_sum = 0.0
-avg_confidence_j2_sum = 0.0
-median_confidence_j1_array = []
-median_confidence_j2_array = []
-j1_avg_beats = 0
-j2_avg_beats = 0
-avg_equal = 0
-
-for count, (j1, j2) in enumerate(file_mapping.items(), start=1):
-    j1_json = get_file_contents(JSON_DIR_1, j1)
-    j2_json = get_file_contents(JSON_DIR_2, j2)
-
-    j1_conf = j1_json["metadata"]["confidence"]
-    j2_conf = j2_json["metadata"]["confidence"]
-
-    avg_confidence_j1_sum += j1_conf
-    avg_confidence_j2_sum += j2_conf
-
-    median_confidence_j1_array.append(j1_conf)
-    median_confidence_j2_array.append(j2_conf)
-
-    if j1_conf > j2_conf:
-        j1_avg_beats += 1
-    elif j1_conf < j2_conf:
-        j2_avg_beats += 1
+JSON_DIR_2 = (Path.cwd().parent / 'corpus' / 'jfk_documents_json_v2').resolve()
+
+WORKERS = os.cpu_count() or 1
+PAGES_PER_TASK = 500
+
+
+def list_pages(json_dir):
+    with os.scandir(json_dir) as entries:
+        return {e.name for e in entries
+                if e.name.lower().endswith('.json') and not e.name.startswith('.') and e.is_file()}
+
+
+def page_confidence(metadata):
+    """Page confidence from either layout: "confidence" (v1, PaddleOCR) or "avg_confidence" (v2, cascade)."""
+    value = metadata.get("confidence", metadata.get("avg_confidence"))
+    return float(value) if value is not None else np.nan
+
+
+def normalize_text(text):
+    """Collapses whitespace so layout-only differences don't count as character errors."""
+    return " ".join(text.split())
+
+
+def levenshtein(a, b):
+    """Edit distance between two strings.
+
+    Uses rapidfuzz when installed, otherwise the bit-parallel algorithm of Myers/Hyyrö with
+    Python integers as bit vectors (one pass over b, a few big-integer ops per character).
+    """
+    if _rapidfuzz_levenshtein is not None:
+        return _rapidfuzz_levenshtein.distance(a, b)
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    m = len(a)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
+
+
+def compare_chunk(json_dirs, names):
+    """Worker task: loads one chunk of pages from every run. Returns a dict of column lists."""
+    runs = len(json_dirs)
+    columns = {"page": list(names)}
+    for r in range(runs):
+        columns[f"confidence_{r}"] = []
+        columns[f"median_confidence_{r}"] = []
+        columns[f"chars_{r}"] = []
+        if r:
+            columns[f"cer_{r}"] = []
+
+    for name in names:
+        texts = []
+        for r, json_dir in enumerate(json_dirs):
+            try:
+                page = load_json(os.path.join(json_dir, name))
+                metadata = page.get("metadata", {})
+                confidence = page_confidence(metadata)
+                median = float(metadata.get("median_confidence", np.nan))
+                text = normalize_text(page.get("text") or "")
+            except (OSError, ValueError) as e:
+                print(f"Could not read {name} in {json_dir}: {e}")
+                confidence, median, text = np.nan, np.nan, None
+            columns[f"confidence_{r}"].append(confidence)
+            columns[f"median_confidence_{r}"].append(median)
+            columns[f"chars_{r}"].append(len(text) if text is not None else -1)
+            texts.append(text)
+
+        reference = texts[0]
+        for r in range(1, runs):
+            if reference is None or texts[r] is None:
+                cer = np.nan
+            else:
+                cer = levenshtein(reference, texts[r]) / max(len(reference), 1)
+            columns[f"cer_{r}"].append(cer)
+    return columns
+
+
+def compare_runs(json_dirs, workers=WORKERS, pages_per_task=PAGES_PER_TASK):
+    """Compares the pages present in every run. Returns (columns as NumPy arrays, unmatched page counts)."""
+    page_sets = [list_pages(d) for d in json_dirs]
+    common = sorted(set.intersection(*page_sets))
+    unmatched = [len(pages) - len(common) for pages in page_sets]
+
+    chunks = [common[i:i + pages_per_task] for i in range(0, len(common), pages_per_task)]
+    dirs = [str(d) for d in json_dirs]
+    merged = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for columns in executor.map(compare_chunk, [dirs] * len(chunks), chunks):
+            for key, values in columns.items():
+                merged.setdefault(key, []).extend(values)
+
+    arrays = {key: np.array(values, dtype=object if key == "page" else np.float64)
+              for key, values in merged.items()}
+    return arrays, unmatched
+
+
+def summarize(arrays, json_dirs):
+    """Prints exact aggregate statistics per run and each run against the reference."""
+    n = len(arrays.get("page", []))
+    print(f"\n{n} pages present in all {len(json_dirs)} runs\n")
+    print(f"{'run':<40}{'mean':>8}{'median':>8}{'p10':>8}{'p90':>8}{'std':>8}{'missing':>9}")
+    for r, json_dir in enumerate(json_dirs):
+        conf = arrays[f"confidence_{r}"]
+        valid = conf[~np.isnan(conf)]
+        if valid.size:
+            p10, median, p90 = np.percentile(valid, [10, 50, 90])
+            print(f"{Path(json_dir).name[:39]:<40}{valid.mean():>8.4f}{median:>8.4f}{p10:>8.4f}{p90:>8.4f}"
+                  f"{valid.std():>8.4f}{n - valid.size:>9}")
+        else:
+            print(f"{Path(json_dir).name[:39]:<40}{'no confidence values':>40}")
+
+    reference = arrays["confidence_0"]
+    for r in range(1, len(json_dirs)):
+        conf = arrays[f"confidence_{r}"]
+        both = ~np.isnan(reference) & ~np.isnan(conf)
+        wins = int(np.count_nonzero(conf[both] > reference[both]))
+        losses = int(np.count_nonzero(conf[both] < reference[both]))
+        cer = arrays[f"cer_{r}"]
+        cer = cer[~np.isnan(cer)]
+        print(f"\n{Path(json_dirs[r]).name} vs {Path(json_dirs[0]).name}:")
+        print(f"  higher confidence on {wins} pages, lower on {losses}, tied on {int(both.sum()) - wins - losses}")
+        if cer.size:
+            print(f"  CER mean {cer.mean():.4f}, median {np.median(cer):.4f}, p90 {np.percentile(cer, 90):.4f}, "
+                  f"identical text on {int(np.count_nonzero(cer == 0))} pages")
+
+
+def write_report(arrays, path):
+    """Writes the per-page columns as Parquet (for .parquet paths) or CSV."""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({key: (values.astype(str) if key == "page" else values) for key, values in arrays.items()})
+        pq.write_table(table, path, compression='zstd')
+        return
+    keys = list(arrays)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        writer.writerows(zip(*(arrays[k] for k in keys)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare OCR output directories: confidence statistics and CER.")
+    parser.add_argument('json_dirs', nargs='*', type=Path, default=[JSON_DIR_1, JSON_DIR_2],
+                        help="Two or more page JSON directories; the first is the reference for CER")
+    parser.add_argument('--report', type=Path, default=None, help="Per-page report (.csv or .parquet)")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--pages-per-task', type=int, default=PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    if len(args.json_dirs) < 2:
+        parser.error("need at least two directories to compare")
+    for json_dir in args.json_dirs:
+        if not json_dir.is_dir():
+            parser.error(f"not a directory: {json_dir}")
+
+    start = time.perf_counter()
+    arrays, unmatched = compare_runs(args.json_dirs, args.workers, args.pages_per_task)
+    for json_dir, count in zip(args.json_dirs, unmatched):
+        if count:
+            print(f"{count} pages in {json_dir} are missing from another run and were not compared")
+    if not arrays:
+        print("No pages in common.")
     else:
-        avg_equal += 1
-
-    if count % 100 == 0:
-        print(f"Processed {count} files")
-
-        
-
-
-
-
-j1_overall_avg = avg_confidence_j1_sum/num_files
-j1_overall_median = median_confidence_j1_array[num_files/2]
-
-j2_overall_avg = avg_confidence_j2_sum/num_files
-j2_overall_median = median_confidence_j2_array[num_files/2]
-
-
-print("J1 Overall Median")
-print(j1_overall_median)
-print("J2 Overall Median")
-print(j2_overall_median)
-
-print()
-
-print("J1 Overall Avg")
-print(j1_overall_avg)
-print("J2 Overall Avg")
-print(j2_overall_avg)
-
-print()
-print()
-
-print("J1 Beats J2")
-print("Avg")
-print(j1_avg_beats)
-
-print()
-
-print("J2 Beats J1")
-print("Avg")
-print(j1_avg_beats)
-
-print()
-
-print("Tied")
-print("Avg")
-print(avg_equal)
-
-
-
-
+        summarize(arrays, args.json_dirs)
+        if args.report:
+            write_report(arrays, args.report)
+            print(f"\nPer-page report written to {args.report}")
+    print(f"\nCompared in {time.perf_counter() - start:.1f}s")
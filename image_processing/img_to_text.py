@@ -3,17 +3,21 @@ import json
 import cv2
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
-import pytesseract
-import platform
 from pathlib import Path
+from ocr_engines import DEFAULT_ENGINE, get_engine
+from ocr_cache import cache_key, get_cache, source_digest
 
-# Only set path manually if needed (e.g., not in PATH)
-if platform.system() == 'Windows':
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-elif platform.system() == 'Darwin':  # macOS
-    pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'  # or /usr/local/bin
-elif platform.system() == 'Linux':
-    pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
+# 'auto' uses the persistent in-process tesserocr backend when installed, otherwise pytesseract
+OCR_ENGINE = DEFAULT_ENGINE
+# Reuse OCR results for unchanged pages from the content-addressed cache (see ocr_cache.py)
+USE_CACHE = True
+
+# enhance_image settings (also part of the OCR cache key)
+ENHANCE_PARAMS = {
+    "contrast": 2.0,
+    "brightness": 1.2,
+    "max_dimension": 2000,  # Larger images are halved
+}
 
 
 # Directories
@@ -28,13 +32,13 @@ def enhance_image(image_path):
     # Enhance image
     img = img.filter(ImageFilter.SHARPEN)
     enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(2.0)
+    img = enhancer.enhance(ENHANCE_PARAMS["contrast"])
     enhancer = ImageEnhance.Brightness(img)
-    img = enhancer.enhance(1.2)
+    img = enhancer.enhance(ENHANCE_PARAMS["brightness"])
     
     # Resize if needed
     width, height = img.size
-    if max(width, height) > 2000:
+    if max(width, height) > ENHANCE_PARAMS["max_dimension"]:
         img = img.resize((width//2, height//2), Image.LANCZOS)
     
     return img
@@ -42,16 +46,23 @@ def enhance_image(image_path):
 def process_image(image_path, page_number):
     """Process image with Tesseract OCR"""
     try:
+        # Use Tesseract with optimized parameters
+        custom_config = '--oem 3 --psm 6'
+        engine = get_engine(OCR_ENGINE, custom_config)
+
+        key = None
+        if USE_CACHE:
+            cache = get_cache()
+            key = cache_key(source_digest(image_path), engine.name, engine.version, ENHANCE_PARAMS, custom_config)
+            cached = cache.get(key)
+            if cached:
+                cached["metadata"]["page_number"] = page_number
+                return cached
+
         img = enhance_image(image_path)
         width, height = img.size
         
-        # Use Tesseract with optimized parameters
-        custom_config = '--oem 3 --psm 6'
-        data = pytesseract.image_to_data(
-            img,
-            config=custom_config,
-            output_type=pytesseract.Output.DICT
-        )
+        data = engine.image_to_data(img)
         
         # Process results
         all_text = []
@@ -66,7 +77,7 @@ def process_image(image_path, page_number):
         
         avg_confidence = round(np.mean(confidences).item(), 4) if confidences else 0.0
         
-        return {
+        result = {
             "filename": os.path.basename(image_path),
             "text": "\n".join(all_text),
             "metadata": {
@@ -77,6 +88,9 @@ def process_image(image_path, page_number):
                 "text_blocks": len(all_text)
             }
         }
+        if key:
+            cache.put(key, result)
+        return result
     
     except Exception as e:
         print(f"Error processing {image_path}: {str(e)}")
@@ -5,37 +5,40 @@ import numpy as np
 from PIL import Image
 # Removed PIL ImageEnhance and ImageFilter as we'll use OpenCV
 import pytesseract
-import platform
 from pathlib import Path
 import math
+import time
 import logging
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ocr_engines import DEFAULT_ENGINE, ENGINES, get_engine
+from pdf_to_images import PdfPage, RENDER_DPI, list_pdf_pages, render_page
+from ocr_cache import CACHE_PATH, MAX_CACHE_BYTES, cache_key, get_cache, source_digest
+from blank_pages import BlankPageStats, classify_page, should_skip
 
 # --- Configuration ---
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Tesseract Path (keep your existing logic)
-try:
-    if platform.system() == 'Windows':
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    elif platform.system() == 'Darwin':
-        # Common paths on macOS, adjust if necessary
-        possible_paths = ['/opt/homebrew/bin/tesseract', '/usr/local/bin/tesseract']
-        tess_path = next((path for path in possible_paths if Path(path).exists()), None)
-        if not tess_path:
-            raise FileNotFoundError("Tesseract executable not found in common paths.")
-        pytesseract.pytesseract.tesseract_cmd = tess_path
-    elif platform.system() == 'Linux':
-        pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract' # Common path on Linux
-    # Verify Tesseract version or command
-    tess_version_info = pytesseract.get_tesseract_version()
-    logging.info(f"Using Tesseract version: {tess_version_info}")
-except Exception as e:
-    logging.error(f"Error setting or finding Tesseract path: {e}")
-    logging.warning("Ensure Tesseract is installed and the path is correct.")
-    # Exit or handle error appropriately if Tesseract is essential
-    exit(1)
+# OCR engine backend (see ocr_engines.py): 'tesserocr' keeps one Tesseract instance loaded per
+# process, 'pytesseract' runs the tesseract executable per call, 'auto' prefers the former.
+OCR_ENGINE = DEFAULT_ENGINE
+
+# --- Tesseract Configuration ---
+# --psm 3: Fully automatic page segmentation (usually best default)
+# --psm 4: Assume a single column of text of variable sizes.
+# --psm 6: Assume a single uniform block of text. (Your original, can be good for simple docs)
+# --psm 11: Sparse text. Find as much text as possible in no particular order.
+# --psm 12: Sparse text with OSD.
+# Choose the PSM that best fits your document types. Start with 3.
+# Specify language ('eng' for English). Install language packs if needed (e.g., 'sudo apt-get install tesseract-ocr-eng')
+# OEM 3 is the default LSTM engine, usually the best.
+TESSERACT_CONFIG = r'-l eng --oem 3 --psm 3' # Changed PSM to 3
 
 
 # Directories
@@ -51,6 +54,19 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # --- Image Preprocessing Functions ---
 
+@contextmanager
+def stage_timer(timings, stage):
+    """Adds the time spent in the block to timings[stage] (no-op when timings is None)."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
 def deskew(image_cv):
     """Deskews an image using cv2."""
     gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY) if len(image_cv.shape) == 3 else image_cv
@@ -106,38 +122,50 @@ def preprocess_image_for_ocr(image_path, save_intermediate=False, filename="",
                              noise_kernel_size=3,
                              # --- Binarization Parameters ---
                              adaptive_thresh_block_size=31, # Must be odd
-                             adaptive_thresh_C=10
+                             adaptive_thresh_C=10,
+                             timings=None # Optional dict that collects seconds per stage
                             ):
-    """Advanced image preprocessing for Tesseract using OpenCV with enhancement."""
+    """Advanced image preprocessing for Tesseract using OpenCV with enhancement.
+
+    `image_path` may also be an already decoded grayscale (or BGR) array, which skips the read.
+    """
     try:
         # Read with OpenCV
-        img_cv = cv2.imread(str(image_path))
+        with stage_timer(timings, 'read'):
+            img_cv = image_path if isinstance(image_path, np.ndarray) else cv2.imread(str(image_path))
         if img_cv is None:
             logging.error(f"Could not read image: {image_path}")
             return None
 
         # 1. Convert to Grayscale
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+        if img_cv.ndim == 3:
+            with stage_timer(timings, 'grayscale'):
+                gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = img_cv
         processed = gray # Start with grayscale image
 
         # 2. Optional: Deskewing
         if apply_deskew:
             logging.debug("Applying Deskew...")
-            processed = deskew(processed)
+            with stage_timer(timings, 'deskew'):
+                processed = deskew(processed)
 
         # 3. Optional: Noise Removal (Median Blur) - Apply early before enhancements amplify noise
         if apply_noise_reduction:
             logging.debug(f"Applying Median Blur with kernel size {noise_kernel_size}...")
             # Kernel size must be odd
             k_size = noise_kernel_size if noise_kernel_size % 2 != 0 else noise_kernel_size + 1
-            processed = cv2.medianBlur(processed, k_size)
+            with stage_timer(timings, 'denoise'):
+                processed = cv2.medianBlur(processed, k_size)
 
         # 4. Optional: Contrast and Brightness Adjustment
         if apply_contrast_brightness:
             logging.debug(f"Applying Contrast (Alpha={contrast_alpha}) and Brightness (Beta={brightness_beta})...")
             # Apply contrast/brightness: output = alpha * input + beta
             # cv2.convertScaleAbs handles potential clipping (values < 0 or > 255)
-            processed = cv2.convertScaleAbs(processed, alpha=contrast_alpha, beta=brightness_beta)
+            with stage_timer(timings, 'contrast'):
+                processed = cv2.convertScaleAbs(processed, alpha=contrast_alpha, beta=brightness_beta)
 
         # 5. Optional: Sharpening
         if apply_sharpening:
@@ -147,15 +175,17 @@ def preprocess_image_for_ocr(image_path, save_intermediate=False, filename="",
                                           [-1, 9,-1],
                                           [-1,-1,-1]])
             # Applying the kernel to the input image
-            processed = cv2.filter2D(processed, -1, kernel_sharpening)
+            with stage_timer(timings, 'sharpen'):
+                processed = cv2.filter2D(processed, -1, kernel_sharpening)
 
         # 6. Binarization (Adaptive Thresholding) - Applied to the enhanced grayscale image
         logging.debug(f"Applying Adaptive Threshold (BlockSize={adaptive_thresh_block_size}, C={adaptive_thresh_C})...")
-        binary = cv2.adaptiveThreshold(processed, 255,
-                                       cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                       cv2.THRESH_BINARY,
-                                       blockSize=adaptive_thresh_block_size,
-                                       C=adaptive_thresh_C)
+        with stage_timer(timings, 'threshold'):
+            binary = cv2.adaptiveThreshold(processed, 255,
+                                           cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY,
+                                           blockSize=adaptive_thresh_block_size,
+                                           C=adaptive_thresh_C)
 
         # 7. Optional: Further Morphological Operations (on binary image)
         # kernel = np.ones((1, 1), np.uint8)
@@ -171,12 +201,164 @@ def preprocess_image_for_ocr(image_path, save_intermediate=False, filename="",
         return binary # Return the final binary image for OCR
 
     except Exception as e:
-        logging.error(f"Error during preprocessing {image_path}: {str(e)}")
+        source = filename if isinstance(image_path, np.ndarray) else image_path
+        logging.error(f"Error during preprocessing {source}: {str(e)}")
         # You might want to log the traceback for detailed debugging
         # import traceback
         # logging.error(traceback.format_exc())
         return None
 
+# --- Fast Preprocessing ---
+#
+# deskew() above thresholds the full-resolution scan and hands every foreground pixel to
+# minAreaRect, which is why it is off by default. The fast path estimates the angle from the
+# horizontal projection profile of a small downsampled copy, then rotates the full page once.
+# preprocess_image_fast() runs the same steps as preprocess_image_for_ocr but writes every
+# stage into buffers that are reused across steps and pages.
+
+DESKEW_MAX_DIM = 800        # Longest side of the image the angle is estimated on
+DESKEW_MAX_ANGLE = 5.0      # Search range in degrees (JFK scans are rarely worse)
+DESKEW_COARSE_STEP = 0.5
+DESKEW_FINE_STEP = 0.1
+
+SHARPEN_KERNEL = np.array([[-1,-1,-1],
+                           [-1, 9,-1],
+                           [-1,-1,-1]], dtype=np.float32)
+
+
+def _profile_score(ink, angle):
+    """Sharpness of the row profile after rotating by angle: text lines aligned with rows score highest."""
+    h, w = ink.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(ink, M, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    profile = cv2.reduce(rotated, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32F).ravel()
+    return float(np.sum(np.diff(profile) ** 2))
+
+
+def estimate_skew_angle(gray, max_dim=DESKEW_MAX_DIM, max_angle=DESKEW_MAX_ANGLE,
+                        coarse_step=DESKEW_COARSE_STEP, fine_step=DESKEW_FINE_STEP):
+    """Estimates the skew angle (degrees, cv2 rotation convention) on a downsampled copy."""
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_dim / max(h, w))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    # Ink = 1, paper = 0
+    ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+    if not ink.any():
+        return 0.0
+
+    coarse = np.arange(-max_angle, max_angle + coarse_step / 2, coarse_step)
+    best = max(coarse, key=lambda a: _profile_score(ink, a))
+    fine = np.arange(best - coarse_step, best + coarse_step + fine_step / 2, fine_step)
+    return float(max(fine, key=lambda a: _profile_score(ink, a)))
+
+
+def deskew_fast(gray, out=None, min_angle=0.1, **estimate_kwargs):
+    """Deskews a grayscale page: angle from a downsampled estimate, one full-resolution rotation.
+
+    Returns `gray` untouched when the angle is negligible, otherwise the rotated page
+    (written into `out` when given).
+    """
+    angle = estimate_skew_angle(gray, **estimate_kwargs)
+    if abs(angle) < min_angle:
+        logging.debug("Deskew: Angle negligible, skipping rotation.")
+        return gray
+
+    logging.debug(f"Deskew: Detected angle: {angle:.2f} degrees")
+    (h, w) = gray.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, M, (w, h), dst=out, flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+
+class PreprocessBuffers:
+    """Two ping-pong work buffers plus the binary output, reused while the page size stays the same."""
+
+    def __init__(self):
+        self.shape = None
+        self.work = []
+        self.binary = None
+
+    def ensure(self, shape):
+        if self.shape != shape:
+            self.shape = shape
+            self.work = [np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8)]
+            self.binary = np.empty(shape, dtype=np.uint8)
+        return self
+
+    def other(self, current):
+        """The work buffer not currently holding `current`."""
+        return self.work[1] if current is self.work[0] else self.work[0]
+
+
+_buffers = PreprocessBuffers()  # Shared by all pages processed in this process
+
+
+def preprocess_image_fast(image, buffers=None, timings=None,
+                          apply_contrast_brightness=True,
+                          contrast_alpha=1.5,
+                          brightness_beta=5,
+                          apply_sharpening=True,
+                          apply_deskew=False,
+                          apply_noise_reduction=False,
+                          noise_kernel_size=3,
+                          adaptive_thresh_block_size=31,
+                          adaptive_thresh_C=10):
+    """Same steps and parameters as preprocess_image_for_ocr, with buffer reuse and fast deskew.
+
+    `image` is a path or an already loaded grayscale (or BGR) array. The returned binary
+    image lives in `buffers` and is overwritten by the next call, so OCR it before
+    preprocessing the next page.
+    """
+    buffers = buffers or _buffers
+    try:
+        with stage_timer(timings, 'read'):
+            if isinstance(image, np.ndarray):
+                gray = image
+            else:
+                # Decode straight to grayscale, no colour buffer or cvtColor pass
+                gray = cv2.imread(str(image), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            logging.error(f"Could not read image: {image}")
+            return None
+        if gray.ndim == 3:
+            with stage_timer(timings, 'grayscale'):
+                gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+
+        buffers.ensure(gray.shape)
+        processed = gray
+
+        if apply_deskew:
+            with stage_timer(timings, 'deskew'):
+                processed = deskew_fast(processed, out=buffers.other(processed))
+
+        if apply_noise_reduction:
+            k_size = noise_kernel_size if noise_kernel_size % 2 != 0 else noise_kernel_size + 1
+            with stage_timer(timings, 'denoise'):
+                processed = cv2.medianBlur(processed, k_size, dst=buffers.other(processed))
+
+        if apply_contrast_brightness:
+            with stage_timer(timings, 'contrast'):
+                processed = cv2.convertScaleAbs(processed, dst=buffers.other(processed),
+                                                alpha=contrast_alpha, beta=brightness_beta)
+
+        if apply_sharpening:
+            with stage_timer(timings, 'sharpen'):
+                processed = cv2.filter2D(processed, -1, SHARPEN_KERNEL, dst=buffers.other(processed))
+
+        with stage_timer(timings, 'threshold'):
+            binary = cv2.adaptiveThreshold(processed, 255,
+                                           cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                           cv2.THRESH_BINARY,
+                                           blockSize=adaptive_thresh_block_size,
+                                           C=adaptive_thresh_C,
+                                           dst=buffers.binary)
+        return binary
+
+    except Exception as e:
+        logging.error(f"Error during preprocessing {image if not isinstance(image, np.ndarray) else 'array'}: {str(e)}")
+        return None
+
+
 # --- Important ---
 # Make sure to define PREPROCESSED_DIR if you set save_intermediate=True
 # PREPROCESSED_DIR = (CORPUS_DIR / 'jfk_documents_preprocessed').resolve()
@@ -219,13 +401,165 @@ def preprocess_image_for_ocr(image_path, save_intermediate=False, filename="",
 
 # --- OCR Processing Function ---
 
-def process_image_with_ocr(image_path, page_number):
-    """Preprocesses image and runs Tesseract OCR."""
+def text_from_ocr_data(data):
+    """Rebuilds layout-preserving text from image_to_data output.
+
+    Words are joined with spaces within a line, lines with newlines, and
+    paragraphs/blocks are separated by a blank line, matching image_to_string.
+    """
+    paragraphs = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip() if isinstance(word, str) else ''
+        if not word:
+            continue
+        par_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        line_key = data['line_num'][i]
+        paragraphs.setdefault(par_key, {}).setdefault(line_key, []).append((data['word_num'][i], word))
+
+    paragraph_texts = []
+    for par_key in sorted(paragraphs):
+        lines = paragraphs[par_key]
+        paragraph_texts.append("\n".join(
+            " ".join(word for _, word in sorted(lines[line_key])) for line_key in sorted(lines)
+        ))
+    return "\n\n".join(paragraph_texts)
+
+
+def confidences_from_ocr_data(data):
+    """Returns (avg, median) word confidence in 0-1, ignoring non-word rows (conf <= 0)."""
+    valid_confidences = [float(c)/100.0 for c in data['conf'] if float(c) > 0] # Consider only > 0 confidence
+    avg_confidence = round(np.mean(valid_confidences).item(), 4) if valid_confidences else 0.0
+    median_confidence = round(np.median(valid_confidences).item(), 4) if valid_confidences else 0.0
+    return avg_confidence, median_confidence
+
+
+def word_boxes_from_ocr_data(data):
+    """Compact word boxes: [text, left, top, width, height, confidence] per recognised word."""
+    return [
+        [word.strip(), int(data['left'][i]), int(data['top'][i]), int(data['width'][i]),
+         int(data['height'][i]), round(float(data['conf'][i]) / 100.0, 4)]
+        for i, word in enumerate(data['text'])
+        if isinstance(word, str) and word.strip() and float(data['conf'][i]) >= 0
+    ]
+
+
+# Single-pass mode runs Tesseract once (image_to_data) and derives text and confidences from it
+SINGLE_PASS = False
+KEEP_WORD_BOXES = False
+# Fast preprocessing reuses buffers between pages and makes deskew cheap enough to leave on
+FAST_PREPROCESS = False
+APPLY_DESKEW = False
+# Preprocessing parameters used for every page (also part of the OCR cache key)
+PREPROCESS_PARAMS = {
+    "apply_contrast_brightness": True,
+    "contrast_alpha": 1.5,
+    "brightness_beta": 5,
+    "apply_sharpening": True,
+    "apply_noise_reduction": False,
+    "noise_kernel_size": 3,
+    "adaptive_thresh_block_size": 31,
+    "adaptive_thresh_C": 10,
+}
+# Reuse results from the content-addressed OCR cache (see ocr_cache.py)
+USE_CACHE = True
+# Write a stub instead of OCRing blank pages (see blank_pages.py); near-blank pages are OCR'd unless asked
+SKIP_BLANK = True
+SKIP_NEAR_BLANK = False
+
+
+def load_pdf_page(page, render_dpi=RENDER_DPI, png_dir=None):
+    """Renders a PdfPage in grayscale, optionally also saving it as a PNG like PDFToPNG would."""
+    image = render_page(page, dpi=render_dpi, grayscale=True)
+    if png_dir:
+        cv2.imwrite(str(Path(png_dir) / page.name), image)
+    return image
+
+
+def blank_page_result(img_filename, page_number, shape, page_class, stats):
+    """Stub result for a page that was not OCR'd, so the document keeps its page numbering."""
+    height, width = shape[:2]
+    return {
+        "filename": img_filename,
+        "text": "",
+        "metadata": {
+            "page_number": page_number,
+            "dimensions": [width, height],
+            "avg_confidence": 0.0,
+            "median_confidence": 0.0,
+            "ocr_engine": None,
+            "page_class": page_class,
+            "blank_detection": stats,
+        }
+    }
+
+
+def process_image_with_ocr(image_path, page_number, single_pass=SINGLE_PASS, keep_word_boxes=KEEP_WORD_BOXES,
+                           engine=OCR_ENGINE, fast_preprocess=FAST_PREPROCESS, apply_deskew=APPLY_DESKEW,
+                           render_dpi=RENDER_DPI, png_dir=None, preprocess_params=None,
+                           use_cache=USE_CACHE, cache_path=CACHE_PATH, cache_max_bytes=MAX_CACHE_BYTES,
+                           skip_blank=SKIP_BLANK, skip_near_blank=SKIP_NEAR_BLANK):
+    """Preprocesses image and runs Tesseract OCR.
+
+    image_path is an image file or a PdfPage, which is rendered in memory (at
+    render_dpi, also saved to png_dir if given) and always uses fast preprocessing.
+    With single_pass=True Tesseract is run once and the text is rebuilt from the
+    word layout; otherwise image_to_string and image_to_data are both run.
+    keep_word_boxes adds a "words" list to the result. engine picks the OCR backend.
+    fast_preprocess uses preprocess_image_fast (buffer reuse, downsampled deskew).
+    preprocess_params overrides entries of PREPROCESS_PARAMS. With use_cache, pages
+    whose image, engine and parameters are unchanged come from the OCR cache.
+    With skip_blank, blank (and with skip_near_blank, near-blank) pages get a stub
+    result with metadata["page_class"] instead of being preprocessed and OCR'd.
+    """
     try:
-        img_filename = os.path.basename(image_path)
+        is_pdf_page = isinstance(image_path, PdfPage)
+        img_filename = image_path.name if is_pdf_page else os.path.basename(image_path)
+        params = {**PREPROCESS_PARAMS, **(preprocess_params or {}), "apply_deskew": apply_deskew}
+
+        custom_config = TESSERACT_CONFIG
+        ocr = get_engine(engine, custom_config)
+
+        key = None
+        if use_cache:
+            cache = get_cache(cache_path, cache_max_bytes)
+            key = cache_key(source_digest(image_path, render_dpi), ocr.name, ocr.version,
+                            {**params, "fast_preprocess": fast_preprocess or is_pdf_page,
+                             "single_pass": single_pass, "keep_word_boxes": keep_word_boxes},
+                            custom_config)
+            cached = cache.get(key)
+            if cached:
+                logging.info(f"OCR cache hit for {img_filename}")
+                if is_pdf_page and png_dir:
+                    load_pdf_page(image_path, render_dpi, png_dir)
+                cached["filename"] = img_filename
+                cached["metadata"]["page_number"] = page_number
+                return cached
+
+        page_image = None
+        if is_pdf_page:
+            page_image = load_pdf_page(image_path, render_dpi, png_dir)
+        elif skip_blank:
+            page_image = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+            if page_image is None:
+                logging.warning(f"Skipping OCR for {img_filename}: could not read image.")
+                return None
+
+        if skip_blank:
+            page_class, stats = classify_page(page_image)
+            if should_skip(page_class, skip_near_blank):
+                logging.info(f"Skipping OCR for {img_filename}: {page_class} page {stats}")
+                return blank_page_result(img_filename, page_number, page_image.shape, page_class, stats)
+
         # Preprocess the image
         # Set save_intermediate=True to debug preprocessing steps
-        img_processed = preprocess_image_for_ocr(image_path, save_intermediate=False, filename=img_filename)
+        if is_pdf_page:
+            img_processed = preprocess_image_fast(page_image, **params)
+        elif fast_preprocess:
+            img_processed = preprocess_image_fast(page_image if page_image is not None else image_path, **params)
+        else:
+            img_processed = preprocess_image_for_ocr(page_image if page_image is not None else image_path,
+                                                     save_intermediate=False, filename=img_filename,
+                                                     **params)
 
         if img_processed is None:
             logging.warning(f"Skipping OCR for {img_filename} due to preprocessing error.")
@@ -234,71 +568,19 @@ def process_image_with_ocr(image_path, page_number):
         # Get image dimensions (from processed image)
         height, width = img_processed.shape[:2]
 
-        # --- Tesseract Configuration ---
-        # --psm 3: Fully automatic page segmentation (usually best default)
-        # --psm 4: Assume a single column of text of variable sizes.
-        # --psm 6: Assume a single uniform block of text. (Your original, can be good for simple docs)
-        # --psm 11: Sparse text. Find as much text as possible in no particular order.
-        # --psm 12: Sparse text with OSD.
-        # Choose the PSM that best fits your document types. Start with 3.
-        # Specify language ('eng' for English). Install language packs if needed (e.g., 'sudo apt-get install tesseract-ocr-eng')
-        # OEM 3 is the default LSTM engine, usually the best.
-        custom_config = r'-l eng --oem 3 --psm 3' # Changed PSM to 3
-
-        # Use image_to_string to preserve layout better
-        extracted_text = pytesseract.image_to_string(img_processed, config=custom_config)
-
-        # Alternative: Use image_to_data for word confidences, but requires careful reconstruction
-        # data = pytesseract.image_to_data(
-        #     img_processed,
-        #     config=custom_config,
-        #     output_type=pytesseract.Output.DICT
-        # )
-        #
-        # # Filter and reconstruct text (more complex, only if word-level data is essential)
-        # lines = {}
-        # confidences = []
-        # for i in range(len(data['text'])):
-        #     conf = int(data['conf'][i])
-        #     if conf > 60: # Your confidence threshold
-        #         text = data['text'][i].strip()
-        #         if text:
-        #             line_num = data['line_num'][i]
-        #             block_num = data['block_num'][i]
-        #             par_num = data['par_num'][i]
-        #             word_num = data['word_num'][i]
-        #             # Unique key for each line within its block/paragraph
-        #             line_key = (block_num, par_num, line_num)
-        #
-        #             if line_key not in lines:
-        #                 lines[line_key] = []
-        #             # Store word and its position to sort later
-        #             lines[line_key].append((word_num, text))
-        #             confidences.append(conf / 100.0)
-        #
-        # # Sort words within lines and join lines
-        # reconstructed_text_list = []
-        # for line_key in sorted(lines.keys()):
-        #     words = [word[1] for word in sorted(lines[line_key])]
-        #     reconstructed_text_list.append(" ".join(words))
-        #
-        # extracted_text = "\n".join(reconstructed_text_list)
-        # avg_confidence = round(np.mean(confidences).item(), 4) if confidences else 0.0
-
-        # --- Calculate Confidence (Using image_to_string doesn't directly give easy average) ---
-        # Get confidence data separately if needed, AFTER getting text with image_to_string
-        # This avoids re-running OCR but gives word-level confidence for reporting
-        conf_data = pytesseract.image_to_data(
-            img_processed,
-            config=custom_config, # Use same config
-            output_type=pytesseract.Output.DICT
-        )
-        valid_confidences = [int(c)/100.0 for c in conf_data['conf'] if int(c) > 0] # Consider only > 0 confidence
-        avg_confidence = round(np.mean(valid_confidences).item(), 4) if valid_confidences else 0.0
-        median_confidence = round(np.median(valid_confidences).item(), 4) if valid_confidences else 0.0
-
-
-        return {
+        if single_pass:
+            # Word level data (boxes, confidences and block/paragraph/line/word numbering);
+            # the layout is rebuilt from the same recognition run instead of running Tesseract again
+            data = ocr.image_to_data(img_processed)
+            extracted_text = text_from_ocr_data(data)
+        else:
+            # Text from image_to_string to preserve layout, plus word data for confidences
+            # (two tesseract runs with pytesseract, one recognition with tesserocr)
+            extracted_text, data = ocr.image_to_text_and_data(img_processed)
+
+        avg_confidence, median_confidence = confidences_from_ocr_data(data)
+
+        result = {
             "filename": img_filename,
             "text": extracted_text.strip(), # Remove leading/trailing whitespace from the whole text
             "metadata": {
@@ -306,11 +588,18 @@ def process_image_with_ocr(image_path, page_number):
                 "dimensions": [width, height],
                 "avg_confidence": avg_confidence, # Report average confidence of detected words
                 "median_confidence": median_confidence, # Median can be more robust to outliers
-                "ocr_engine": f"Tesseract {pytesseract.get_tesseract_version()}",
+                "ocr_engine": f"Tesseract {ocr.version}",
+                "ocr_backend": ocr.name,
                 "tesseract_config": custom_config,
+                "single_pass": single_pass,
                 # "text_blocks": len(all_text) # This needs recalculation based on how text is structured
             }
         }
+        if keep_word_boxes:
+            result["words"] = word_boxes_from_ocr_data(data)
+        if key:
+            cache.put(key, result)
+        return result
 
     except pytesseract.TesseractNotFoundError:
          logging.error("Tesseract executable not found. Please ensure it's installed and the path is correct.")
@@ -323,51 +612,246 @@ def process_image_with_ocr(image_path, page_number):
 
 # --- Main Execution Logic ---
 
-def run_ocr():
-    """Finds images, processes them, and saves results as JSON."""
+# Parallel mode settings (overridable from the command line)
+MAX_WORKERS = 1          # 1 keeps the original sequential loop
+THREADS_PER_WORKER = 1   # OpenMP/OpenCV threads inside each worker; 1 avoids oversubscribing cores
+
+# OCR pools spawn fresh workers instead of forking: a forked worker inherits the engine the parent
+# preloads, and Tesseract's OpenMP runtime reads OMP_THREAD_LIMIT when it loads, before
+# init_ocr_worker could set it. Pass as mp_context to every pool that uses init_ocr_worker.
+OCR_POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def init_ocr_worker(threads_per_worker=THREADS_PER_WORKER, engine=OCR_ENGINE):
+    """Pool initializer: pin each worker (and the tesseract processes it starts) to a few threads,
+    then load the worker's OCR engine once so every page reuses it.
+
+    The thread limits only take effect if no engine is loaded in the worker yet, i.e. the pool
+    must use OCR_POOL_CONTEXT.
+    """
+    threads = str(threads_per_worker)
+    os.environ['OMP_THREAD_LIMIT'] = threads  # Read by tesseract itself
+    os.environ['OMP_NUM_THREADS'] = threads
+    os.environ['MKL_NUM_THREADS'] = threads
+    cv2.setNumThreads(threads_per_worker)
+    get_engine(engine, TESSERACT_CONFIG)
+
+
+def ocr_page_task(image_path, page_number, ocr_options=None):
+    """Worker entry point. Never raises, so one bad page can't take the pool down.
+
+    Returns (result, error, seconds spent on the page).
+    """
+    start = time.perf_counter()
     try:
-        image_files = sorted([
-            f for f in IMAGE_DIR.iterdir() # Use pathlib for iteration
-            if f.is_file() and f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
-        ])
-    except FileNotFoundError:
-        logging.error(f"Image directory not found: {IMAGE_DIR}")
-        return
+        return process_image_with_ocr(image_path, page_number, **(ocr_options or {})), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
 
-    if not image_files:
-        logging.warning(f"No image files found in {IMAGE_DIR}")
-        return
+
+def is_skipped_page(data):
+    return bool(data) and "page_class" in data["metadata"]
+
+
+def save_ocr_result(image_path, data):
+    output_filename = f"{image_path.stem}.json" # Use stem for filename without extension
+    output_path = OUTPUT_DIR / output_filename
+
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        logging.info(f"Successfully saved JSON to {output_path}")
+    except IOError as e:
+        logging.error(f"Could not write JSON file {output_path}: {e}")
+    except Exception as e:
+         logging.error(f"An unexpected error occurred while saving JSON for {image_path.name}: {e}")
+
+
+def run_ocr_parallel(image_files, workers, threads_per_worker=THREADS_PER_WORKER, queue_size=None,
+                     ocr_options=None):
+    """OCR pages across a process pool and write results in page order.
+
+    At most `queue_size` pages are in flight at once, so memory stays bounded and
+    results can be written in submission order as they come back. If a worker dies, the pool
+    is restarted and the page at the head of the queue is retried once before it is skipped.
+    """
+    total_files = len(image_files)
+    blank_stats = BlankPageStats()
+    queue_size = queue_size or workers * 2
+    tasks = iter(enumerate(image_files, start=1))
+    in_flight = deque()
+    retried = set()
+    skipped = []
+
+    def make_pool():
+        engine = (ocr_options or {}).get('engine', OCR_ENGINE)
+        return ProcessPoolExecutor(max_workers=workers, mp_context=OCR_POOL_CONTEXT,
+                                   initializer=init_ocr_worker, initargs=(threads_per_worker, engine))
+
+    executor = make_pool()
+    try:
+        while True:
+            while len(in_flight) < queue_size:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                idx, image_path = task
+                in_flight.append((idx, image_path, executor.submit(ocr_page_task, image_path, idx, ocr_options)))
+            if not in_flight:
+                break
+
+            idx, image_path, fut = in_flight.popleft()
+            try:
+                data, error, seconds = fut.result()
+            except BrokenProcessPool as e:
+                # A worker died hard (e.g. tesseract crashed the interpreter): restart the pool and carry on
+                logging.error(f"Worker pool broke while processing {image_path.name}: {e}. Restarting pool.")
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = make_pool()
+                pending = [(i, p) for i, p, _ in in_flight]
+                if idx in retried:
+                    logging.error(f"Skipping {image_path.name}: the pool broke on it again after a retry.")
+                    skipped.append(image_path.name)
+                else:
+                    retried.add(idx)
+                    pending.insert(0, (idx, image_path))
+                in_flight = deque((i, p, executor.submit(ocr_page_task, p, i, ocr_options)) for i, p in pending)
+                continue
+
+            logging.info(f"Processed {idx}/{total_files}: {image_path.name}")
+            if error:
+                logging.error(f"Error processing {image_path}: {error}")
+            if not data:
+                logging.warning(f"Skipped saving JSON for {image_path.name} due to processing error.")
+                skipped.append(image_path.name)
+                continue
+            blank_stats.add(is_skipped_page(data), seconds)
+            save_ocr_result(image_path, data)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    logging.info(blank_stats.summary())
+    log_skipped_pages(skipped)
+
+
+def log_skipped_pages(skipped):
+    """Final summary line for pages that produced no JSON (processing errors or worker crashes)."""
+    if skipped:
+        logging.warning(f"{len(skipped)} page(s) skipped without output: {', '.join(skipped)}")
+
+
+def run_ocr(workers=MAX_WORKERS, threads_per_worker=THREADS_PER_WORKER, queue_size=None, ocr_options=None,
+            pdf_dir=None):
+    """Finds images (or, with pdf_dir, PDF pages rendered in memory), processes them, and saves results as JSON."""
+    if pdf_dir:
+        image_files = list_pdf_pages(pdf_dir)
+        if not image_files:
+            logging.warning(f"No PDF pages found in {pdf_dir}")
+            return
+    else:
+        try:
+            image_files = sorted([
+                f for f in IMAGE_DIR.iterdir() # Use pathlib for iteration
+                if f.is_file() and f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
+            ])
+        except FileNotFoundError:
+            logging.error(f"Image directory not found: {IMAGE_DIR}")
+            return
+
+        if not image_files:
+            logging.warning(f"No image files found in {IMAGE_DIR}")
+            return
 
     total_files = len(image_files)
     logging.info(f"Found {total_files} images to process.")
 
+    if workers > 1:
+        logging.info(f"Running OCR with {workers} worker processes ({threads_per_worker} thread(s) each).")
+        run_ocr_parallel(image_files, workers, threads_per_worker, queue_size, ocr_options)
+        return
+
+    blank_stats = BlankPageStats()
+    skipped = []
     for idx, image_path in enumerate(image_files, start=1):
         logging.info(f"Processing {idx}/{total_files}: {image_path.name}")
 
-        data = process_image_with_ocr(image_path, idx)
+        start = time.perf_counter()
+        data = process_image_with_ocr(image_path, idx, **(ocr_options or {}))
         if not data:
             logging.warning(f"Skipped saving JSON for {image_path.name} due to processing error.")
+            skipped.append(image_path.name)
             continue
 
-        output_filename = f"{image_path.stem}.json" # Use stem for filename without extension
-        output_path = OUTPUT_DIR / output_filename
+        blank_stats.add(is_skipped_page(data), time.perf_counter() - start)
+        save_ocr_result(image_path, data)
 
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logging.info(f"Successfully saved JSON to {output_path}")
-        except IOError as e:
-            logging.error(f"Could not write JSON file {output_path}: {e}")
-        except Exception as e:
-             logging.error(f"An unexpected error occurred while saving JSON for {image_path.name}: {e}")
+    logging.info(blank_stats.summary())
+    log_skipped_pages(skipped)
+    ocr_options = ocr_options or {}
+    if ocr_options.get("use_cache", USE_CACHE):
+        get_cache(ocr_options.get("cache_path", CACHE_PATH), ocr_options.get("cache_max_bytes", MAX_CACHE_BYTES)).log_stats()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR page images with Tesseract and save one JSON per page.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help="Worker processes (default 1 = sequential; use the core count on OCR boxes)")
+    parser.add_argument('--threads-per-worker', type=int, default=THREADS_PER_WORKER,
+                        help="OpenMP/OpenCV threads per worker")
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help="Max pages in flight (default 2x workers)")
+    parser.add_argument('--single-pass', action='store_true', default=SINGLE_PASS,
+                        help="Run Tesseract once per page and rebuild the text from word data")
+    parser.add_argument('--keep-word-boxes', action='store_true', default=KEEP_WORD_BOXES,
+                        help="Store word boxes and confidences in the page JSON")
+    parser.add_argument('--engine', choices=['auto', *ENGINES], default=OCR_ENGINE,
+                        help="OCR backend: persistent in-process tesserocr, or pytesseract subprocess per call")
+    parser.add_argument('--fast-preprocess', action='store_true', default=FAST_PREPROCESS,
+                        help="Buffer-reusing preprocessing with the downsampled deskew estimator")
+    parser.add_argument('--deskew', action='store_true', default=APPLY_DESKEW, help="Deskew pages before OCR")
+    parser.add_argument('--pdf-dir', type=Path, default=None,
+                        help="Render pages of the PDFs in this directory in memory instead of reading PNGs")
+    parser.add_argument('--dpi', type=int, default=RENDER_DPI, help="Render resolution for --pdf-dir")
+    parser.add_argument('--save-png-dir', type=Path, default=None,
+                        help="With --pdf-dir, also write the rendered pages here as PNGs")
+    parser.add_argument('--no-cache', action='store_true', default=not USE_CACHE,
+                        help="OCR every page even if its result is in the content-addressed cache")
+    parser.add_argument('--cache-path', type=Path, default=CACHE_PATH)
+    parser.add_argument('--cache-max-gb', type=float, default=MAX_CACHE_BYTES / 1024 ** 3,
+                        help="Cache size limit; least recently used results are evicted beyond it")
+    parser.add_argument('--no-skip-blank', action='store_true', default=not SKIP_BLANK,
+                        help="OCR blank pages instead of writing a stub JSON for them")
+    parser.add_argument('--skip-near-blank', action='store_true', default=SKIP_NEAR_BLANK,
+                        help="Also skip near-blank pages (a few specks or a stray mark)")
+    args = parser.parse_args()
+    ocr_options = {"single_pass": args.single_pass, "keep_word_boxes": args.keep_word_boxes,
+                   "engine": args.engine, "fast_preprocess": args.fast_preprocess,
+                   "apply_deskew": args.deskew, "render_dpi": args.dpi, "png_dir": args.save_png_dir,
+                   "use_cache": not args.no_cache, "cache_path": args.cache_path,
+                   "cache_max_bytes": int(args.cache_max_gb * 1024 ** 3),
+                   "skip_blank": not args.no_skip_blank, "skip_near_blank": args.skip_near_blank}
+    if args.save_png_dir:
+        os.makedirs(args.save_png_dir, exist_ok=True)
+
+    # Make sure the OCR backend loads before starting (the workers load their own copy)
+    try:
+        ocr = get_engine(args.engine, TESSERACT_CONFIG)
+        logging.info(f"Using Tesseract version: {ocr.version} ({ocr.name} backend)")
+    except Exception as e:
+        logging.error(f"Error loading the '{args.engine}' OCR engine: {e}")
+        logging.warning("Ensure Tesseract is installed and the path is correct.")
+        exit(1)
+
     # Optional: Check if input directory exists before running
-    if not IMAGE_DIR.exists():
+    if args.pdf_dir:
+        if not args.pdf_dir.exists():
+            print(f"ERROR: PDF directory not found: {args.pdf_dir}")
+        else:
+            run_ocr(args.workers, args.threads_per_worker, args.queue_size, ocr_options, pdf_dir=args.pdf_dir)
+            print("\nOCR processing finished.")
+    elif not IMAGE_DIR.exists():
         print(f"ERROR: Image directory not found: {IMAGE_DIR}")
     elif not OUTPUT_DIR.exists():
          print(f"ERROR: Output directory not found: {OUTPUT_DIR}") # Should be created, but good check
     else:
-        run_ocr()
-        print("\nOCR processing finished.")
\ No newline at end of file
+        run_ocr(args.workers, args.threads_per_worker, args.queue_size, ocr_options)
+        print("\nOCR processing finished.")
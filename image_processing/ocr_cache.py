@@ -0,0 +1,154 @@
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+
+# --- Content-addressed OCR result cache ---
+#
+# Results are keyed by a hash of (image content, engine, engine version, preprocessing
+# parameters, engine config), so re-runs after a crash and parameter sweeps only OCR pages
+# whose inputs actually changed. Entries live in one SQLite file shared by all worker
+# processes, and the least recently used ones are evicted once the cache passes its size limit.
+
+CACHE_PATH = (Path.cwd().parent / 'corpus' / 'ocr_cache.sqlite').resolve()
+MAX_CACHE_BYTES = 10 * 1024 ** 3  # 10 GB
+EVICT_TO = 0.9                    # Evict down to this fraction of the limit
+CHUNK_SIZE = 1024 * 1024
+
+_digests = {}  # (path, size, mtime) -> sha256, so a PDF is hashed once per process, not once per page
+_caches = {}   # One open cache per (path, limit) per process
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, memoised on (path, size, mtime)."""
+    path = Path(path)
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        _digests[memo_key] = hasher.hexdigest()
+    return _digests[memo_key]
+
+
+def source_digest(source, render_dpi=None):
+    """Content hash of a page: the image file, or for a PdfPage the PDF plus page index and DPI."""
+    if hasattr(source, 'pdf_path'):
+        return f"{file_digest(source.pdf_path)}:{source.index}:{render_dpi}"
+    return file_digest(source)
+
+
+def cache_key(image_digest, engine, engine_version, preprocess_params, config):
+    payload = json.dumps([image_digest, engine, str(engine_version), preprocess_params, config],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OCRCache:
+    """SQLite-backed cache of OCR results with an LRU size limit. Safe to share between processes."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; writes are grouped explicitly with transaction()
+        self.conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction():
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('total_bytes', 0)")
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so the read-modify-write of
+        total_bytes in another process can't interleave with this one's."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def get(self, key):
+        row = self.conn.execute("SELECT value FROM entries WHERE key=?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.transaction():
+            self.conn.execute("UPDATE entries SET last_access=? WHERE key=?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, value):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 3)
+        # Insert, size update and eviction check commit together, so concurrent writers can't
+        # double-count a replaced entry or evict on a stale total
+        with self.transaction():
+            old = self.conn.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                              (key, blob, len(blob), time.time()))
+            self.conn.execute("UPDATE meta SET value = value + ? WHERE name='total_bytes'",
+                              (len(blob) - (old[0] if old else 0),))
+            if self.total_bytes() > self.max_bytes:
+                self._evict()
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT value FROM meta WHERE name='total_bytes'").fetchone()[0]
+
+    def evict(self):
+        """Drops least recently used entries until the cache is back under EVICT_TO of its limit."""
+        with self.transaction():
+            self._evict()
+
+    def _evict(self):
+        """evict() body; the caller holds the write transaction."""
+        target = int(self.max_bytes * EVICT_TO)
+        total = self.total_bytes()
+        while total > target:
+            rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 500").fetchall()
+            if not rows:
+                break
+            freed = 0
+            for key, size in rows:
+                if total - freed <= target:
+                    break
+                self.conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                freed += size
+            total -= freed
+            self.conn.execute("UPDATE meta SET value = value - ? WHERE name='total_bytes'", (freed,))
+
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        if lookups:
+            logging.info(f"OCR cache: {self.hits}/{lookups} hits ({self.hits / lookups:.1%}), "
+                         f"{self.total_bytes() / (1024 * 1024):.1f} MB stored in {self.path}")
+
+    def close(self):
+        self.conn.close()
+
+
+def get_cache(path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+    """Returns this process's open cache for path, opening it on first use."""
+    key = (str(path), max_bytes)
+    if key not in _caches:
+        _caches[key] = OCRCache(path, max_bytes)
+    return _caches[key]
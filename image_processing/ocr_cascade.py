@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import img_to_text_v2 as tesseract_ocr
+from pdf_to_images import list_pdf_pages
+
+# --- Confidence-driven OCR cascade ---
+#
+# Every page goes through the fast Tesseract path (img_to_text_v2). Only pages whose
+# confidence is low or whose text looks like garbage are sent to PaddleOCR
+# (paddle_run_v3), and whichever result scores better is kept. The page JSON has the
+# img_to_text_v2 layout plus a "cascade" block recording which engine produced it and why.
+#
+# The engines' confidences are not on a common scale (Tesseract's is a mean word confidence,
+# PaddleOCR's a mean line score over lines it already filtered), so the keep-or-replace decision
+# uses only signals computed from the text itself; see QUALITY_MEASURE.
+
+CORPUS_DIR = (Path.cwd().parent / 'corpus').resolve()
+IMAGE_DIR = (CORPUS_DIR / 'jfk_documents_imgs').resolve()
+OUTPUT_DIR = (CORPUS_DIR / 'jfk_documents_json_cascade').resolve()
+
+# Fallback thresholds (overridable from the command line)
+MIN_AVG_CONFIDENCE = 0.80
+MIN_MEDIAN_CONFIDENCE = 0.85
+MAX_GARBAGE_RATIO = 0.15      # Share of characters outside normal typewritten text
+MAX_SINGLE_CHAR_RATIO = 0.40  # Share of 1-character tokens ("t i l l e d" style noise)
+MIN_TOKENS_FOR_RATIOS = 20
+
+TESSERACT_WORKERS = os.cpu_count() or 1
+PADDLE_WORKERS = max(1, (os.cpu_count() or 2) // 4)
+PADDLE_THREADS = 2
+PADDLE_PAGES_PER_BATCH = 4
+
+GARBAGE_CHARS = re.compile(r"[^A-Za-z0-9\s.,;:'\"!?()\[\]\-/$%&#*@]")
+# A token that reads as a word: letters with a vowel (or "a"/"I"), an all-caps acronym, or a number,
+# optionally wrapped in quotes, brackets and trailing punctuation
+WORDLIKE = re.compile(r"""["'(\[]*(?:[A-Za-z]*[AEIOUYaeiouy][A-Za-z]*(?:['-][A-Za-z]+)*|[A-Z]{2,}|\d[\d,./:-]*)"""
+                      r"""["')\].,;:!?]*""")
+QUALITY_MEASURE = "wordlike_rate * (1 - garbage_ratio)"
+
+
+def text_quality(text):
+    """Returns (garbage character ratio, single-character token ratio) of a page's text."""
+    if not text:
+        return 0.0, 0.0
+    garbage_ratio = len(GARBAGE_CHARS.findall(text)) / len(text)
+    tokens = text.split()
+    single_ratio = sum(1 for t in tokens if len(t) == 1) / len(tokens) if len(tokens) >= MIN_TOKENS_FOR_RATIOS else 0.0
+    return garbage_ratio, single_ratio
+
+
+def fallback_reason(result, thresholds):
+    """Why a Tesseract result should be retried with PaddleOCR, or None if it is good enough."""
+    if result is None:
+        return "tesseract_failed"
+    if tesseract_ocr.is_skipped_page(result):
+        return None  # Blank page stub; there is nothing for PaddleOCR to find either
+    metadata = result["metadata"]
+    if metadata["avg_confidence"] < thresholds["min_avg_confidence"]:
+        return "low_avg_confidence"
+    if metadata["median_confidence"] < thresholds["min_median_confidence"]:
+        return "low_median_confidence"
+    garbage_ratio, single_ratio = text_quality(result["text"])
+    if garbage_ratio > thresholds["max_garbage_ratio"]:
+        return "garbage_characters"
+    if single_ratio > thresholds["max_single_char_ratio"]:
+        return "fragmented_text"
+    return None
+
+
+def wordlike_rate(text):
+    """Share of whitespace-separated tokens that look like words (see WORDLIKE)."""
+    tokens = text.split()
+    if not tokens:
+        return 0.0
+    return sum(1 for t in tokens if WORDLIKE.fullmatch(t) and (len(t) > 1 or t.isdigit() or t in "aAI")) / len(tokens)
+
+
+def quality_score(text):
+    """Engine-independent score in [0, 1] (QUALITY_MEASURE), so results from either engine compare fairly."""
+    if not text:
+        return 0.0
+    garbage_ratio, _ = text_quality(text)
+    return wordlike_rate(text) * (1.0 - garbage_ratio)
+
+
+def tesseract_task(source, page_number, ocr_options):
+    result, error, _ = tesseract_ocr.ocr_page_task(source, page_number, ocr_options)
+    if error:
+        logging.error(f"Tesseract failed on {source}: {error}")
+    return result
+
+
+def init_paddle_worker(threads_per_worker):
+    import paddle_run_v3
+    paddle_run_v3.init_worker(threads_per_worker)
+
+
+def paddle_task(items, render_dpi):
+    """Worker task: OCR a batch of (source, page_number, tesseract_result, reason) with PaddleOCR
+    and return the better result for each page."""
+    import paddle_run_v3
+    loaded = []
+    for source, page_number, tess_result, reason in items:
+        try:
+            filename, img = paddle_run_v3.load_page(source, render_dpi)
+            loaded.append((filename, img, page_number, tess_result, reason))
+        except Exception as e:
+            logging.error(f"Could not load {source} for PaddleOCR: {e}")
+            loaded.append((None, None, page_number, tess_result, reason))
+
+    images = [img for _, img, _, _, _ in loaded if img is not None]
+    try:
+        paddle_lines = iter(paddle_run_v3.ocr_pages(images))
+    except Exception as e:
+        logging.error(f"PaddleOCR failed on batch: {e}")
+        paddle_lines = iter([None] * len(images))
+
+    results = []
+    for filename, img, page_number, tess_result, reason in loaded:
+        lines = next(paddle_lines) if img is not None else None
+        paddle_result = None
+        if lines is not None:
+            scores = [score for _, _, score in lines]
+            h, w = img.shape[:2]
+            paddle_result = {
+                "filename": filename,
+                "text": "\n".join(text for _, text, _ in lines).strip(),
+                "metadata": {
+                    "page_number": page_number,
+                    "dimensions": [w, h],
+                    "avg_confidence": round(float(np.mean(scores)), 4) if scores else 0.0,
+                    "median_confidence": round(float(np.median(scores)), 4) if scores else 0.0,
+                    "ocr_engine": f"PaddleOCR {paddle_run_v3.paddleocr.__version__}",
+                },
+            }
+        results.append(choose_result(tess_result, paddle_result, reason))
+    return results
+
+
+def choose_result(tess_result, paddle_result, reason):
+    """Keeps whichever result scores better and records the decision in result["cascade"]."""
+    def score(result):
+        if result is None:
+            return -1.0
+        return quality_score(result["text"])
+
+    tess_score, paddle_score = score(tess_result), score(paddle_result)
+    chosen = paddle_result if paddle_score > tess_score else tess_result
+    if chosen is None:
+        return None
+    chosen["cascade"] = {
+        "engine": "paddleocr" if chosen is paddle_result else "tesseract",
+        "fallback_reason": reason,
+        "score_measure": QUALITY_MEASURE,
+        "tesseract_score": round(tess_score, 4) if tess_result else None,
+        "paddle_score": round(paddle_score, 4) if paddle_result else None,
+    }
+    return chosen
+
+
+def save_result(result, output_dir):
+    output_path = Path(output_dir) / f"{os.path.splitext(result['filename'])[0]}.json"
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def run_cascade(sources, output_dir=OUTPUT_DIR, thresholds=None, ocr_options=None,
+                tesseract_workers=TESSERACT_WORKERS, paddle_workers=PADDLE_WORKERS,
+                paddle_threads=PADDLE_THREADS, pages_per_batch=PADDLE_PAGES_PER_BATCH):
+    thresholds = thresholds or {
+        "min_avg_confidence": MIN_AVG_CONFIDENCE,
+        "min_median_confidence": MIN_MEDIAN_CONFIDENCE,
+        "max_garbage_ratio": MAX_GARBAGE_RATIO,
+        "max_single_char_ratio": MAX_SINGLE_CHAR_RATIO,
+    }
+    ocr_options = ocr_options or {}
+    os.makedirs(output_dir, exist_ok=True)
+    total = len(sources)
+
+    # Pass 1: Tesseract on every page; good pages are written straight away
+    start = time.perf_counter()
+    fallback = []
+    with ProcessPoolExecutor(max_workers=tesseract_workers, mp_context=tesseract_ocr.OCR_POOL_CONTEXT,
+                             initializer=tesseract_ocr.init_ocr_worker,
+                             initargs=(1, ocr_options.get("engine", tesseract_ocr.OCR_ENGINE))) as executor:
+        page_numbers = range(1, total + 1)
+        results = executor.map(tesseract_task, sources, page_numbers, [ocr_options] * total, chunksize=8)
+        for source, page_number, result in zip(sources, page_numbers, results):
+            reason = fallback_reason(result, thresholds)
+            if reason:
+                fallback.append((source, page_number, result, reason))
+            else:
+                engine = None if tesseract_ocr.is_skipped_page(result) else "tesseract"
+                result["cascade"] = {"engine": engine, "fallback_reason": None}
+                save_result(result, output_dir)
+    tesseract_time = time.perf_counter() - start
+    logging.info(f"Tesseract pass: {total} pages in {tesseract_time:.1f}s, "
+                 f"{len(fallback)} ({len(fallback) / total if total else 0:.1%}) sent to PaddleOCR")
+
+    # Pass 2: PaddleOCR only for the pages that need it, batched through one model per worker
+    start = time.perf_counter()
+    paddle_kept = 0
+    if fallback:
+        batches = [fallback[i:i + pages_per_batch] for i in range(0, len(fallback), pages_per_batch)]
+        with ProcessPoolExecutor(max_workers=paddle_workers, initializer=init_paddle_worker,
+                                 initargs=(paddle_threads,)) as executor:
+            render_dpi = ocr_options.get("render_dpi", tesseract_ocr.RENDER_DPI)
+            for batch_results in executor.map(paddle_task, batches, [render_dpi] * len(batches)):
+                for result in batch_results:
+                    if result is None:
+                        continue
+                    paddle_kept += result["cascade"]["engine"] == "paddleocr"
+                    save_result(result, output_dir)
+    paddle_time = time.perf_counter() - start
+
+    logging.info(f"PaddleOCR pass: {len(fallback)} pages in {paddle_time:.1f}s, "
+                 f"PaddleOCR result kept for {paddle_kept}")
+    logging.info(f"Cascade finished: {total} pages in {tesseract_time + paddle_time:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR with Tesseract, falling back to PaddleOCR for weak pages.")
+    parser.add_argument('--image-dir', type=Path, default=IMAGE_DIR)
+    parser.add_argument('--pdf-dir', type=Path, default=None, help="Render PDF pages in memory instead of PNGs")
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    parser.add_argument('--min-avg-confidence', type=float, default=MIN_AVG_CONFIDENCE)
+    parser.add_argument('--min-median-confidence', type=float, default=MIN_MEDIAN_CONFIDENCE)
+    parser.add_argument('--max-garbage-ratio', type=float, default=MAX_GARBAGE_RATIO)
+    parser.add_argument('--max-single-char-ratio', type=float, default=MAX_SINGLE_CHAR_RATIO)
+    parser.add_argument('--tesseract-workers', type=int, default=TESSERACT_WORKERS)
+    parser.add_argument('--paddle-workers', type=int, default=PADDLE_WORKERS)
+    parser.add_argument('--paddle-threads', type=int, default=PADDLE_THREADS)
+    parser.add_argument('--pages-per-batch', type=int, default=PADDLE_PAGES_PER_BATCH)
+    parser.add_argument('--single-pass', action='store_true', help="Single-pass Tesseract (see img_to_text_v2)")
+    args = parser.parse_args()
+
+    if args.pdf_dir:
+        sources = list_pdf_pages(args.pdf_dir)
+    else:
+        sources = sorted(f for f in args.image_dir.iterdir()
+                         if f.is_file() and f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff'])
+
+    run_cascade(
+        sources,
+        args.output_dir,
+        thresholds={
+            "min_avg_confidence": args.min_avg_confidence,
+            "min_median_confidence": args.min_median_confidence,
+            "max_garbage_ratio": args.max_garbage_ratio,
+            "max_single_char_ratio": args.max_single_char_ratio,
+        },
+        ocr_options={"single_pass": args.single_pass, "fast_preprocess": True},
+        tesseract_workers=args.tesseract_workers,
+        paddle_workers=args.paddle_workers,
+        paddle_threads=args.paddle_threads,
+        pages_per_batch=args.pages_per_batch,
+    )
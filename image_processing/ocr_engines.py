@@ -0,0 +1,171 @@
+import shlex
+import logging
+import platform
+from pathlib import Path
+import numpy as np
+
+# --- OCR Engine Backends ---
+#
+# Both backends expose the same small interface so the OCR scripts don't care which one runs:
+#   engine.image_to_data(image)   -> dict of columns, same shape as pytesseract.Output.DICT
+#   engine.image_to_string(image) -> page text
+#   engine.image_to_text_and_data(image) -> (text, data), one recognition pass where possible
+#   engine.version                -> Tesseract version string
+#
+# 'tesserocr' keeps one TessBaseAPI (with the LSTM model loaded) alive per process and hands
+# it the numpy buffer directly. 'pytesseract' is the original path: it writes a temp image
+# and starts a tesseract process per call, and is used whenever tesserocr isn't installed.
+
+DEFAULT_ENGINE = 'auto'  # 'auto' = tesserocr if available, otherwise pytesseract
+TSV_INT_COLUMNS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+                   'left', 'top', 'width', 'height']
+
+_engines = {}  # One engine per (backend, config) per process
+
+
+def configure_tesseract_cmd():
+    """Point pytesseract at the tesseract executable for this platform."""
+    import pytesseract
+    if platform.system() == 'Windows':
+        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    elif platform.system() == 'Darwin':
+        # Common paths on macOS, adjust if necessary
+        possible_paths = ['/opt/homebrew/bin/tesseract', '/usr/local/bin/tesseract']
+        tess_path = next((path for path in possible_paths if Path(path).exists()), None)
+        if not tess_path:
+            raise FileNotFoundError("Tesseract executable not found in common paths.")
+        pytesseract.pytesseract.tesseract_cmd = tess_path
+    elif platform.system() == 'Linux':
+        pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract' # Common path on Linux
+
+
+def parse_tesseract_config(config):
+    """Splits a tesseract CLI config ('-l eng --oem 3 --psm 3 -c k=v') into API settings."""
+    lang, oem, psm, variables = 'eng', 3, 3, {}
+    args = shlex.split(config or '')
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == '-l':
+            lang = value
+        elif arg == '--oem':
+            oem = int(value)
+        elif arg == '--psm':
+            psm = int(value)
+        elif arg == '-c' and value and '=' in value:
+            key, _, val = value.partition('=')
+            variables[key] = val
+        else:
+            i += 1
+            continue
+        i += 2
+    return lang, oem, psm, variables
+
+
+def parse_tsv(tsv):
+    """Parses Tesseract TSV output (no header) into pytesseract's Output.DICT layout."""
+    data = {column: [] for column in TSV_INT_COLUMNS + ['conf', 'text']}
+    for row in tsv.splitlines():
+        fields = row.split('\t', 11)
+        if len(fields) < 11 or not fields[0].isdigit():
+            continue
+        for column, value in zip(TSV_INT_COLUMNS, fields):
+            data[column].append(int(value))
+        data['conf'].append(float(fields[10]))
+        data['text'].append(fields[11] if len(fields) > 11 else '')
+    return data
+
+
+class PytesseractEngine:
+    """Original backend: one tesseract subprocess per call."""
+
+    name = 'pytesseract'
+
+    def __init__(self, config):
+        import pytesseract
+        configure_tesseract_cmd()
+        self.pytesseract = pytesseract
+        self.config = config
+        self.version = str(pytesseract.get_tesseract_version())
+
+    def image_to_data(self, image):
+        return self.pytesseract.image_to_data(image, config=self.config,
+                                              output_type=self.pytesseract.Output.DICT)
+
+    def image_to_string(self, image):
+        return self.pytesseract.image_to_string(image, config=self.config)
+
+    def image_to_text_and_data(self, image):
+        return self.image_to_string(image), self.image_to_data(image)
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Persistent in-process backend: the model is loaded once and reused for every page."""
+
+    name = 'tesserocr'
+
+    def __init__(self, config):
+        import tesserocr
+        lang, oem, psm, variables = parse_tesseract_config(config)
+        self.config = config
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, oem=oem, psm=psm)
+        for key, value in variables.items():
+            self.api.SetVariable(key, value)
+        # tesseract_version() returns "tesseract 5.x.y\n leptonica-..."
+        self.version = tesserocr.tesseract_version().split()[1]
+
+    def _set_image(self, image):
+        buffer = np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+        height, width = buffer.shape[:2]
+        bytes_per_pixel = 1 if buffer.ndim == 2 else buffer.shape[2]
+        self.api.SetImageBytes(buffer.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_data(self, image):
+        self._set_image(image)
+        return parse_tsv(self.api.GetTSVText(0))
+
+    def image_to_string(self, image):
+        self._set_image(image)
+        return self.api.GetUTF8Text()
+
+    def image_to_text_and_data(self, image):
+        # The API caches the recognition result, so both outputs come from one pass
+        self._set_image(image)
+        return self.api.GetUTF8Text(), parse_tsv(self.api.GetTSVText(0))
+
+    def close(self):
+        self.api.End()
+
+
+ENGINES = {
+    PytesseractEngine.name: PytesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+
+def get_engine(name=DEFAULT_ENGINE, config=''):
+    """Returns this process's engine for (name, config), creating it on first use.
+
+    'auto' prefers tesserocr and falls back to pytesseract if it can't be loaded.
+    """
+    key = (name, config)
+    if key in _engines:
+        return _engines[key]
+
+    if name == 'auto':
+        try:
+            engine = TesserocrEngine(config)
+        except Exception as e:
+            logging.info(f"tesserocr backend unavailable ({e}), falling back to pytesseract.")
+            engine = PytesseractEngine(config)
+    elif name in ENGINES:
+        engine = ENGINES[name](config)
+    else:
+        raise ValueError(f"Unknown OCR engine '{name}', expected one of: auto, {', '.join(ENGINES)}")
+
+    _engines[key] = engine
+    return engine
@@ -0,0 +1,126 @@
+import os
+import json
+import re
+import random
+import argparse
+from pathlib import Path
+import cv2
+import numpy as np
+from PIL import Image
+
+# --- OCR overlay rendering on demand ---
+#
+# The OCR scripts store recognised boxes in the page JSON instead of drawing a full-size
+# result_*.png for every page. This renders that overlay only for the pages someone wants
+# to look at:
+#
+#   python ocr_overlay.py --json-dir ../corpus/mlk_documents_json_paddle 104-10004-10213_page_0003
+#   python ocr_overlay.py --json-dir ../corpus/mlk_documents_json_paddle --sample 20
+#
+# Page JSON layouts understood:
+#   "ocr_lines": {"boxes": [[x1, y1, ..., x4, y4], ...], "texts": [...], "scores": [...]}  (PaddleOCR)
+#   "words": [[text, left, top, width, height, confidence], ...]                          (Tesseract)
+
+CORPUS_DIR = (Path.cwd().parent / 'corpus').resolve()
+JSON_DIR = (CORPUS_DIR / 'mlk_documents_json_paddle').resolve()
+IMAGE_DIR = (CORPUS_DIR / 'mlk_documents_imgs').resolve()
+
+
+def compact_ocr_lines(boxes, texts, scores):
+    """Packs PaddleOCR quadrilaterals, texts and scores into the page JSON "ocr_lines" field."""
+    return {
+        "boxes": [[int(round(v)) for point in box for v in point] for box in boxes],
+        "texts": list(texts),
+        "scores": [round(float(s), 4) for s in scores],
+    }
+
+
+def overlay_items(page_data):
+    """Returns (quadrilaterals, texts, scores) from either stored box layout."""
+    if "ocr_lines" in page_data:
+        lines = page_data["ocr_lines"]
+        boxes = [np.array(b, dtype=np.int32).reshape(4, 2).tolist() for b in lines["boxes"]]
+        return boxes, lines["texts"], lines["scores"]
+    boxes, texts, scores = [], [], []
+    for text, left, top, width, height, conf in page_data.get("words", []):
+        boxes.append([[left, top], [left + width, top], [left + width, top + height], [left, top + height]])
+        texts.append(text)
+        scores.append(conf)
+    return boxes, texts, scores
+
+
+def load_page_image(page_data, image_dir=IMAGE_DIR, pdf_dir=None, render_dpi=None):
+    """Finds the page image: the PNG in image_dir, or the page re-rendered from its PDF."""
+    filename = page_data["filename"]
+    image_path = Path(image_dir) / filename
+    if image_path.exists():
+        return Image.open(image_path).convert('RGB')
+    if pdf_dir:
+        from pdf_to_images import PdfPage, RENDER_DPI, render_page
+        m = re.match(r'(.+)_page_(\d+)', os.path.splitext(filename)[0])
+        if m:
+            page = PdfPage(Path(pdf_dir) / f"{m.group(1)}.pdf", int(m.group(2)) - 1)
+            bgr = render_page(page, dpi=render_dpi or RENDER_DPI, grayscale=False)
+            return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+    raise FileNotFoundError(f"No image found for {filename}")
+
+
+def draw_overlay(image, boxes, texts, scores):
+    """Draws the boxes (and, with PaddleOCR installed, its side-by-side text panel) on the page."""
+    try:
+        from paddleocr import draw_ocr
+        return Image.fromarray(draw_ocr(image, boxes, texts, scores))
+    except ImportError:
+        canvas = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        for box, score in zip(boxes, scores):
+            color = (0, 160, 0) if score >= 0.8 else (0, 140, 255) if score >= 0.5 else (0, 0, 255)
+            cv2.polylines(canvas, [np.array(box, dtype=np.int32)], True, color, 2)
+        return Image.fromarray(cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB))
+
+
+def render_page_overlay(json_path, output_dir=None, image_dir=IMAGE_DIR, pdf_dir=None):
+    """Renders result_<page>.png for one page JSON. Returns the path written."""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        page_data = json.load(f)
+    boxes, texts, scores = overlay_items(page_data)
+    image = load_page_image(page_data, image_dir, pdf_dir)
+    drawn = draw_overlay(image, boxes, texts, scores)
+    output_path = Path(output_dir or json_path.parent) / f"result_{page_data['filename']}"
+    drawn.save(output_path)
+    image.close()
+    drawn.close()
+    return output_path
+
+
+def resolve_pages(json_dir, pages, sample, seed=0):
+    """JSON paths for the requested page names (with or without extension) or a random sample."""
+    json_dir = Path(json_dir)
+    if pages:
+        return [json_dir / f"{os.path.splitext(p)[0]}.json" for p in pages]
+    all_pages = sorted(p for p in json_dir.glob('*.json') if not p.name.startswith('.'))
+    return sorted(random.Random(seed).sample(all_pages, min(sample, len(all_pages))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render OCR box overlays for selected pages on demand.")
+    parser.add_argument('pages', nargs='*', help="Page names, e.g. 104-10004-10213_page_0003")
+    parser.add_argument('--json-dir', type=Path, default=JSON_DIR)
+    parser.add_argument('--image-dir', type=Path, default=IMAGE_DIR)
+    parser.add_argument('--pdf-dir', type=Path, default=None,
+                        help="Re-render the page from its PDF when the PNG isn't on disk")
+    parser.add_argument('--output-dir', type=Path, default=None, help="Defaults to the JSON directory")
+    parser.add_argument('--sample', type=int, default=0, help="Render this many random pages")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.pages and not args.sample:
+        parser.error("give page names or --sample N")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for json_path in resolve_pages(args.json_dir, args.pages, args.sample, args.seed):
+        try:
+            print(f"Overlay saved as {render_page_overlay(json_path, args.output_dir, args.image_dir, args.pdf_dir)}")
+        except Exception as e:
+            print(f"Failed to render overlay for {json_path.name}: {e}")
@@ -2,9 +2,12 @@ import os
 import json
 import re
 from pathlib import Path
-from paddleocr import PaddleOCR, draw_ocr
+import paddleocr
+from paddleocr import PaddleOCR
 from PIL import Image
 import logging
+from ocr_overlay import compact_ocr_lines
+from ocr_cache import cache_key, get_cache, source_digest
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,6 +23,10 @@ except Exception as e:
 input_directory = (Path.cwd().parent / 'corpus' / 'mlk_documents_imgs').resolve()
 output_directory = (Path.cwd().parent / 'corpus' / 'mlk_documents_json_paddle').resolve()
 
+# Reuse results for unchanged pages from the content-addressed OCR cache (see ocr_cache.py)
+USE_CACHE = True
+cache = get_cache() if USE_CACHE else None
+
 # Create output directory if it doesn't exist
 os.makedirs(output_directory, exist_ok=True)
 
@@ -35,12 +42,22 @@ for i, png_file in enumerate(png_files, 1):
     page_match = re.search(r'_page_(\d+)', png_file)
     page_number = int(page_match.group(1)) if page_match else 1  # Default to 1 if no match
     
-    # Run OCR on the image
-    try:
-        result = ocr.ocr(img_path, cls=True)
-    except Exception as e:
-        logging.error(f"OCR failed for {png_file}: {e}")
-        continue
+    # Run OCR on the image (or take the result from the cache if this image was OCR'd before)
+    key = None
+    result = None
+    if cache:
+        key = cache_key(source_digest(img_path), 'PaddleOCR', paddleocr.__version__,
+                        {"use_angle_cls": True, "lang": "en", "pipeline": "ocr"}, None)
+        result = cache.get(key)
+    if result is None:
+        try:
+            result = ocr.ocr(img_path, cls=True)
+        except Exception as e:
+            logging.error(f"OCR failed for {png_file}: {e}")
+            continue
+        if key:
+            cache.put(key, [[[box, [text, float(score)]] for box, (text, score) in (page or [])]
+                            for page in (result or [])])
     
     # Assuming single-page image, take the first (and only) result
     if not result or not result[0]:
@@ -60,8 +77,8 @@ for i, png_file in enumerate(png_files, 1):
     
     # Get image dimensions
     try:
-        image = Image.open(img_path).convert('RGB')
-        width, height = image.size
+        with Image.open(img_path) as image:
+            width, height = image.size
     except Exception as e:
         logging.error(f"Failed to open image {png_file}: {e}")
         continue
@@ -76,7 +93,9 @@ for i, png_file in enumerate(png_files, 1):
             "text_blocks": num_blocks
         },
         "filename": png_file,
-        "text": all_text.strip()
+        "text": all_text.strip(),
+        # Boxes are kept so overlays can be drawn on demand with ocr_overlay.py
+        "ocr_lines": compact_ocr_lines(rec_boxes, rec_texts, rec_scores)
     }
     
     # Save JSON output
@@ -88,12 +107,3 @@ for i, png_file in enumerate(png_files, 1):
     except Exception as e:
         logging.error(f"Failed to save JSON for {png_file}: {e}")
         continue
-    
-    # Visualize results
-    try:
-        output_image_path = os.path.join(output_directory, f'result_{png_file}')
-        im_show = draw_ocr(image, rec_boxes, rec_texts, rec_scores, font_path=None)
-        im_show.save(output_image_path)
-        logging.info(f"Visualized output saved as {output_image_path}")
-    except Exception as e:
-        logging.error(f"Failed to save visualized output for {png_file}: {e}")
\ No newline at end of file
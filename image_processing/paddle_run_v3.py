@@ -1,10 +1,18 @@
 import os
 import json
 import re
+import time
+import argparse
 from pathlib import Path
-from paddleocr import PaddleOCR, draw_ocr
-from PIL import Image
+import cv2
+import numpy as np
+import paddleocr
+from paddleocr import PaddleOCR
 import concurrent.futures
+from pdf_to_images import PdfPage, RENDER_DPI, list_pdf_pages, render_page
+from ocr_overlay import compact_ocr_lines
+from ocr_cache import CACHE_PATH, MAX_CACHE_BYTES, cache_key, get_cache, source_digest
+from blank_pages import classify_page, should_skip
 
 # Use single-threading for reliability.
 os.environ['OMP_NUM_THREADS'] = '1'
@@ -14,64 +22,238 @@ input_dir = Path.cwd().parent / 'corpus' / 'mlk_documents_imgs'
 output_dir = Path.cwd().parent / 'corpus' / 'mlk_documents_json_paddle'
 output_dir.mkdir(parents=True, exist_ok=True)
 
-def process_image(img_path_str, output_dir_str):
+# Throughput settings (overridable from the command line)
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+THREADS_PER_WORKER = 2   # Paddle intra-op (cpu_threads) per worker
+PAGES_PER_BATCH = 4      # Pages detected together and whose text crops are recognised in one call
+REC_BATCH_NUM = 32       # Crops per recognition forward pass
+DROP_SCORE = 0.5         # Same cut-off PaddleOCR applies in its own det+rec pipeline
+USE_CACHE = True         # Reuse results for unchanged pages from the OCR cache (see ocr_cache.py)
+SKIP_BLANK = True        # Write a stub instead of OCRing blank pages (see blank_pages.py)
+
+# Settings that change the OCR output (part of the cache key)
+OCR_PARAMS = {"use_angle_cls": True, "lang": "en", "drop_score": DROP_SCORE, "pipeline": "det + batched rec"}
+
+ocr = None  # This worker's PaddleOCR instance, loaded once by init_worker
+
+
+def init_worker(threads_per_worker=THREADS_PER_WORKER, rec_batch_num=REC_BATCH_NUM):
+    """Pool initializer: load the detection, classification and recognition models once per process."""
+    global ocr
+    threads = str(threads_per_worker)
+    os.environ['OMP_NUM_THREADS'] = threads
+    os.environ['MKL_NUM_THREADS'] = threads
+    cv2.setNumThreads(threads_per_worker)
+    ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False, cpu_threads=threads_per_worker,
+                    rec_batch_num=rec_batch_num, cls_batch_num=rec_batch_num, show_log=False)
+
+
+def sorted_boxes(boxes):
+    """Top-to-bottom, left-to-right reading order (boxes within 10px vertically count as one line)."""
+    boxes = sorted(boxes, key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_box(img, box):
+    """Perspective-crops a detected quadrilateral, rotating tall crops upright like PaddleOCR does."""
+    points = np.array(box, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    M = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(img, M, (width, height), borderMode=cv2.BORDER_REPLICATE,
+                               flags=cv2.INTER_CUBIC)
+    if crop.shape[0] * 1.0 / max(crop.shape[1], 1) >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def page_filename(source):
+    return source.name if isinstance(source, PdfPage) else Path(source).name
+
+
+def load_page(source, render_dpi=RENDER_DPI):
+    """Returns (filename, BGR image) for an image path or a PdfPage rendered in memory."""
+    if isinstance(source, PdfPage):
+        return source.name, render_page(source, dpi=render_dpi, grayscale=False)
+    return page_filename(source), cv2.imread(str(source))
+
+
+def ocr_pages(images):
+    """Detects text on each page, then recognises the crops of all pages in one batched call.
+
+    Returns one list of (box, text, score) per page.
+    """
+    page_boxes = []
+    crops = []
+    for img in images:
+        det = ocr.ocr(img, det=True, rec=False, cls=False)
+        boxes = sorted_boxes([np.array(b).tolist() for b in (det[0] or [])]) if det else []
+        page_boxes.append(boxes)
+        crops.extend(crop_box(img, box) for box in boxes)
+
+    # Wrapped in an outer list so PaddleOCR treats the crops as one batch of one "image"; a flat
+    # list would be taken as separate images, each returning its own result list
+    rec = ocr.ocr([crops], det=False, cls=True)[0] if crops else []
+    assert len(rec) == len(crops), f"recognizer returned {len(rec)} results for {len(crops)} crops"
+
+    results = []
+    offset = 0
+    for boxes in page_boxes:
+        page_rec = rec[offset:offset + len(boxes)]
+        offset += len(boxes)
+        results.append([(box, text, float(score)) for box, (text, score) in zip(boxes, page_rec)
+                        if score >= DROP_SCORE])
+    return results
+
+
+def write_page(filename, dimensions, lines, output_dir, page_class=None):
+    m = re.search(r'_page_(\d+)', filename)
+    page = int(m.group(1)) if m else 1
+    stem = os.path.splitext(filename)[0]
+
+    texts = [text for _, text, _ in lines]
+    scores = [score for _, _, score in lines]
+    boxes = [box for box, _, _ in lines]
+    num = len(texts)
+    avg = sum(scores) / num if num else 0
+
+    data = {
+        "metadata": {
+            "page_number": page,
+            "confidence": round(avg, 4),
+            "dimensions": list(dimensions),
+            "ocr_engine": "PaddleOCR",
+            "text_blocks": num
+        },
+        "filename": filename,
+        "text": "\n".join(texts).strip(),
+        # Boxes are kept so overlays can be drawn on demand with ocr_overlay.py
+        "ocr_lines": compact_ocr_lines(boxes, texts, scores)
+    }
+    if page_class:
+        # Page wasn't OCR'd; the stub keeps the document's page numbering intact
+        data["metadata"]["ocr_engine"] = None
+        data["metadata"]["page_class"] = page_class
+
+    json_out = output_dir / f"{stem}.json"
+    with open(json_out, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def process_batch(sources, output_dir_str, render_dpi=RENDER_DPI, use_cache=USE_CACHE,
+                  cache_path=CACHE_PATH, cache_max_bytes=MAX_CACHE_BYTES, skip_blank=SKIP_BLANK):
+    """Worker task: OCR a batch of pages with this worker's model. Returns one status line per page.
+
+    Pages found in the OCR cache are written straight from it without being decoded or OCR'd,
+    and blank pages (with skip_blank) get a stub JSON without going through the model.
+    """
+    output_dir = Path(output_dir_str)
+    cache = get_cache(cache_path, cache_max_bytes) if use_cache else None
+    statuses = []
+    loaded = []
+    for source in sources:
+        try:
+            key = None
+            if cache:
+                key = cache_key(source_digest(source, render_dpi), 'PaddleOCR', paddleocr.__version__,
+                                OCR_PARAMS, None)
+                cached = cache.get(key)
+                if cached:
+                    filename = page_filename(source)
+                    if cached["lines"]:
+                        write_page(filename, cached["dimensions"], cached["lines"], output_dir)
+                        statuses.append(f"OK {filename} (cached)")
+                    else:
+                        statuses.append(f"SKIP {filename} (cached)")
+                    continue
+            filename, img = load_page(source, render_dpi)
+            if img is None:
+                statuses.append(f"ERROR {source}: could not read image")
+                continue
+            if skip_blank:
+                page_class, _ = classify_page(img)
+                if should_skip(page_class):
+                    h, w = img.shape[:2]
+                    write_page(filename, [w, h], [], output_dir, page_class=page_class)
+                    statuses.append(f"BLANK {filename}")
+                    continue
+            loaded.append((filename, img, key))
+        except Exception as e:
+            statuses.append(f"ERROR {source}: {e}")
+
     try:
-        img_path = Path(img_path_str)
-        output_dir = Path(output_dir_str)
-        m = re.search(r'_page_(\d+)', img_path.name)
-        page = int(m.group(1)) if m else 1
-
-        ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
-        res = ocr.ocr(str(img_path), cls=True)
-        if not res or not isinstance(res[0], list):
-            return f"SKIP {img_path.name}"
-
-        lines = res[0]
-        texts = [line[1][0] for line in lines]
-        scores = [line[1][1] for line in lines]
-        boxes = [line[0] for line in lines]
-        num = len(texts)
-        avg = sum(scores) / num if num else 0
-
-        img = Image.open(img_path).convert('RGB')
-        w, h = img.size
-
-        data = {
-            "metadata": {
-                "page_number": page,
-                "confidence": round(avg, 4),
-                "dimensions": [w, h],
-                "ocr_engine": "PaddleOCR",
-                "text_blocks": num
-            },
-            "filename": img_path.name,
-            "text": "\n".join(texts).strip()
-        }
-
-        json_out = output_dir / f"{img_path.stem}.json"
-        with open(json_out, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-
-        drawn = draw_ocr(img, boxes, texts, scores)
-        out_img = Image.fromarray(drawn)
-        out_img.save(output_dir / f"result_{img_path.name}")
-        img.close()
-        out_img.close()
-        return f"OK {img_path.name}"
+        results = ocr_pages([img for _, img, _ in loaded])
     except Exception as e:
-        return f"ERROR {img_path_str}: {e}"
+        return statuses + [f"ERROR {filename}: {e}" for filename, _, _ in loaded]
 
+    for (filename, img, key), lines in zip(loaded, results):
+        h, w = img.shape[:2]
+        if key:
+            cache.put(key, {"dimensions": [w, h], "lines": lines})
+        if not lines:
+            statuses.append(f"SKIP {filename}")
+            continue
+        try:
+            write_page(filename, [w, h], lines, output_dir)
+            statuses.append(f"OK {filename}")
+        except Exception as e:
+            statuses.append(f"ERROR {filename}: {e}")
+    return statuses
 
 
 if __name__ == '__main__':
-    os.environ['OMP_NUM_THREADS'] = '1'
-    os.environ['MKL_NUM_THREADS'] = '1'
-    input_dir = Path.cwd().parent / 'corpus' / 'mlk_documents_imgs'
-    output_dir = Path.cwd().parent / 'corpus' / 'mlk_documents_json_paddle'
-    output_dir.mkdir(parents=True, exist_ok=True)
-    img_files = [str(f) for f in input_dir.glob('*.png')]
-
-    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
-        futures = {executor.submit(process_image, img_path, str(output_dir)): img_path for img_path in img_files}
+    parser = argparse.ArgumentParser(description="OCR page images with PaddleOCR, one model per worker process.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--threads-per-worker', type=int, default=THREADS_PER_WORKER,
+                        help="Paddle intra-op threads per worker")
+    parser.add_argument('--pages-per-batch', type=int, default=PAGES_PER_BATCH)
+    parser.add_argument('--rec-batch-num', type=int, default=REC_BATCH_NUM)
+    parser.add_argument('--pdf-dir', type=Path, default=None,
+                        help="Render pages of the PDFs in this directory in memory instead of reading PNGs")
+    parser.add_argument('--dpi', type=int, default=RENDER_DPI, help="Render resolution for --pdf-dir")
+    parser.add_argument('--no-cache', action='store_true', default=not USE_CACHE,
+                        help="OCR every page even if its result is in the content-addressed cache")
+    parser.add_argument('--cache-path', type=Path, default=CACHE_PATH)
+    parser.add_argument('--cache-max-gb', type=float, default=MAX_CACHE_BYTES / 1024 ** 3)
+    parser.add_argument('--no-skip-blank', action='store_true', default=not SKIP_BLANK,
+                        help="OCR blank pages instead of writing a stub JSON for them")
+    args = parser.parse_args()
+
+    if args.pdf_dir:
+        sources = list_pdf_pages(args.pdf_dir)
+    else:
+        sources = [str(f) for f in sorted(input_dir.glob('*.png'))]
+    batches = [sources[i:i + args.pages_per_batch] for i in range(0, len(sources), args.pages_per_batch)]
+
+    start = time.perf_counter()
+    done = 0
+    blank = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                                initargs=(args.threads_per_worker, args.rec_batch_num)) as executor:
+        futures = {executor.submit(process_batch, batch, str(output_dir), args.dpi, not args.no_cache,
+                                   args.cache_path, int(args.cache_max_gb * 1024 ** 3),
+                                   not args.no_skip_blank): len(batch) for batch in batches}
         for fut in concurrent.futures.as_completed(futures):
-            print(fut.result())
+            for status in fut.result():
+                print(status)
+                blank += status.startswith("BLANK")
+            done += futures[fut]
+            elapsed = time.perf_counter() - start
+            print(f"{done}/{len(sources)} pages, {done / elapsed:.2f} pages/sec")
+
+    elapsed = time.perf_counter() - start
+    print(f"Finished {len(sources)} pages in {elapsed:.1f}s ({len(sources) / elapsed if elapsed else 0:.2f} pages/sec) "
+          f"with {args.workers} workers x {args.threads_per_worker} threads")
+    ocr_pages_done = len(sources) - blank
+    if blank and ocr_pages_done:
+        # Pool throughput per OCR'd page, so an estimate of wall time rather than CPU time
+        print(f"Blank pages skipped: {blank}, estimated time saved: {blank * elapsed / ocr_pages_done:.1f}s")
+    elif blank:
+        print(f"Blank pages skipped: {blank}")
@@ -0,0 +1,139 @@
+import os
+import argparse
+import logging
+from pathlib import Path
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+# --- In-memory PDF rasterization ---
+#
+# Renders PDF pages with pdfium straight into numpy arrays so they can go to preprocessing
+# and OCR without the PNG encode/write/read/decode round trip of the Java PDFToPNG tool.
+# Run as a script it does the same job as PDFToPNG (PNG files on disk) for when images
+# are actually wanted.
+
+CORPUS_DIR = (Path.cwd().parent / 'corpus').resolve()
+PDF_DIR = (CORPUS_DIR / 'jfk_documents').resolve()
+IMAGE_DIR = (CORPUS_DIR / 'jfk_documents_imgs').resolve()
+
+RENDER_DPI = 300  # Same as PDFToPNG
+NUM_WORKERS = 6
+
+
+class PdfPage(NamedTuple):
+    """One page of a PDF, named like the PNGs PDFToPNG writes so downstream scripts see the same files."""
+    pdf_path: Path
+    index: int  # 0-based
+
+    @property
+    def stem(self):
+        return f"{self.pdf_path.stem}_page_{self.index + 1:04d}"
+
+    @property
+    def name(self):
+        return f"{self.stem}.png"
+
+
+_open_document = (None, None)  # (path, PdfDocument), the last document opened in this process
+
+
+def _document(pdf_path):
+    global _open_document
+    import pypdfium2 as pdfium
+    path, doc = _open_document
+    if path != pdf_path:
+        if doc is not None:
+            doc.close()
+        doc = pdfium.PdfDocument(str(pdf_path))
+        _open_document = (pdf_path, doc)
+    return doc
+
+
+def list_pdfs(pdf_dir):
+    return sorted(f for f in Path(pdf_dir).iterdir()
+                  if f.suffix.lower() == '.pdf' and not f.name.startswith('.'))
+
+
+def page_count(pdf_path):
+    import pypdfium2 as pdfium
+    doc = pdfium.PdfDocument(str(pdf_path))
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def list_pdf_pages(pdf_dir):
+    """Every page of every PDF in pdf_dir, in document then page order."""
+    pages = []
+    for pdf_path in list_pdfs(pdf_dir):
+        try:
+            pages.extend(PdfPage(pdf_path, i) for i in range(page_count(pdf_path)))
+        except Exception as e:
+            logging.error(f"Could not open {pdf_path.name}: {e}")
+    return pages
+
+
+def render_page(page, dpi=RENDER_DPI, grayscale=True):
+    """Renders one PdfPage to a uint8 array: (h, w) in grayscale, (h, w, 3) BGR otherwise."""
+    pdf_page = _document(page.pdf_path)[page.index]
+    try:
+        bitmap = pdf_page.render(scale=dpi / 72, grayscale=grayscale, rev_byteorder=False)
+        # Copy out of the pdfium bitmap before it is freed
+        image = np.array(bitmap.to_numpy(), copy=True)
+    finally:
+        pdf_page.close()
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    elif image.ndim == 3 and image.shape[2] == 4:
+        image = image[:, :, :3]
+    return image
+
+
+def iter_pdf_pages(pdf_path, dpi=RENDER_DPI, grayscale=True):
+    """Yields (PdfPage, image) for every page of a PDF, one page in memory at a time."""
+    for i in range(page_count(pdf_path)):
+        page = PdfPage(Path(pdf_path), i)
+        yield page, render_page(page, dpi, grayscale)
+
+
+def save_png(image, output_path):
+    import cv2
+    cv2.imwrite(str(output_path), image)
+
+
+def convert_pdf_to_images(pdf_path, output_dir, dpi=RENDER_DPI, grayscale=True):
+    """Writes every page of one PDF as a PNG. Returns the number of pages written."""
+    count = 0
+    for page, image in iter_pdf_pages(pdf_path, dpi, grayscale):
+        save_png(image, Path(output_dir) / page.name)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Render PDF pages to PNG files (Python replacement for PDFToPNG).")
+    parser.add_argument('--pdf-dir', type=Path, default=PDF_DIR)
+    parser.add_argument('--output-dir', type=Path, default=IMAGE_DIR)
+    parser.add_argument('--dpi', type=int, default=RENDER_DPI)
+    parser.add_argument('--color', action='store_true', help="Render in colour instead of grayscale")
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    pdfs = list_pdfs(args.pdf_dir)
+    # Largest first, like PDFToPNG, so the long documents don't finish last
+    pdfs.sort(key=lambda p: p.stat().st_size, reverse=True)
+
+    pages_processed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(convert_pdf_to_images, pdf, args.output_dir, args.dpi, not args.color): pdf
+                   for pdf in pdfs}
+        for fut in as_completed(futures):
+            try:
+                pages_processed += fut.result()
+                logging.info(f"Pages Processed: {pages_processed} ({futures[fut].name} done)")
+            except Exception as e:
+                logging.error(f"Exception while converting PDF: {futures[fut].name}: {e}")
@@ -0,0 +1,205 @@
+import os
+import re
+import csv
+import json
+import time
+import random
+import logging
+import argparse
+import itertools
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from img_to_text_v2 import (IMAGE_DIR, OCR_ENGINE, OCR_POOL_CONTEXT, PREPROCESS_PARAMS, TESSERACT_CONFIG,
+                            PreprocessBuffers, confidences_from_ocr_data, init_ocr_worker, preprocess_image_fast,
+                            preprocess_image_for_ocr, stage_timer)
+from ocr_engines import ENGINES, get_engine
+
+# --- Preprocessing / OCR parameter sweep ---
+#
+# Runs a grid (or random) search of preprocessing parameters and Tesseract page segmentation
+# modes over a stratified sample of local page images, spread across a process pool, and
+# reports throughput, per-stage time and confidence for every parameter set. Nothing is
+# downloaded and the OCR cache is bypassed, so timings are real.
+#
+#   python sweep_ocr_params.py --image-dir ../corpus/sample_pages --sample 60
+#   python sweep_ocr_params.py --random 20 --csv sweep.csv
+#   python sweep_ocr_params.py --grid my_grid.json      (JSON object: parameter -> list of values)
+
+SAMPLE_SIZE = 40
+STRATA = 4               # Pages are stratified by file size quantile (a proxy for how dense the page is)
+WORKERS = os.cpu_count() or 1
+
+# Default search space; "psm" is Tesseract's page segmentation mode, the rest are preprocessing parameters
+PARAM_GRID = {
+    "psm": [3, 6],
+    "contrast_alpha": [1.0, 1.5, 2.0],
+    "adaptive_thresh_block_size": [21, 31, 41],
+    "adaptive_thresh_C": [5, 10, 15],
+    "apply_deskew": [False, True],
+}  # 108 sets; use --random N for a quicker look or --grid to add brightness_beta, apply_noise_reduction, ...
+
+STAGES = ['read', 'grayscale', 'deskew', 'denoise', 'contrast', 'sharpen', 'threshold', 'ocr']
+
+_buffers = PreprocessBuffers()
+
+
+def stratified_sample(image_dir, size=SAMPLE_SIZE, strata=STRATA, seed=0):
+    """Samples pages evenly across file size quantiles so blank, light and dense pages are all represented."""
+    images = sorted(f for f in Path(image_dir).iterdir()
+                    if f.is_file() and f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.tif', '.tiff'])
+    if len(images) <= size:
+        return images
+    images.sort(key=lambda f: f.stat().st_size)
+    rng = random.Random(seed)
+    buckets = [list(bucket) for bucket in np.array_split(np.array(images, dtype=object), strata)]
+    per_bucket = [size // strata + (1 if i < size % strata else 0) for i in range(strata)]
+    sample = []
+    for bucket, n in zip(buckets, per_bucket):
+        sample.extend(rng.sample(bucket, min(n, len(bucket))))
+    return sorted(sample)
+
+
+def parameter_sets(grid, random_count=0, seed=0):
+    """Every combination of the grid, or random_count distinct combinations drawn from it."""
+    names = sorted(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if random_count and random_count < len(combos):
+        combos = random.Random(seed).sample(combos, random_count)
+    return combos
+
+
+def tesseract_config(psm):
+    return re.sub(r'--psm \d+', f'--psm {psm}', TESSERACT_CONFIG)
+
+
+def evaluate_page(image_path, param_set, engine=OCR_ENGINE, fast_preprocess=True):
+    """Worker task: preprocess and OCR one page with one parameter set.
+
+    Returns (per-stage seconds, page seconds, avg confidence, median confidence, word count),
+    or None if the page could not be processed.
+    """
+    params = {**PREPROCESS_PARAMS, **{k: v for k, v in param_set.items() if k != "psm"}}
+    ocr = get_engine(engine, tesseract_config(param_set.get("psm", 3)))
+    timings = {}
+    start = time.perf_counter()
+    try:
+        if fast_preprocess:
+            img = preprocess_image_fast(str(image_path), buffers=_buffers, timings=timings, **params)
+        else:
+            img = preprocess_image_for_ocr(image_path, filename=Path(image_path).name, timings=timings, **params)
+        if img is None:
+            return None
+        with stage_timer(timings, 'ocr'):
+            data = ocr.image_to_data(img)
+    except Exception as e:
+        logging.error(f"Sweep failed on {image_path} with {param_set}: {e}")
+        return None
+    avg_confidence, median_confidence = confidences_from_ocr_data(data)
+    words = sum(1 for w in data['text'] if isinstance(w, str) and w.strip())
+    return timings, time.perf_counter() - start, avg_confidence, median_confidence, words
+
+
+def run_sweep(images, sets, workers=WORKERS, engine=OCR_ENGINE, fast_preprocess=True):
+    """Evaluates every (parameter set, page) pair across the pool. Returns one summary row per set."""
+    per_set = defaultdict(lambda: {"stages": defaultdict(float), "seconds": 0.0, "avg": [], "median": [],
+                                   "words": 0, "failed": 0})
+    total = len(images) * len(sets)
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=OCR_POOL_CONTEXT, initializer=init_ocr_worker,
+                             initargs=(1, engine)) as executor:
+        futures = {executor.submit(evaluate_page, image_path, param_set, engine, fast_preprocess): set_id
+                   for set_id, param_set in enumerate(sets) for image_path in images}
+        for fut in as_completed(futures):
+            stats = per_set[futures[fut]]
+            result = fut.result()
+            done += 1
+            if done % 100 == 0 or done == total:
+                logging.info(f"{done}/{total} page evaluations")
+            if result is None:
+                stats["failed"] += 1
+                continue
+            timings, seconds, avg_confidence, median_confidence, words = result
+            for stage, t in timings.items():
+                stats["stages"][stage] += t
+            stats["seconds"] += seconds
+            stats["avg"].append(avg_confidence)
+            stats["median"].append(median_confidence)
+            stats["words"] += words
+
+    rows = []
+    for set_id, param_set in enumerate(sets):
+        stats = per_set[set_id]
+        pages = len(stats["avg"])
+        row = dict(param_set)
+        row.update({
+            "pages": pages,
+            "failed": stats["failed"],
+            # Throughput of one worker; multiply by the worker count for the whole pool
+            "pages_per_sec": round(pages / stats["seconds"], 3) if stats["seconds"] else 0.0,
+            "avg_confidence": round(float(np.mean(stats["avg"])), 4) if pages else 0.0,
+            "median_confidence": round(float(np.median(stats["median"])), 4) if pages else 0.0,
+            "words_per_page": round(stats["words"] / pages, 1) if pages else 0.0,
+        })
+        for stage in STAGES:
+            row[f"{stage}_ms"] = round(stats["stages"].get(stage, 0.0) * 1000 / pages, 1) if pages else 0.0
+        rows.append(row)
+    return sorted(rows, key=lambda r: (r["avg_confidence"], r["pages_per_sec"]), reverse=True)
+
+
+def print_table(rows, param_names, limit=None):
+    columns = param_names + ["pages_per_sec", "avg_confidence", "median_confidence", "words_per_page",
+                             "deskew_ms", "threshold_ms", "ocr_ms"]
+    widths = [max(len(c), 8) + 2 for c in columns]
+    print("".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows[:limit]:
+        print("".join(f"{str(row[c]):>{w}}" for c, w in zip(columns, widths)))
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Sweep preprocessing and Tesseract parameters over a page sample.")
+    parser.add_argument('--image-dir', type=Path, default=IMAGE_DIR)
+    parser.add_argument('--sample', type=int, default=SAMPLE_SIZE, help="Pages in the stratified sample")
+    parser.add_argument('--strata', type=int, default=STRATA)
+    parser.add_argument('--grid', type=Path, default=None, help="JSON file mapping parameter names to value lists")
+    parser.add_argument('--random', type=int, default=0, help="Evaluate this many random combinations of the grid")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--engine', choices=['auto', *ENGINES], default=OCR_ENGINE)
+    parser.add_argument('--legacy-preprocess', action='store_true',
+                        help="Time preprocess_image_for_ocr instead of preprocess_image_fast")
+    parser.add_argument('--csv', type=Path, default=None, help="Also write every row to this CSV file")
+    parser.add_argument('--top', type=int, default=25, help="Rows to print (all rows go to the CSV)")
+    args = parser.parse_args()
+
+    grid = PARAM_GRID
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+    unknown = set(grid) - set(PREPROCESS_PARAMS) - {"psm", "apply_deskew"}
+    if unknown:
+        parser.error(f"unknown parameters in grid: {', '.join(sorted(unknown))}")
+
+    images = stratified_sample(args.image_dir, args.sample, args.strata, args.seed)
+    if not images:
+        parser.error(f"no images found in {args.image_dir}")
+    sets = parameter_sets(grid, args.random, args.seed)
+    logging.info(f"{len(sets)} parameter sets x {len(images)} pages on {args.workers} workers")
+
+    start = time.perf_counter()
+    rows = run_sweep(images, sets, args.workers, args.engine, not args.legacy_preprocess)
+    logging.info(f"Sweep finished in {time.perf_counter() - start:.1f}s")
+
+    print_table(rows, sorted(grid), args.top)
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"\nWrote {len(rows)} rows to {args.csv}")
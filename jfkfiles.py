@@ -0,0 +1,318 @@
+import os
+import ast
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# --- Pipeline orchestrator ---
+#
+# Runs the README steps as a DAG from one place:
+#
+#   download -> rasterize -> ocr -> combine -> nlp -> mysql   (mysql also reads download's URL index)
+#                                      combine -> search_index
+#                                      combine -> vector_index
+#
+# Each stage declares the files it reads (globs relative to the repo root) and writes. A
+# stage reruns only when the content hash of its inputs, its code or its arguments changed
+# since its last successful run, or when its outputs are missing. Its code is the script plus
+# every module it imports from its own directory (followed transitively) and any modules
+# listed in `code` (ones it puts on sys.path itself). Stages whose dependencies
+# are done run concurrently. Every script is started from its own directory, since they all
+# locate the corpus through Path.cwd().parent.
+#
+#   python jfkfiles.py --dry-run            (what would rebuild, and why)
+#   python jfkfiles.py                      (everything that is out of date)
+#   python jfkfiles.py nlp --jobs 2         (nlp and whatever it depends on)
+#   python jfkfiles.py --force ocr          (rerun ocr and everything downstream of it)
+
+ROOT = Path(__file__).resolve().parent
+CORPUS_DIR = ROOT / 'corpus'
+STATE_PATH = CORPUS_DIR / 'pipeline_state.sqlite'
+CHUNK_SIZE = 1024 * 1024
+
+
+class Stage(NamedTuple):
+    name: str
+    script: str            # Relative to ROOT; run from its own directory
+    args: tuple = ()
+    deps: tuple = ()       # Stages that must finish first
+    inputs: tuple = ()     # Globs relative to ROOT whose content decides whether to rerun
+    outputs: tuple = ()    # Paths relative to ROOT that must exist for the stage to count as built
+    source: bool = False   # Reads from the network; only reruns when forced, refreshed or missing outputs
+    code: tuple = ()       # Extra modules (relative to ROOT) the script imports from outside its directory
+
+
+STAGES = [
+    Stage('download', 'download/download.py', ('--output-dir', '../corpus/jfk_documents'),
+          outputs=('corpus/jfk_documents', 'corpus/document_urls.json'), source=True),
+    Stage('rasterize', 'image_processing/pdf_to_images.py', deps=('download',),
+          inputs=('corpus/jfk_documents/*.pdf',), outputs=('corpus/jfk_documents_imgs',)),
+    Stage('ocr', 'image_processing/img_to_text_v2.py', ('--workers', str(os.cpu_count() or 1)), deps=('rasterize',),
+          inputs=('corpus/jfk_documents_imgs/*.png',), outputs=('corpus/jfk_documents_json_v2',)),
+    Stage('combine', 'text_post_processing/combine_docs.py', ('--input-dir', '../corpus/jfk_documents_json_v2'),
+          deps=('ocr',), inputs=('corpus/jfk_documents_json_v2/*.json',),
+          outputs=('corpus/jfk_combined_documents_json',)),
+    Stage('nlp', 'text_post_processing/clean_text.py', deps=('combine',),
+          inputs=('corpus/jfk_combined_documents_json/*.json', 'text_post_processing/ocr_corrections.json'),
+          outputs=('corpus/jfk_combined_documents_json_nlp',)),
+    # URLs are joined from corpus/document_urls.json at import time, no merged copy of the corpus needed.
+    # combine and nlp also write their page store groups (corpus/page_store/*.parquet), which mysql and
+    # vector_index read instead of the JSON while they are current.
+    # --sync writes only the pages that changed (a full bulk load when the database is empty)
+    Stage('mysql', 'web/mysql/import.py', ('--sync',), deps=('nlp', 'download'),
+          inputs=('corpus/jfk_combined_documents_json_nlp/*.json', 'corpus/document_urls.json',
+                  'corpus/page_store/nlp.parquet'), code=('text_post_processing/page_store.py',)),
+    Stage('search_index', 'text_post_processing/search_index.py', ('build',), deps=('combine',),
+          inputs=('corpus/jfk_combined_documents_json/*.json',), outputs=('corpus/search_index',)),
+    Stage('vector_index', 'llm/build_vector_store.py', deps=('combine',),
+          inputs=('corpus/jfk_combined_documents_json/*.json', 'corpus/page_store/ocr.parquet'),
+          outputs=('corpus/faiss_index',), code=('text_post_processing/page_store.py',)),
+]
+
+
+def code_files(stage):
+    """The stage's script, the modules it imports from its own directory (transitively) and its
+    extra code modules, as sorted paths."""
+    found = set()
+    pending = [ROOT / stage.script] + [ROOT / path for path in stage.code]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        for node in ast.walk(ast.parse(path.read_bytes(), filename=str(path))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = path.parent / f"{name.split('.')[0]}.py"
+                if module.is_file():
+                    pending.append(module)
+    return sorted(found)
+
+
+class PipelineState:
+    """Last successful fingerprint per stage, plus file hashes memoised on (size, mtime)."""
+
+    def __init__(self, path=STATE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL
+            )
+            """)
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS stages (
+                name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, finished_at REAL NOT NULL, seconds REAL NOT NULL
+            )
+            """)
+        self._hashes = {row[0]: row[1:] for row in
+                        self.conn.execute("SELECT path, size, mtime_ns, sha256 FROM file_hashes")}
+        self._new_hashes = []
+
+    def file_hash(self, path):
+        stat = path.stat()
+        key = str(path.relative_to(ROOT))
+        cached = self._hashes.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        self._hashes[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        self._new_hashes.append((key, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def fingerprint(self, stage):
+        """Content hash of the stage's code, arguments and input files."""
+        hasher = hashlib.sha256()
+        hasher.update(repr((stage.script, stage.args)).encode('utf-8'))
+        for path in code_files(stage):
+            hasher.update(str(path.relative_to(ROOT)).encode('utf-8'))
+            hasher.update(self.file_hash(path).encode('ascii'))
+        for pattern in stage.inputs:
+            for path in sorted(ROOT.glob(pattern)):
+                if path.is_file() and not path.name.startswith('.'):
+                    hasher.update(str(path.relative_to(ROOT)).encode('utf-8'))
+                    hasher.update(self.file_hash(path).encode('ascii'))
+        self.save_hashes()
+        return hasher.hexdigest()
+
+    def save_hashes(self):
+        if self._new_hashes:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)", self._new_hashes)
+            self._new_hashes = []
+
+    def last_fingerprint(self, name):
+        row = self.conn.execute("SELECT fingerprint FROM stages WHERE name=?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, name, fingerprint, seconds):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                              (name, fingerprint, time.time(), seconds))
+
+    def close(self):
+        self.conn.close()
+
+
+def select_stages(stages, targets):
+    """The target stages and everything they depend on, in declaration (topological) order."""
+    by_name = {s.name: s for s in stages}
+    if not targets:
+        return list(stages)
+    wanted = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(by_name[name].deps)
+    return [s for s in stages if s.name in wanted]
+
+
+def downstream(stages, names):
+    """names plus every stage that (transitively) depends on one of them."""
+    result = set(names)
+    for stage in stages:
+        if any(dep in result for dep in stage.deps):
+            result.add(stage.name)
+    return result
+
+
+def rebuild_reason(stage, state, forced, refresh, rebuilding_deps):
+    """Why the stage needs to run, or None if it is up to date."""
+    if stage.name in forced:
+        return "forced"
+    missing = [o for o in stage.outputs if not (ROOT / o).exists()]
+    if missing:
+        return f"missing output {missing[0]}"
+    if stage.source:
+        return "refresh" if refresh else None
+    if rebuilding_deps:
+        # The inputs can't be hashed until upstream has rewritten them; check again then
+        return f"after {', '.join(rebuilding_deps)}"
+    last = state.last_fingerprint(stage.name)
+    if last is None:
+        return "never built"
+    if last != state.fingerprint(stage):
+        return "inputs changed"
+    return None
+
+
+def run_stage(stage, log_dir):
+    """Runs the stage's script from its own directory, logging to corpus/pipeline_logs/<stage>.log."""
+    script = ROOT / stage.script
+    log_path = Path(log_dir) / f"{stage.name}.log"
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, script.name, *stage.args], cwd=script.parent,
+                                stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - start, log_path
+
+
+def run_pipeline(stages, state, jobs=2, dry_run=False, forced=(), refresh=False):
+    by_name = {s.name: s for s in stages}
+    forced = downstream(stages, forced)
+    log_dir = CORPUS_DIR / 'pipeline_logs'
+
+    # Plan: a stage rebuilds if it is out of date itself or anything it depends on rebuilds
+    plan = {}
+    for stage in stages:
+        rebuilding_deps = [d for d in stage.deps if plan.get(d)]
+        plan[stage.name] = rebuild_reason(stage, state, forced, refresh, rebuilding_deps)
+
+    print(f"{'stage':<14}{'status':<10}reason")
+    for stage in stages:
+        reason = plan[stage.name]
+        print(f"{stage.name:<14}{'rebuild' if reason else 'ok':<10}{reason or ''}")
+    if dry_run:
+        return True
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    done, failed = set(), set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            for stage in stages:
+                name = stage.name
+                if name in done or name in failed or name in running.values():
+                    continue
+                if any(d in failed for d in stage.deps if d in by_name):
+                    failed.add(name)
+                    print(f"[{name}] skipped, a dependency failed")
+                    continue
+                if not all(d in done for d in stage.deps if d in by_name):
+                    continue
+                # Re-check now that upstream has finished; upstream may have rewritten identical content
+                if plan[name] and plan[name].startswith("after "):
+                    plan[name] = rebuild_reason(stage, state, forced, refresh, [])
+                if not plan[name]:
+                    done.add(name)
+                    print(f"[{name}] up to date")
+                    continue
+                if len(running) < jobs:
+                    print(f"[{name}] running ({plan[name]})")
+                    running[executor.submit(run_stage, stage, log_dir)] = name
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                returncode, seconds, log_path = fut.result()
+                if returncode == 0:
+                    done.add(name)
+                    state.record(name, state.fingerprint(by_name[name]), seconds)
+                    print(f"[{name}] done in {seconds:.1f}s")
+                else:
+                    failed.add(name)
+                    print(f"[{name}] failed with exit code {returncode}, see {log_path}")
+    return not failed
+
+
+if __name__ == "__main__":
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Run the JFK files pipeline, rebuilding only what changed.")
+    parser.add_argument('targets', nargs='*', metavar='stage',
+                        help=f"Stages to bring up to date (default: all): {', '.join(names)}")
+    parser.add_argument('--dry-run', action='store_true', help="Show what would rebuild and why, run nothing")
+    parser.add_argument('--jobs', type=int, default=2, help="Stages to run at once")
+    parser.add_argument('--force', nargs='+', default=[], choices=names, metavar='stage',
+                        help="Rerun these stages (and everything downstream) regardless of hashes")
+    parser.add_argument('--refresh', action='store_true', help="Also rerun the network stage (download)")
+    parser.add_argument('--list', action='store_true', help="Print the stages and their dependencies")
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in names]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name:<14}{stage.script:<58}after: {', '.join(stage.deps) or '-'}")
+            helpers = [str(p.relative_to(ROOT)) for p in code_files(stage) if p != ROOT / stage.script]
+            if helpers:
+                print(f"{'':<14}code: {', '.join(helpers)}")
+        sys.exit(0)
+
+    state = PipelineState()
+    try:
+        ok = run_pipeline(select_stages(STAGES, args.targets), state, args.jobs, args.dry_run, args.force,
+                          args.refresh)
+    finally:
+        state.close()
+    sys.exit(0 if ok else 1)
@@ -1,3 +1,4 @@
+import sys
 import json
 from pathlib import Path
 from langchain.vectorstores import FAISS
@@ -7,12 +8,43 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 # Updated paths
 CORPUS_DIR = Path("../corpus/jfk_combined_documents_json")
+PAGE_STORE_DIR = Path("../corpus/page_store")  # Used instead of CORPUS_DIR while it is current
 INDEX_DIR = "../corpus/faiss_index"
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 64
 EMBED_MODEL = "all-MiniLM-L6-v2"  # Swap to another if desired
 
+def load_texts_from_store():
+    """Loads pages from the columnar page store (see text_post_processing/page_store.py)."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "text_post_processing"))
+    from page_store import is_current, read_pages
+    if not is_current("ocr", CORPUS_DIR, PAGE_STORE_DIR):
+        print(f"{PAGE_STORE_DIR} no longer matches {CORPUS_DIR}, reading the JSON "
+              f"(rerun combine_docs.py or page_store.py ingest)")
+        return None
+    table = read_pages(["document_id", "page_number", "text", "ocr_engine", "confidence", "width", "height"],
+                       PAGE_STORE_DIR)
+    docs = []
+    for row in table.to_pylist():
+        text = (row["text"] or "").strip()
+        if not text:
+            continue
+        metadata = {
+            "document_id": row["document_id"],
+            "page_number": row["page_number"],
+            "source": f"{row['document_id']}.json",
+            "ocr_engine": row["ocr_engine"] or "",
+            "confidence": round(row["confidence"], 4) if row["confidence"] is not None else 0,
+            "dimensions": [row["width"], row["height"]],
+        }
+        docs.append(Document(page_content=text, metadata=metadata))
+    return docs
+
 def load_texts():
+    if (PAGE_STORE_DIR / "ocr.parquet").exists():
+        docs = load_texts_from_store()
+        if docs is not None:
+            return docs
     docs = []
     for file_path in CORPUS_DIR.glob("*.json"):
         try:
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The pipeline scripts import their siblings by bare name (they are run from their own
+# directory), so put those directories on the path the same way.
+ROOT = Path(__file__).resolve().parent.parent
+for directory in ('image_processing', 'text_post_processing'):
+    sys.path.insert(0, str(ROOT / directory))
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import compare_confidences
+from compare_confidences import levenshtein
+
+
+def reference_levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.fixture(autouse=True)
+def bit_parallel(monkeypatch):
+    """Test the Myers/Hyyrö path even where rapidfuzz is installed."""
+    monkeypatch.setattr(compare_confidences, "_rapidfuzz_levenshtein", None)
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("", "", 0), ("", "abc", 3), ("abc", "", 3), ("kitten", "sitting", 3),
+    ("Oswald", "Osw1ald", 1), ("flaw", "lawn", 2), ("abc", "abc", 0),
+])
+def test_known_distances(a, b, distance):
+    assert levenshtein(a, b) == distance
+    assert levenshtein(b, a) == distance
+
+
+def test_matches_reference_on_random_strings():
+    rng = random.Random(0)
+    for _ in range(300):
+        # Lengths past 64 characters check that the bit vectors aren't limited to one machine word
+        a = ''.join(rng.choice("abc ") for _ in range(rng.randint(0, 150)))
+        b = ''.join(rng.choice("abcd") for _ in range(rng.randint(0, 150)))
+        assert levenshtein(a, b) == reference_levenshtein(a, b)
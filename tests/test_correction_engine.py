@@ -0,0 +1,50 @@
+import pytest
+
+from correction_engine import RULES_FILE, CorrectionEngine, trie_pattern
+
+
+def test_literal_rules_whole_words_and_case_insensitive():
+    engine = CorrectionEngine({"Mexic0": "Mexico", "Dall as": "Dallas"})
+    assert engine.correct("From mexic0 to Dall as.") == "From Mexico to Dallas."
+    assert engine.correct("Mexic0s xMexic0") == "Mexic0s xMexic0"
+    engine = CorrectionEngine({"Mexic0": "Mexico"}, literal_whole_words=False)
+    assert engine.correct("xMexic0") == "xMexico"
+
+
+def test_longest_literal_wins():
+    engine = CorrectionEngine({"Fidel": "F.", "Fidel Casto": "Fidel Castro"})
+    assert engine.correct("Fidel Casto and Fidel") == "Fidel Castro and F."
+
+
+def test_regex_rules_and_backreferences():
+    engine = CorrectionEngine(regex={"Osw[1i]ald": "Oswald", r"(\d+)\s*hrs": r"\1 hours"})
+    assert engine.correct("osw1ald at 1400hrs") == "Oswald at 1400 hours"
+
+
+def test_single_pass_does_not_rescan_replacements():
+    engine = CorrectionEngine({"a": "b", "b": "c"})
+    assert engine.correct("a b") == "b c"
+
+
+def test_leftmost_match_wins_then_literals_before_regex():
+    engine = CorrectionEngine({"KGB": "literal"}, {"K.G.B": "regex", "G.B": "other"})
+    assert engine.correct("KGB") == "literal"
+    assert engine.correct("K-G-B") == "regex"
+
+
+def test_named_groups_are_rejected():
+    with pytest.raises(ValueError):
+        CorrectionEngine(regex={"(?P<x>a)": "b"})
+
+
+def test_empty_engine_and_trie():
+    assert CorrectionEngine().correct("unchanged") == "unchanged"
+    assert trie_pattern([]) is None
+    assert trie_pattern(["ab", "abc", "ad"]) == "a(?:b(?:c)?|d)"
+
+
+def test_shipped_rules():
+    engine = CorrectionEngine.from_file(RULES_FILE)
+    assert len(engine) > 0
+    assert engine.correct("Lee Harve7 Osw1ald, C.I.A. and K.G.B in Mexic0") == \
+        "Lee Harve7 Oswald, CIA and KGB in Mexico"
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("paddleocr")
+
+import paddle_run_v3
+
+
+def box(x, width):
+    return [[x, 10], [x + width, 10], [x + width, 30], [x, 30]]
+
+
+class StubOCR:
+    """Mimics PaddleOCR >= 2.6: detection returns [boxes]; with det=False every element of the
+    input list is a separate "image", and an element that is itself a list is a batch of crops."""
+
+    def __init__(self, page_boxes):
+        self.page_boxes = iter(page_boxes)
+
+    def ocr(self, img, det=True, rec=True, cls=False):
+        if det:
+            return [next(self.page_boxes)]
+        results = []
+        for element in img:
+            crops = element if isinstance(element, list) else [element]
+            # The crop width identifies which box it came from
+            results.append([(f"w{crop.shape[1]}", 0.9) for crop in crops])
+        return results
+
+
+def test_ocr_pages_lines_up_boxes_and_texts_across_pages(monkeypatch):
+    page_boxes = [[box(0, 40), box(100, 50)], [], [box(0, 60), box(100, 70), box(200, 80)]]
+    monkeypatch.setattr(paddle_run_v3, "ocr", StubOCR(page_boxes))
+    images = [np.zeros((50, 400, 3), dtype=np.uint8) for _ in page_boxes]
+
+    results = paddle_run_v3.ocr_pages(images)
+
+    assert [[text for _, text, _ in page] for page in results] == [["w40", "w50"], [], ["w60", "w70", "w80"]]
+    assert [[b for b, _, _ in page] for page in results] == page_boxes
+
+
+def test_ocr_pages_drops_low_scores(monkeypatch):
+    stub = StubOCR([[box(0, 40), box(100, 50)]])
+    monkeypatch.setattr(stub, "ocr", lambda img, det=True, rec=True, cls=False:
+                        [[box(0, 40), box(100, 50)]] if det else [[("kept", 0.9), ("dropped", 0.1)]])
+    monkeypatch.setattr(paddle_run_v3, "ocr", stub)
+
+    results = paddle_run_v3.ocr_pages([np.zeros((50, 400, 3), dtype=np.uint8)])
+
+    assert [text for _, text, _ in results[0]] == ["kept"]
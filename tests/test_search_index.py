@@ -0,0 +1,82 @@
+import json
+from array import array
+
+import pytest
+
+from search_index import SearchIndex, _pack, _unpack, build_index, parse_query
+
+DOCUMENTS = {
+    "doc-1": ["Lee Harvey Oswald visited the Soviet embassy in Mexico City.",
+              "The embassy staff met Oswald twice."],
+    "doc-2": ["Harvey Lee was not Oswald. The CIA and the KGB.",
+              "KGB files on the Warren Commission."],
+    "doc-3": [""],
+}
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    source_dir = tmp_path_factory.mktemp("combined")
+    index_dir = tmp_path_factory.mktemp("search_index")
+    for document_id, texts in DOCUMENTS.items():
+        document = {"document_id": document_id, "total_pages": len(texts),
+                    "pages": [{"page_number": n, "text": text} for n, text in enumerate(texts, start=1)]}
+        (source_dir / f"{document_id}.json").write_text(json.dumps(document), encoding="utf-8")
+    build_index(source_dir, index_dir)
+    with SearchIndex(index_dir) as search_index:
+        yield search_index
+
+
+def pages(index, query, require_all=True):
+    total, hits = index.search(query, k=100, require_all=require_all)
+    assert total == len(hits)
+    return {(document_id, page_number) for _, document_id, page_number in hits}
+
+
+def test_term_hit_counts(index):
+    assert index.page_count == 5
+    assert pages(index, "oswald") == {("doc-1", 1), ("doc-1", 2), ("doc-2", 1)}
+    assert pages(index, "OSWALD embassy") == {("doc-1", 1), ("doc-1", 2)}
+    assert pages(index, "kgb cia") == {("doc-2", 1)}
+    assert index.search("nonexistent", k=10) == (0, [])
+
+
+def test_hits_are_ranked_by_score(index):
+    _, hits = index.search("kgb", k=10)
+    scores = [score for score, _, _ in hits]
+    assert len(hits) == 2 and scores == sorted(scores, reverse=True) and all(s > 0 for s in scores)
+    assert index.search("kgb", k=1)[0] == 2
+
+
+def test_exact_phrase(index):
+    assert pages(index, '"lee harvey oswald"') == {("doc-1", 1)}
+    assert pages(index, '"harvey lee"') == {("doc-2", 1)}
+    assert pages(index, '"oswald lee"') == set()
+    # Phrases never span pages: doc-1 page 1 ends with "city", page 2 starts with "the"
+    assert pages(index, '"city the"') == set()
+    assert pages(index, '"warren commission" kgb') == {("doc-2", 2)}
+
+
+@pytest.mark.parametrize("query", ['"oswald embassy"~{}', '"embassy oswald"~{}'])
+def test_proximity_in_both_word_orders(index, query):
+    # Page 1: "oswald visited the soviet embassy" (3 words between); page 2: "embassy staff met oswald" (2)
+    assert pages(index, query.format(1)) == set()
+    assert pages(index, query.format(2)) == {("doc-1", 2)}
+    assert pages(index, query.format(3)) == {("doc-1", 1), ("doc-1", 2)}
+
+
+def test_any_clause(index):
+    assert pages(index, "cia warren") == set()
+    assert pages(index, "cia warren", require_all=False) == {("doc-2", 1), ("doc-2", 2)}
+    assert pages(index, '"lee harvey oswald" commission', require_all=False) == {("doc-1", 1), ("doc-2", 2)}
+
+
+def test_parse_query():
+    assert parse_query('oswald "bay of pigs" "oswald embassy"~10 U.S.') == [
+        (["oswald"], None), (["bay", "of", "pigs"], 0), (["oswald", "embassy"], 10), (["u", "s"], 0)]
+    assert parse_query('"a b"~100000') == [(["a", "b"], 200)]
+
+
+@pytest.mark.parametrize("values", [[], [0], [1, 5, 0, 7], list(range(0, 10 ** 6, 997)), [2 ** 32 - 1]])
+def test_pack_unpack_round_trip(values):
+    assert _unpack(_pack(values)) == array('I', values)
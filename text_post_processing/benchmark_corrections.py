@@ -0,0 +1,81 @@
+import re
+import time
+import random
+import string
+import argparse
+from correction_engine import RULES_FILE, CorrectionEngine
+
+# Throughput of the single-pass correction engine against the old one-re.sub-per-rule loop
+# as the rule table grows. Synthetic literal rules (misspelled names) are added on top of the
+# real rules in ocr_corrections.json; the text is synthetic too, so nothing needs to be on disk.
+#
+#   python benchmark_corrections.py --sizes 10 100 1000 5000 20000
+
+LEGACY_MAX_RULES = 2000  # The per-rule loop gets too slow to time beyond this
+
+
+def synthetic_rules(count, seed=0):
+    rng = random.Random(seed)
+    rules = {}
+    while len(rules) < count:
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))).capitalize()
+        typo = list(word)
+        typo[rng.randrange(1, len(typo))] = rng.choice('01lI5')
+        rules[''.join(typo)] = word
+    return rules
+
+
+def synthetic_text(rules, size_chars, seed=0):
+    """Typewriter-ish filler text with some of the misspellings sprinkled in."""
+    rng = random.Random(seed)
+    vocabulary = ['the', 'agency', 'report', 'subject', 'memorandum', 'stated', 'Mexico', 'City', 'Oswald',
+                  'embassy', 'of', 'in', 'was', 'and', 'C.I.A.', 'F.B.I.', 'Dall as', 'Harvev', 'Kennedv']
+    typos = list(rules)
+    words = []
+    length = 0
+    while length < size_chars:
+        word = rng.choice(typos) if typos and rng.random() < 0.02 else rng.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def legacy_correct(text, rules):
+    for pattern, replacement in rules.items():
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    return text
+
+
+def time_call(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correction throughput vs number of rules.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000, 20000])
+    parser.add_argument('--text-kb', type=int, default=500, help="Size of the synthetic corpus")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base = CorrectionEngine.from_file(RULES_FILE)
+    print(f"{'rules':>8}{'compile ms':>12}{'engine MB/s':>13}{'legacy MB/s':>13}")
+    for size in args.sizes:
+        extra = synthetic_rules(size)
+        text = synthetic_text(extra, args.text_kb * 1024)
+        mb = len(text) / (1024 * 1024)
+
+        start = time.perf_counter()
+        engine = CorrectionEngine({**base.literal, **extra}, dict(base.regex))
+        compile_ms = (time.perf_counter() - start) * 1000
+        engine_rate = mb / time_call(lambda: engine.correct(text), args.repeat)
+
+        legacy_rate = '-'
+        if len(engine) <= LEGACY_MAX_RULES:
+            legacy_rules = {**{re.escape(k): v for k, v in extra.items()}, **dict(base.regex)}
+            legacy_rate = f"{mb / time_call(lambda: legacy_correct(text, legacy_rules), 1):.2f}"
+        print(f"{len(engine):>8}{compile_ms:>12.1f}{engine_rate:>13.2f}{legacy_rate:>13}")
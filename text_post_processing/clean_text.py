@@ -1,40 +1,67 @@
+import os
 import json
-import re
+import time
+import argparse
 import spacy
 from pathlib import Path
 from datetime import datetime
+from correction_engine import RULES_FILE, CorrectionEngine
+
+try:
+    import page_store
+except ImportError:  # pyarrow not installed: only the JSON is written
+    page_store = None
 
 SOURCE_DIR = (Path.cwd().parent / 'corpus' / 'jfk_combined_documents_json').resolve()
 TARGET_DIR = (Path.cwd().parent / 'corpus' / 'jfk_combined_documents_json_nlp').resolve()
 TARGET_DIR.mkdir(parents=True, exist_ok=True)
 
-nlp = spacy.load("en_core_web_sm")
+# NER settings (overridable from the command line)
+SPACY_MODEL = "en_core_web_sm"
+BATCH_SIZE = 64                                 # Texts per nlp.pipe batch
+N_PROCESS = max(1, (os.cpu_count() or 2) // 2)  # nlp.pipe worker processes
+MAX_CHARS = 20000                               # Longer pages are split into chunks of about this size
+# Only doc.ents is used, so everything but NER (and a tok2vec NER listens to, if any) is left out
+UNUSED_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+_nlp = None
+
 
-# Existing functions (ocr_corrections, clean_text, etc.)
+def get_nlp(model=SPACY_MODEL):
+    """Loads the spaCy pipeline once, with only the components NER needs."""
+    global _nlp
+    if _nlp is None:
+        _nlp = spacy.load(model, exclude=UNUSED_COMPONENTS)
+        if "tok2vec" in _nlp.pipe_names and "ner" not in _nlp.get_pipe("tok2vec").listening_components:
+            # en_core_web_sm's NER has its own embedded tok2vec; the shared one only fed the tagger/parser
+            _nlp.disable_pipe("tok2vec")
+    return _nlp
 
-ocr_corrections = {
-    r"Osw[1i]ald": "Oswald",
-    r"Harve[v|y]": "Harvey",
-    r"Fidel Casto": "Fidel Castro",
-    r"J\.F\.K\.?": "John F. Kennedy",
-    r"K\.G\.B\.?": "KGB",
-    r"C\.I\.A\.?": "CIA",
-    r"F\.B\.I\.?": "FBI",
-    r"U\.S\.S\.R\.?": "USSR",
-    r"Mexic0": "Mexico",
-    r"Dall as": "Dallas",
-    r"Kenned[v|y]": "Kennedy"
-}
+# OCR fixes live in ocr_corrections.json and are applied in one pass (see correction_engine.py)
+corrections = CorrectionEngine.from_file(RULES_FILE)
 
 def correct_ocr_errors(text: str) -> str:
-    for pattern, replacement in ocr_corrections.items():
-        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-    return text
+    return corrections.correct(text)
+
+def entities_from_doc(doc):
+    return [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
 
 def extract_entities(text):
-    doc = nlp(text)
-    entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
-    return entities
+    return entities_from_doc(get_nlp()(text))
+
+def split_text(text: str, max_chars: int = MAX_CHARS):
+    """Splits text into chunks of at most max_chars, preferring sentence ends, then spaces."""
+    chunks = []
+    while len(text) > max_chars:
+        cut = text.rfind(". ", 0, max_chars)
+        if cut < max_chars // 2:
+            cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars - 1
+        chunks.append(text[:cut + 1])
+        text = text[cut + 1:].lstrip()
+    chunks.append(text)
+    return chunks
 
 def clean_text(text: str) -> str:
     text = text.replace('\n', ' ')
@@ -42,50 +69,109 @@ def clean_text(text: str) -> str:
     text = correct_ocr_errors(text)
     return text
 
-def process_document(doc_path: Path):
-    try:
-        with open(doc_path, "r", encoding="utf-8") as f:
-            doc = json.load(f)
-
-        total_pages = doc.get("total_pages", len(doc.get("pages", [])))
-        modified_pages = []
-
-        for idx, page in enumerate(doc.get("pages", [])):
-            original_text = page.get("text", "")
-            cleaned_text = clean_text(original_text)
-
-            # Extract entities from cleaned text
-            entities = extract_entities(cleaned_text)
+def annotate_page(page, idx, total_pages, cleaned_text, entities):
+    if idx == 0:
+        prefix = "[START_DOC]\n"
+    else:
+        prefix = ""
 
-            if idx == 0:
-                prefix = "[START_DOC]\n"
-            else:
-                prefix = ""
+    suffix = "[END_DOC]" if idx == total_pages - 1 else "[PAGE_BREAK]"
 
-            suffix = "[END_DOC]" if idx == total_pages - 1 else "[PAGE_BREAK]"
+    page["original_text"] = page.get("text", "")
+    page["text"] = f"{prefix}{cleaned_text}\n{suffix}"
+    page["entities"] = entities  # Add extracted entities here
 
-            annotated_text = f"{prefix}{cleaned_text}\n{suffix}"
+def write_document(doc, doc_path: Path, store=None):
+    """Writes the annotated document, and adds its pages to the page store's nlp columns if given."""
+    output_path = TARGET_DIR / doc_path.name
+    with open(output_path, "w", encoding="utf-8") as out_f:
+        json.dump(doc, out_f, ensure_ascii=False, indent=2)
+    if store is not None:
+        store["sources"].append(doc_path.stem)
+        page_store.add_nlp_rows(store["columns"], doc)
 
-            page["original_text"] = original_text
-            page["text"] = annotated_text
-            page["entities"] = entities  # Add extracted entities here
-            modified_pages.append(page)
-
-        doc["pages"] = modified_pages
-
-        output_path = TARGET_DIR / doc_path.name
-        with open(output_path, "w", encoding="utf-8") as out_f:
-            json.dump(doc, out_f, ensure_ascii=False, indent=2)
-
-    except (json.JSONDecodeError, KeyError) as e:
+def load_document(doc_path: Path):
+    try:
+        with open(doc_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
         print(f"Skipping {doc_path.name}: {e}")
+        return None
 
-def preprocess_all_documents():
-    for json_file in SOURCE_DIR.glob("*.json"):
-        if json_file.name.startswith('.'):
+def page_chunks(doc_paths, pending, max_chars=MAX_CHARS, store=None):
+    """Yields (text chunk, (doc index, page index)) for every page of every document.
+
+    Loaded documents wait in `pending` until all of their chunks have come back from NER,
+    so only the documents in flight are held in memory.
+    """
+    for doc_idx, doc_path in enumerate(doc_paths):
+        doc = load_document(doc_path)
+        if doc is None:
+            continue
+        pages = doc.get("pages", [])
+        if not pages:
+            write_document(doc, doc_path, store)
             continue
-        process_document(json_file)
+        cleaned = [clean_text(page.get("text", "")) for page in pages]
+        chunks = [split_text(text, max_chars) for text in cleaned]
+        pending[doc_idx] = {
+            "doc": doc,
+            "path": doc_path,
+            "cleaned": cleaned,
+            "entities": [[] for _ in pages],
+            "remaining": sum(len(c) for c in chunks),
+        }
+        for page_idx, page_parts in enumerate(chunks):
+            for chunk in page_parts:
+                yield chunk, (doc_idx, page_idx)
+
+def preprocess_all_documents(batch_size=BATCH_SIZE, n_process=N_PROCESS, max_chars=MAX_CHARS):
+    """Streams every page of every document through nlp.pipe and writes each document once it is complete."""
+    start = time.perf_counter()
+    doc_paths = sorted(p for p in SOURCE_DIR.glob("*.json") if not p.name.startswith('.'))
+    nlp = get_nlp()
+    pending = {}
+    written = 0
+    pages_done = 0
+    # The nlp group of the page store is written from the same documents, once they are all done
+    store = {"sources": [], "columns": page_store.empty_columns("nlp")} if page_store is not None else None
+
+    stream = nlp.pipe(page_chunks(doc_paths, pending, max_chars, store), as_tuples=True,
+                      batch_size=batch_size, n_process=n_process)
+    for spacy_doc, (doc_idx, page_idx) in stream:
+        state = pending[doc_idx]
+        state["entities"][page_idx].extend(entities_from_doc(spacy_doc))
+        state["remaining"] -= 1
+        if state["remaining"]:
+            continue
+
+        doc = state["doc"]
+        pages = doc["pages"]
+        total_pages = doc.get("total_pages", len(pages))
+        try:
+            for idx, page in enumerate(pages):
+                annotate_page(page, idx, total_pages, state["cleaned"][idx], state["entities"][idx])
+            write_document(doc, state["path"], store)
+            written += 1
+            pages_done += len(pages)
+        except (KeyError, TypeError) as e:
+            print(f"Skipping {state['path'].name}: {e}")
+        del pending[doc_idx]
+        if written and written % 100 == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{written}/{len(doc_paths)} documents, {pages_done / elapsed:.1f} pages/sec")
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {written} documents ({pages_done} pages) in {elapsed:.1f}s")
+    if store is not None:
+        rows = page_store.write_group("nlp", store["columns"], store["sources"])
+        print(f"Page store: {rows} pages in {page_store.group_path('nlp')}")
 
 if __name__ == "__main__":
-    preprocess_all_documents()
-    autocomplete = 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean combined documents and extract named entities.")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--n-process', type=int, default=N_PROCESS, help="spaCy worker processes")
+    parser.add_argument('--max-chars', type=int, default=MAX_CHARS,
+                        help="Split longer pages into chunks of about this many characters for NER")
+    args = parser.parse_args()
+    preprocess_all_documents(args.batch_size, args.n_process, args.max_chars)
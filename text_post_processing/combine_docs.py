@@ -1,80 +1,245 @@
 import os
 import json
+import time
+import sqlite3
+import hashlib
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    import page_store
+except ImportError:  # pyarrow not installed: only the JSON is written
+    page_store = None
 
 # Configuration
 INPUT_DIR = (Path.cwd().parent / 'corpus' / 'jfk_documents_json').resolve()
 COMBINED_DIR = (Path.cwd().parent / 'corpus' / 'jfk_combined_documents_json').resolve()
-os.makedirs(COMBINED_DIR, exist_ok=True)
+MANIFEST_NAME = 'combine_manifest.sqlite'  # Page stats/hashes from the last run, kept in COMBINED_DIR
+MAX_WORKERS = os.cpu_count() or 1
+INDENT = 2  # None writes compact JSON (smaller and faster to write and parse)
 
-def combine_documents():
-    """Combine page JSONs into complete document JSONs"""
-    # Create document grouping structure
+
+def page_key(filename):
+    """(doc_id, page_num) for a page JSON filename, or None if it isn't one."""
+    if filename.startswith('.') or not filename.endswith('.json'):
+        return None
+    try:
+        base_name = os.path.splitext(filename)[0]
+        doc_id, page_part = base_name.split('_page_')
+        return doc_id, int(page_part)
+    except (ValueError, IndexError):
+        return None
+
+
+def sha256_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CombineManifest:
+    """Size, mtime and content hash of every page file used in the last combine."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(str(path))
+        with self.conn:
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                filename TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+            """)
+
+    def load(self):
+        return {row[0]: row[1:] for row in
+                self.conn.execute("SELECT filename, doc_id, size, mtime_ns, sha256 FROM pages")}
+
+    def replace_documents(self, doc_ids, rows):
+        """Replaces the entries of doc_ids with rows of (filename, doc_id, size, mtime_ns, sha256)."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE doc_id=?", [(d,) for d in doc_ids])
+            self.conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.conn.close()
+
+
+def scan_pages(input_dir):
+    """Groups page files by document. Returns {doc_id: [(page_num, filename, size, mtime_ns)]}."""
     documents = defaultdict(list)
-    
-    # First pass: Group files and validate
-    for filename in os.listdir(INPUT_DIR):
-        if filename.startswith('.'):
-            continue
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            key = page_key(entry.name)
+            if key is None:
+                continue
+            stat = entry.stat()
+            documents[key[0]].append((key[1], entry.name, stat.st_size, stat.st_mtime_ns))
+    return documents
 
-        if not filename.endswith('.json'):
-            continue
-        
-        # Split filename into components
-        try:
-            base_name = os.path.splitext(filename)[0]
-            doc_id, page_part = base_name.split('_page_')
-            page_num = int(page_part)
-        except (ValueError, IndexError):
-            continue
-        
-        documents[doc_id].append({
-            'page_num': page_num,
-            'filename': filename
-        })
-    
-    # Process each document
+
+def changed_documents(documents, previous, input_dir, combined_dir):
+    """Documents whose page set or page contents differ from the manifest, or whose output is missing.
+
+    Pages whose size and mtime match the manifest are not read; the others are hashed, so a
+    page that was rewritten with identical content doesn't trigger a rebuild. Returns
+    (changed doc_ids, {filename: sha256} for every page hashed).
+    """
+    changed = set()
+    hashes = {}
     for doc_id, pages in documents.items():
-        # Sort pages numerically
-        sorted_pages = sorted(pages, key=lambda x: x['page_num'])
-        
-        # Create document structure
-        document = {
-            "document_id": doc_id,
-            "total_pages": len(sorted_pages),
-            "pages": [],
-            "metadata": {
-                "source_files": [p['filename'] for p in sorted_pages]
-            }
-        }
-        
-        # Second pass: Load page data
-        for page in sorted_pages:
-            file_path = os.path.join(INPUT_DIR, page['filename'])
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    page_data = json.load(f)
-                
-                # Create enhanced page entry
-                document['pages'].append({
-                    "page_number": page['page_num'],
-                    "text": page_data['text'],
-                    "dimensions": page_data['metadata']['dimensions'],
-                    "confidence": page_data['metadata']['confidence'],
-                    "ocr_engine": page_data['metadata']['ocr_engine']
-                })
-            except Exception as e:
-                print(f"Error loading {page['filename']}: {str(e)}")
+        if not os.path.exists(os.path.join(combined_dir, f"{doc_id}.json")):
+            changed.add(doc_id)
+        for _, filename, size, mtime_ns in pages:
+            old = previous.get(filename)
+            if old and old[0] == doc_id and old[1] == size and old[2] == mtime_ns:
                 continue
-        
-        # Save combined document
-        output_path = os.path.join(COMBINED_DIR, f"{doc_id}.json")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(document, f, ensure_ascii=False, indent=2)
-        
-        print(f"Created combined document: {doc_id} ({len(sorted_pages)} pages)")
+            hashes[filename] = sha256_file(os.path.join(input_dir, filename))
+            if not old or old[3] != hashes[filename]:
+                changed.add(doc_id)
+    previous_pages = defaultdict(set)
+    for filename, (doc_id, _, _, _) in previous.items():
+        previous_pages[doc_id].add(filename)
+    for doc_id, pages in documents.items():
+        if previous_pages.get(doc_id, set()) != {filename for _, filename, _, _ in pages}:
+            changed.add(doc_id)
+    return changed, hashes
+
+
+def build_document(doc_id, pages, input_dir=INPUT_DIR, combined_dir=COMBINED_DIR, indent=INDENT):
+    """Worker task: assembles and writes one combined document. Returns (doc_id, page count, errors, document)."""
+    # Sort pages numerically
+    sorted_pages = sorted(pages)
+
+    # Create document structure
+    document = {
+        "document_id": doc_id,
+        "total_pages": len(sorted_pages),
+        "pages": [],
+        "metadata": {
+            "source_files": [filename for _, filename, _, _ in sorted_pages]
+        }
+    }
+
+    errors = []
+    for page_num, filename, _, _ in sorted_pages:
+        file_path = os.path.join(input_dir, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                page_data = json.load(f)
+            metadata = page_data['metadata']
+
+            # Create enhanced page entry
+            document['pages'].append({
+                "page_number": page_num,
+                "text": page_data['text'],
+                "dimensions": metadata['dimensions'],
+                # img_to_text_v2 and the cascade write avg_confidence instead of confidence
+                "confidence": metadata.get('confidence', metadata.get('avg_confidence')),
+                "ocr_engine": metadata['ocr_engine']
+            })
+        except Exception as e:
+            errors.append(f"Error loading {filename}: {str(e)}")
+            continue
+
+    # Save combined document (via a temp file so an interrupted run never leaves a truncated document)
+    output_path = os.path.join(combined_dir, f"{doc_id}.json")
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, output_path)
+    return doc_id, len(sorted_pages), errors, document
+
+
+def write_page_store(ocr, documents, changed, removed, patch, combined_dir, store_dir):
+    """Writes the page store's ocr group: patched with the rebuilt documents' rows when it mirrored
+    the previous output, otherwise from every combined document."""
+    if patch:
+        if not changed and not removed:
+            return
+        rows = page_store.update_group('ocr', ocr, changed | removed, documents, store_dir)
+    else:
+        for doc_id in sorted(set(documents) - changed):
+            with open(os.path.join(combined_dir, f"{doc_id}.json"), 'r', encoding='utf-8') as f:
+                page_store.add_ocr_rows(ocr, json.load(f))
+        rows = page_store.write_group('ocr', ocr, documents, store_dir)
+    print(f"Page store: {rows} pages in {page_store.group_path('ocr', store_dir)}")
+
+
+def combine_documents(input_dir=INPUT_DIR, combined_dir=COMBINED_DIR, full=False, workers=MAX_WORKERS,
+                      indent=INDENT, store_dir=None):
+    """Combine page JSONs into complete document JSONs, rebuilding only documents whose pages changed"""
+    start = time.perf_counter()
+    os.makedirs(combined_dir, exist_ok=True)
+    manifest = CombineManifest(Path(combined_dir) / MANIFEST_NAME)
+    stored = manifest.load()
+    previous = {} if full else stored
+    if page_store is not None:
+        store_dir = store_dir or page_store.STORE_DIR
+        # Checked before any JSON changes: only a group that mirrored the old output can be patched
+        patch_store = not full and page_store.is_current('ocr', combined_dir, store_dir)
+        ocr = page_store.empty_columns('ocr')
+
+    documents = scan_pages(input_dir)
+    changed, hashes = changed_documents(documents, previous, input_dir, combined_dir)
+
+    # Documents whose pages have all disappeared
+    removed = {doc_id for doc_id, _, _, _ in stored.values()} - set(documents)
+    for doc_id in removed:
+        stale = os.path.join(combined_dir, f"{doc_id}.json")
+        if os.path.exists(stale):
+            os.remove(stale)
+        print(f"Removed combined document: {doc_id} (no pages left)")
+    manifest.replace_documents(removed, [])
+
+    print(f"{len(documents)} documents, {len(changed)} to rebuild")
+    rebuilt = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(build_document, doc_id, documents[doc_id], str(input_dir),
+                                       str(combined_dir), indent) for doc_id in sorted(changed)]
+            batch_docs, batch_rows = [], []
+            for fut in futures:
+                doc_id, page_count, errors, document = fut.result()
+                if page_store is not None:
+                    page_store.add_ocr_rows(ocr, document)
+                for error in errors:
+                    print(error)
+                print(f"Created combined document: {doc_id} ({page_count} pages)")
+                rebuilt += 1
+                batch_docs.append(doc_id)
+                for _, filename, size, mtime_ns in documents[doc_id]:
+                    sha256 = hashes.get(filename) or previous[filename][3]
+                    batch_rows.append((filename, doc_id, size, mtime_ns, sha256))
+                # Record progress in batches so an interrupted run keeps what it finished
+                if len(batch_docs) >= 200:
+                    manifest.replace_documents(batch_docs, batch_rows)
+                    batch_docs, batch_rows = [], []
+            manifest.replace_documents(batch_docs, batch_rows)
+
+        # Pages of unchanged documents that were re-hashed (touched but identical) get their new stats
+        touched = [(filename, doc_id, size, mtime_ns, hashes[filename])
+                   for doc_id, pages in documents.items() if doc_id not in changed
+                   for _, filename, size, mtime_ns in pages if filename in hashes]
+        manifest.replace_documents([], touched)
+    finally:
+        manifest.close()
+
+    if page_store is not None:
+        write_page_store(ocr, documents, changed, removed, patch_store, combined_dir, store_dir)
+
+    print(f"Rebuilt {rebuilt} of {len(documents)} documents in {time.perf_counter() - start:.1f}s")
+
 
 if __name__ == "__main__":
-    combine_documents()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Combine page JSONs into document JSONs.")
+    parser.add_argument('--input-dir', type=Path, default=INPUT_DIR)
+    parser.add_argument('--output-dir', type=Path, default=COMBINED_DIR)
+    parser.add_argument('--full', action='store_true', help="Rebuild every document, ignoring the manifest")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--compact', action='store_true', help="Write compact instead of indented JSON")
+    args = parser.parse_args()
+    combine_documents(args.input_dir, args.output_dir, args.full, args.workers, None if args.compact else INDENT)
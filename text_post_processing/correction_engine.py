@@ -0,0 +1,105 @@
+import re
+import json
+from pathlib import Path
+
+# --- Single-pass OCR correction engine ---
+#
+# All correction rules are compiled into one regular expression, so a page is scanned once
+# however many rules there are:
+#
+#   - literal rules ("Mexic0" -> "Mexico") are merged into a character trie and emitted as a
+#     nested alternation, so matching costs the length of the candidate word, not the number
+#     of rules;
+#   - regex rules each get a named group and the match is dispatched on m.lastgroup.
+#
+# Rules are read from a JSON file (see ocr_corrections.json):
+#
+#   {
+#     "literal_whole_words": true,
+#     "literal": {"Fidel Casto": "Fidel Castro", ...},
+#     "regex": {"Osw[1i]ald": "Oswald", ...}
+#   }
+#
+# Matching is case-insensitive. Where rules overlap, the leftmost match wins, then the
+# longest literal, then regex rules in file order. Unlike applying each rule with its own
+# re.sub, a replacement is never rescanned by other rules.
+
+RULES_FILE = Path(__file__).with_name('ocr_corrections.json')
+
+
+def trie_pattern(words):
+    """Regex source matching any of `words`, built as a trie so shared prefixes are tested once."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        if list(node) == ['']:
+            return None
+        alternatives, single_chars = [], []
+        for ch in sorted(k for k in node if k):
+            rest = build(node[ch])
+            if rest is None:
+                single_chars.append(re.escape(ch))
+            else:
+                alternatives.append(re.escape(ch) + rest)
+        if single_chars:
+            alternatives.append(single_chars[0] if len(single_chars) == 1 else f"[{''.join(single_chars)}]")
+        pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        if '' in node:
+            # A word ends here but longer ones continue; the greedy ? prefers the longer match
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie) if trie else None
+
+
+class CorrectionEngine:
+    """Applies literal and regex OCR corrections to a text in a single regex pass."""
+
+    def __init__(self, literal=None, regex=None, literal_whole_words=True):
+        self.literal = {k.lower(): v for k, v in (literal or {}).items() if k}
+        self.regex = list((regex or {}).items())
+        self._rules = {}  # group name -> (compiled rule, replacement, replacement uses backreferences)
+
+        alternatives = []
+        literal_source = trie_pattern(self.literal)
+        if literal_source:
+            if literal_whole_words:
+                literal_source = rf"(?<!\w){literal_source}(?!\w)"
+            alternatives.append(f"(?P<lit>{literal_source})")
+        for i, (pattern, replacement) in enumerate(self.regex):
+            name = f"r{i}"
+            compiled = re.compile(pattern, re.IGNORECASE)
+            if compiled.groupindex:
+                raise ValueError(f"Correction rule {pattern!r} uses named groups, which aren't supported")
+            self._rules[name] = (compiled, replacement, '\\' in replacement)
+            alternatives.append(f"(?P<{name}>{pattern})")
+        self.pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        return cls(rules.get("literal"), rules.get("regex"), rules.get("literal_whole_words", True))
+
+    def __len__(self):
+        return len(self.literal) + len(self.regex)
+
+    def _replace(self, m):
+        name = m.lastgroup
+        if name == 'lit':
+            return self.literal[m.group().lower()]
+        compiled, replacement, has_backrefs = self._rules[name]
+        if has_backrefs:
+            # Re-match the single rule in place so its own group numbers apply to the replacement
+            return compiled.match(m.string, m.start(), m.end()).expand(replacement)
+        return replacement
+
+    def correct(self, text):
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self._replace, text)
@@ -0,0 +1,236 @@
+import re
+import json
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+# --- Inverted entity index ---
+#
+# Collects the "entities" that clean_text.py attaches to every page into one SQLite file:
+# normalized entity text + label -> sorted (document, page) postings, stored clustered in a
+# WITHOUT ROWID table so a lookup is a single range scan.
+#
+#   python entity_index.py build
+#   python entity_index.py lookup KGB --label ORG
+#   python entity_index.py prefix oswa
+#   python entity_index.py cooccur "Lee Harvey Oswald" KGB
+#   python entity_index.py related KGB --label ORG
+#
+#   from entity_index import EntityIndex
+#   with EntityIndex() as index:
+#       pages = index.lookup("KGB", "ORG")   # [(document_id, page_number), ...]
+
+SOURCE_DIR = (Path.cwd().parent / 'corpus' / 'jfk_combined_documents_json_nlp').resolve()
+INDEX_PATH = (Path.cwd().parent / 'corpus' / 'entity_index.sqlite').resolve()
+
+_SPACE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = " \t\n\"'`.,;:!?()[]{}<>-"
+
+
+def normalize_entity(text):
+    """Case- and whitespace-insensitive form used as the index key."""
+    return _SPACE.sub(' ', text).strip(_EDGE_PUNCTUATION).casefold()
+
+
+def build_index(source_dir=SOURCE_DIR, index_path=INDEX_PATH):
+    """(Re)builds the index from the clean_text.py output directory."""
+    start = time.perf_counter()
+    index_path = Path(index_path)
+    tmp_path = index_path.with_suffix('.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(str(tmp_path))
+    conn.executescript("""
+    PRAGMA journal_mode=OFF;
+    PRAGMA synchronous=OFF;
+    CREATE TABLE documents (id INTEGER PRIMARY KEY, document_id TEXT NOT NULL UNIQUE);
+    CREATE TABLE entities (
+        id INTEGER PRIMARY KEY,
+        norm TEXT NOT NULL,
+        label TEXT NOT NULL,
+        display TEXT NOT NULL,   -- Most frequent surface form
+        pages INTEGER NOT NULL DEFAULT 0,
+        documents INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (norm, label)
+    );
+    CREATE TABLE postings (
+        entity INTEGER NOT NULL,
+        doc INTEGER NOT NULL,
+        page INTEGER NOT NULL,
+        PRIMARY KEY (entity, doc, page)
+    ) WITHOUT ROWID;
+    """)
+
+    entity_ids = {}   # (norm, label) -> id
+    surface = {}      # id -> {surface form: count}
+    postings = set()
+    documents = 0
+    for doc_id, json_file in enumerate(sorted(Path(source_dir).glob('*.json')), start=1):
+        if json_file.name.startswith('.'):
+            continue
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                document = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Skipping {json_file.name}: {e}")
+            continue
+        conn.execute("INSERT INTO documents (id, document_id) VALUES (?, ?)",
+                     (doc_id, document.get('document_id', json_file.stem)))
+        documents += 1
+        for page in document.get('pages', []):
+            for entity in page.get('entities', []):
+                norm = normalize_entity(entity['text'])
+                if not norm:
+                    continue
+                key = (norm, entity['label'])
+                entity_id = entity_ids.setdefault(key, len(entity_ids) + 1)
+                forms = surface.setdefault(entity_id, {})
+                forms[entity['text']] = forms.get(entity['text'], 0) + 1
+                postings.add((entity_id, doc_id, page.get('page_number', 0)))
+
+    conn.executemany("INSERT INTO entities (id, norm, label, display) VALUES (?, ?, ?, ?)",
+                     ((entity_id, norm, label, max(surface[entity_id].items(), key=lambda kv: kv[1])[0])
+                      for (norm, label), entity_id in entity_ids.items()))
+    conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", sorted(postings))
+    conn.executescript("""
+    UPDATE entities SET
+        pages = (SELECT COUNT(*) FROM postings WHERE entity = entities.id),
+        documents = (SELECT COUNT(DISTINCT doc) FROM postings WHERE entity = entities.id);
+    -- Page -> entities, for co-occurrence
+    CREATE INDEX postings_by_page ON postings (doc, page, entity);
+    ANALYZE;
+    """)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    tmp_path.replace(index_path)
+    print(f"Indexed {len(entity_ids)} entities, {len(postings)} postings from {documents} documents "
+          f"in {time.perf_counter() - start:.1f}s -> {index_path}")
+
+
+class EntityIndex:
+    """Read-only query API over an index built by build_index."""
+
+    def __init__(self, path=INDEX_PATH, mmap_bytes=1024 ** 3):
+        self.conn = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True)
+        self.conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _entity_ids(self, text, label=None):
+        norm = normalize_entity(text)
+        if label:
+            rows = self.conn.execute("SELECT id FROM entities WHERE norm=? AND label=?", (norm, label))
+        else:
+            rows = self.conn.execute("SELECT id FROM entities WHERE norm=?", (norm,))
+        return [row[0] for row in rows]
+
+    def lookup(self, text, label=None):
+        """Sorted (document_id, page_number) pages mentioning the entity (any label unless given)."""
+        ids = self._entity_ids(text, label)
+        if not ids:
+            return []
+        rows = self.conn.execute(f"""
+            SELECT DISTINCT d.document_id, p.page FROM postings p JOIN documents d ON d.id = p.doc
+            WHERE p.entity IN ({','.join('?' * len(ids))}) ORDER BY p.doc, p.page
+        """, ids)
+        return rows.fetchall()
+
+    def prefix(self, prefix, label=None, limit=20):
+        """Entities whose normalized text starts with prefix: [(display, label, pages, documents)], most pages first."""
+        norm = normalize_entity(prefix)
+        query = "SELECT display, label, pages, documents FROM entities WHERE norm >= ? AND norm < ?"
+        params = [norm, norm + '\U0010ffff']
+        if label:
+            query += " AND label = ?"
+            params.append(label)
+        query += " ORDER BY pages DESC LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(query, params).fetchall()
+
+    def cooccurrence(self, text_a, text_b, label_a=None, label_b=None, level='page'):
+        """Number of pages (or documents, with level='document') mentioning both entities."""
+        ids_a, ids_b = self._entity_ids(text_a, label_a), self._entity_ids(text_b, label_b)
+        if not ids_a or not ids_b:
+            return 0
+        columns = "a.doc, a.page" if level == 'page' else "a.doc"
+        join = "b.doc = a.doc AND b.page = a.page" if level == 'page' else "b.doc = a.doc"
+        row = self.conn.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT DISTINCT {columns} FROM postings a JOIN postings b ON {join}
+                WHERE a.entity IN ({','.join('?' * len(ids_a))}) AND b.entity IN ({','.join('?' * len(ids_b))})
+            )
+        """, ids_a + ids_b).fetchone()
+        return row[0]
+
+    def related(self, text, label=None, limit=20):
+        """Entities most often on the same pages: [(display, label, shared pages)]."""
+        ids = self._entity_ids(text, label)
+        if not ids:
+            return []
+        marks = ','.join('?' * len(ids))
+        rows = self.conn.execute(f"""
+            SELECT e.display, e.label, COUNT(DISTINCT b.doc || ':' || b.page) AS shared
+            FROM postings a
+            JOIN postings b ON b.doc = a.doc AND b.page = a.page
+            JOIN entities e ON e.id = b.entity
+            WHERE a.entity IN ({marks}) AND b.entity NOT IN ({marks})
+            GROUP BY b.entity ORDER BY shared DESC LIMIT ?
+        """, ids + ids + [limit])
+        return rows.fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the inverted entity index.")
+    parser.add_argument('--index', type=Path, default=INDEX_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Build the index from clean_text.py output")
+    build.add_argument('--source-dir', type=Path, default=SOURCE_DIR)
+    lookup = commands.add_parser('lookup', help="Pages mentioning an entity")
+    lookup.add_argument('text')
+    lookup.add_argument('--label')
+    prefix = commands.add_parser('prefix', help="Entities starting with a prefix")
+    prefix.add_argument('text')
+    prefix.add_argument('--label')
+    prefix.add_argument('--limit', type=int, default=20)
+    cooccur = commands.add_parser('cooccur', help="Pages (or documents) mentioning both entities")
+    cooccur.add_argument('text_a')
+    cooccur.add_argument('text_b')
+    cooccur.add_argument('--label-a')
+    cooccur.add_argument('--label-b')
+    cooccur.add_argument('--documents', action='store_true', help="Count documents instead of pages")
+    related = commands.add_parser('related', help="Entities most often on the same pages")
+    related.add_argument('text')
+    related.add_argument('--label')
+    related.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.source_dir, args.index)
+    else:
+        start = time.perf_counter()
+        with EntityIndex(args.index) as index:
+            if args.command == 'lookup':
+                pages = index.lookup(args.text, args.label)
+                for document_id, page_number in pages:
+                    print(f"{document_id}\tpage {page_number}")
+                print(f"{len(pages)} pages")
+            elif args.command == 'prefix':
+                for display, label, pages, documents in index.prefix(args.text, args.label, args.limit):
+                    print(f"{display}\t{label}\t{pages} pages\t{documents} documents")
+            elif args.command == 'cooccur':
+                level = 'document' if args.documents else 'page'
+                print(f"{index.cooccurrence(args.text_a, args.text_b, args.label_a, args.label_b, level)} {level}s")
+            elif args.command == 'related':
+                for display, label, shared in index.related(args.text, args.label, args.limit):
+                    print(f"{display}\t{label}\t{shared} pages")
+        print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
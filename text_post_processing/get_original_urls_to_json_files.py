@@ -24,12 +24,13 @@ base_url = 'https://www.archives.gov'
 
 link_file = (Path.cwd().parent / 'corpus' / 'all-pdf-links.txt').resolve()
 
-f = open(link_file , "w")
-#store linkns to file
-for link in pdf_links:
-    pdf_url = base_url + link['href']
-    f.write(pdf_url)
-    f.write("\n")
+# Legacy link list for merge_links_with_json.py; download.py now also writes corpus/document_urls.json
+with open(link_file, "w") as f:
+    #store linkns to file
+    for link in pdf_links:
+        pdf_url = base_url + link['href']
+        f.write(pdf_url)
+        f.write("\n")
 
 
 
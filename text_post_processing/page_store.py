@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- Columnar page store ---
+#
+# One row per page, stored as Parquet column groups that share the (document_id, page_number)
+# key and row order. Readers load only the columns they ask for, memory-mapped. Each stage
+# writes its own group next to its JSON output (when pyarrow is installed):
+#
+#   ocr.parquet   text, confidence, width, height, ocr_engine, source_file   combine_docs.py (only the
+#                                                                           documents it rebuilt)
+#   nlp.parquet   clean_text, entities                                      clean_text.py
+#   urls.parquet  original_url                                              `ingest`, from download.py's
+#                                                                           document_urls.json
+#
+# The stages still write their JSON, which stays the source of truth: readers only use a group
+# while is_current() says it is newer than the directory it mirrors and covers the same
+# documents, and read the JSON otherwise. `ingest` fills every group from the JSON, for a corpus
+# built before the store existed or by a stage run without pyarrow.
+#
+#   python page_store.py ingest                  (load the existing JSON stage directories)
+#   python page_store.py export ../corpus/out    (write the combined-document JSON layout back out)
+#   python page_store.py info
+#
+#   from page_store import read_pages
+#   table = read_pages(["document_id", "page_number", "clean_text"])
+
+CORPUS_DIR = (Path.cwd().parent / 'corpus').resolve()
+STORE_DIR = (CORPUS_DIR / 'page_store').resolve()
+COMBINED_DIR = (CORPUS_DIR / 'jfk_combined_documents_json').resolve()
+NLP_DIR = (CORPUS_DIR / 'jfk_combined_documents_json_nlp').resolve()
+# document_id -> original URL, written by download/download.py
+URL_INDEX_PATH = (CORPUS_DIR / 'document_urls.json').resolve()
+
+KEY_COLUMNS = ["document_id", "page_number"]
+ENTITY_TYPE = pa.list_(pa.struct([("text", pa.string()), ("label", pa.string())]))
+
+KEY_FIELDS = [pa.field("document_id", pa.string()), pa.field("page_number", pa.int32())]
+DICTIONARY_COLUMNS = ["document_id", "ocr_engine", "original_url"]  # Few distinct values, many repeats
+SCHEMAS = {
+    "ocr": pa.schema(KEY_FIELDS + [
+        pa.field("text", pa.large_string()),
+        pa.field("confidence", pa.float32()),
+        pa.field("width", pa.int32()),
+        pa.field("height", pa.int32()),
+        pa.field("ocr_engine", pa.string()),
+        pa.field("source_file", pa.string()),
+    ]),
+    "nlp": pa.schema(KEY_FIELDS + [
+        pa.field("clean_text", pa.large_string()),
+        pa.field("entities", ENTITY_TYPE),
+    ]),
+    "urls": pa.schema(KEY_FIELDS + [
+        pa.field("original_url", pa.string()),
+    ]),
+}
+COLUMN_GROUPS = {name: group for group, schema in SCHEMAS.items() for name in schema.names if name not in KEY_COLUMNS}
+
+
+def group_path(group, store_dir=STORE_DIR):
+    return Path(store_dir) / f"{group}.parquet"
+
+
+def source_documents(group, store_dir=STORE_DIR):
+    """The document_ids of the JSON files the group was written from, or None if not recorded."""
+    metadata = pq.read_schema(group_path(group, store_dir)).metadata or {}
+    recorded = metadata.get(b'source_documents')
+    return set(json.loads(recorded)) if recorded is not None else None
+
+
+def json_documents(source_dir):
+    """The JSON files of a stage output directory, as {document_id: path}."""
+    return {f.stem: f for f in Path(source_dir).glob('*.json') if not f.name.startswith('.')}
+
+
+def is_current(group, source_dir, store_dir=STORE_DIR):
+    """True if the group exists, is newer than every JSON file in source_dir (the stage output
+    it mirrors) and was written from exactly the documents now there. Rewriting or removing a
+    JSON file after the group was written makes it stale."""
+    path = group_path(group, store_dir)
+    if not path.exists():
+        return False
+    built = path.stat().st_mtime_ns
+    files = json_documents(source_dir)
+    if any(f.stat().st_mtime_ns > built for f in files.values()):
+        return False
+    return source_documents(group, store_dir) == set(files)
+
+
+def empty_columns(group):
+    return {name: [] for name in SCHEMAS[group].names}
+
+
+def _add_rows(columns, rows):
+    """Appends rows (tuples in schema order) to the column lists. Rows are built first, so a
+    malformed document raises before anything is appended and the columns stay aligned."""
+    for name, values in zip(columns, zip(*rows)):
+        columns[name].extend(values)
+
+
+def add_ocr_rows(ocr, document):
+    """Appends a combined document's pages (combine_docs.py's layout) to ocr group columns."""
+    source_files = document.get("metadata", {}).get("source_files", [])
+    rows = []
+    for i, page in enumerate(document.get("pages", [])):
+        width, height = page.get("dimensions") or [None, None]
+        rows.append((document["document_id"], page["page_number"], page.get("text", ""), page.get("confidence"),
+                     width, height, page.get("ocr_engine"), source_files[i] if i < len(source_files) else None))
+    _add_rows(ocr, rows)
+
+
+def add_nlp_rows(nlp, document):
+    """Appends an annotated document's pages (clean_text.py's layout) to nlp group columns."""
+    _add_rows(nlp, [(document["document_id"], page["page_number"], page.get("text", ""),
+                     [{"text": e["text"], "label": e["label"]} for e in page.get("entities", [])])
+                    for page in document.get("pages", [])])
+
+
+def write_group(group, columns, sources, store_dir=STORE_DIR):
+    """Writes one column group from a dict of equal-length lists (or a pyarrow Table).
+
+    sources are the document_ids of every JSON file the group mirrors (documents without pages
+    included), recorded for is_current. Rows are sorted by (document_id, page_number) so every
+    group shares one row order, and the file is replaced atomically.
+    """
+    schema = SCHEMAS[group]
+    table = columns if isinstance(columns, pa.Table) else pa.table(columns)
+    table = table.select(schema.names).cast(schema).sort_by([(k, "ascending") for k in KEY_COLUMNS])
+    table = table.replace_schema_metadata({b'source_documents': json.dumps(sorted(sources)).encode('utf-8')})
+    os.makedirs(store_dir, exist_ok=True)
+    path = group_path(group, store_dir)
+    tmp_path = path.with_suffix('.tmp')
+    pq.write_table(table, tmp_path, compression='zstd',
+                   use_dictionary=[c for c in DICTIONARY_COLUMNS if c in schema.names], row_group_size=64 * 1024)
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+
+def update_group(group, columns, replaced, sources, store_dir=STORE_DIR):
+    """Rewrites an existing group with the rows of the `replaced` documents swapped for `columns`,
+    for stages that only rebuild some documents. Removed documents go in `replaced` with no new
+    rows; sources is the full document list after the update, as for write_group."""
+    schema = SCHEMAS[group]
+    old = pq.read_table(group_path(group, store_dir))
+    keep = pc.invert(pc.is_in(old.column("document_id"), value_set=pa.array(sorted(replaced), pa.string())))
+    new = (columns if isinstance(columns, pa.Table) else pa.table(columns)).select(schema.names).cast(schema)
+    table = pa.concat_tables([old.filter(keep).select(schema.names).cast(schema), new])
+    return write_group(group, table, sources, store_dir)
+
+
+def read_pages(columns=None, store_dir=STORE_DIR):
+    """Reads the requested columns (default: every column in the store) as one pyarrow Table.
+
+    Only the column groups holding those columns are opened, memory-mapped. Groups written
+    from the same pages line up row for row; otherwise they are joined on the page key.
+    """
+    if columns is None:
+        columns = KEY_COLUMNS + [c for c, g in COLUMN_GROUPS.items() if group_path(g, store_dir).exists()]
+    unknown = [c for c in columns if c not in KEY_COLUMNS and c not in COLUMN_GROUPS]
+    if unknown:
+        raise KeyError(f"Unknown page store columns: {', '.join(unknown)}")
+
+    groups = {}
+    for column in columns:
+        if column not in KEY_COLUMNS:
+            groups.setdefault(COLUMN_GROUPS[column], []).append(column)
+    if not groups:
+        groups["ocr"] = []
+
+    table = None
+    for group, group_columns in groups.items():
+        path = group_path(group, store_dir)
+        if not path.exists():
+            raise FileNotFoundError(f"Page store has no '{group}' group: {path}")
+        part = pq.read_table(path, columns=KEY_COLUMNS + group_columns, memory_map=True)
+        if table is None:
+            table = part
+            continue
+        if not table.select(KEY_COLUMNS).equals(part.select(KEY_COLUMNS)):
+            # Left join on the first group's rows (pages missing from this group get nulls)
+            positions = {key: i for i, key in enumerate(zip(*(part.column(k).to_pylist() for k in KEY_COLUMNS)))}
+            keys = zip(*(table.column(k).to_pylist() for k in KEY_COLUMNS))
+            part = part.take(pa.array([positions.get(key) for key in keys], type=pa.int64()))
+        for column in group_columns:
+            table = table.append_column(part.schema.field(column), part.column(column))
+    return table.select(columns)
+
+
+def iter_documents(columns=None, store_dir=STORE_DIR):
+    """Yields (document_id, [page dicts in page order]) for every document in the store."""
+    columns = list(columns or [])
+    table = read_pages(KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS], store_dir)
+    doc_ids = table.column("document_id").to_pylist()
+    rows = table.to_pylist()
+    start = 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or doc_ids[i] != doc_ids[start]:
+            yield doc_ids[start], rows[start:i]
+            start = i
+
+
+def store_info(store_dir=STORE_DIR):
+    for group in SCHEMAS:
+        path = group_path(group, store_dir)
+        if path.exists():
+            metadata = pq.read_metadata(path)
+            print(f"{group:<6}{metadata.num_rows:>10} rows{path.stat().st_size / (1024 * 1024):>10.1f} MB  {path}")
+        else:
+            print(f"{group:<6}{'missing':>15}")
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_url_index(url_index_path=URL_INDEX_PATH):
+    """document_id -> original URL from download.py's index, or {} if it hasn't been written."""
+    if not url_index_path or not Path(url_index_path).exists():
+        return {}
+    return _load_json(url_index_path)['urls']
+
+
+def ingest_json(combined_dir=COMBINED_DIR, nlp_dir=NLP_DIR, store_dir=STORE_DIR, url_index_path=URL_INDEX_PATH):
+    """Fills the store from the existing JSON stage directories (either may be None or missing).
+
+    URLs come from the URL index, falling back to an "original_url" written into the document,
+    the same join web/mysql/import.py does.
+    """
+    start = time.perf_counter()
+    url_index = load_url_index(url_index_path)
+    if combined_dir and Path(combined_dir).is_dir():
+        ocr = empty_columns("ocr")
+        files = json_documents(combined_dir)
+        for document_id in sorted(files):
+            add_ocr_rows(ocr, _load_json(files[document_id]))
+        print(f"ocr: {write_group('ocr', ocr, files, store_dir)} pages from {combined_dir}")
+
+    if nlp_dir and Path(nlp_dir).is_dir():
+        nlp = empty_columns("nlp")
+        urls = empty_columns("urls")
+        files = json_documents(nlp_dir)
+        for document_id in sorted(files):
+            document = _load_json(files[document_id])
+            add_nlp_rows(nlp, document)
+            original_url = url_index.get(document["document_id"]) or document.get("original_url")
+            if original_url:
+                for page in document.get("pages", []):
+                    urls["document_id"].append(document["document_id"])
+                    urls["page_number"].append(page["page_number"])
+                    urls["original_url"].append(original_url)
+        print(f"nlp: {write_group('nlp', nlp, files, store_dir)} pages from {nlp_dir}")
+        if urls["document_id"]:
+            written = write_group('urls', urls, files, store_dir)
+            print(f"urls: {written} pages from {url_index_path if url_index else nlp_dir}")
+    print(f"Ingested in {time.perf_counter() - start:.1f}s")
+
+
+def export_json(output_dir, store_dir=STORE_DIR, indent=2):
+    """Writes one combined-document JSON per document in the layout the pipeline stages produce.
+
+    With the nlp group present, page "text" is the annotated text and "original_text" the OCR
+    text, as written by clean_text.py; "original_url" is added when the urls group exists.
+    """
+    available = [c for c, g in COLUMN_GROUPS.items() if group_path(g, store_dir).exists()]
+    os.makedirs(output_dir, exist_ok=True)
+    count = 0
+    for document_id, rows in iter_documents(available, store_dir):
+        pages = []
+        for row in rows:
+            page = {"page_number": row["page_number"]}
+            if "text" in row:
+                page.update({
+                    "text": row["text"],
+                    "dimensions": [row["width"], row["height"]],
+                    "confidence": row["confidence"],
+                    "ocr_engine": row["ocr_engine"],
+                })
+            if "clean_text" in row:
+                page["original_text"] = row.get("text", "")
+                page["text"] = row["clean_text"]
+                page["entities"] = row["entities"] or []
+            pages.append(page)
+        document = {"document_id": document_id, "total_pages": len(pages), "pages": pages}
+        if "source_file" in rows[0]:
+            document["metadata"] = {"source_files": [row["source_file"] for row in rows]}
+        if "original_url" in rows[0]:
+            document["original_url"] = rows[0]["original_url"] or 'URL_NOT_FOUND'
+        with open(Path(output_dir) / f"{document_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=indent)
+        count += 1
+    print(f"Exported {count} documents to {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar (Parquet) page store for the corpus.")
+    parser.add_argument('--store-dir', type=Path, default=STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="Load the existing JSON stage directories into the store")
+    ingest.add_argument('--combined-dir', type=Path, default=COMBINED_DIR)
+    ingest.add_argument('--nlp-dir', type=Path, default=NLP_DIR)
+    ingest.add_argument('--url-index', type=Path, default=URL_INDEX_PATH)
+    export = commands.add_parser('export', help="Write document JSON files from the store")
+    export.add_argument('output_dir', type=Path)
+    export.add_argument('--compact', action='store_true')
+    commands.add_parser('info', help="Row counts and sizes of the column groups")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        ingest_json(args.combined_dir, args.nlp_dir, args.store_dir, args.url_index)
+    elif args.command == 'export':
+        export_json(args.output_dir, args.store_dir, None if args.compact else 2)
+    else:
+        store_info(args.store_dir)
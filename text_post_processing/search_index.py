@@ -0,0 +1,444 @@
+import re
+import math
+import mmap
+import json
+import time
+import zlib
+import heapq
+import bisect
+import random
+import operator
+import sqlite3
+import argparse
+from array import array
+from pathlib import Path
+from datetime import datetime, timezone
+from itertools import accumulate, repeat
+
+# --- BM25 search index ---
+#
+# A positional inverted index over the combined corpus, one entry per page. Every term's postings
+# are three deflated uint32 arrays in postings.bin: page id gaps, term frequencies and position
+# gaps. Positions are corpus-wide (page base + offset, with PAGE_GAP unused positions between
+# pages so phrases never span two), so a term's positions decode in one pass and an exact
+# phrase is a set intersection of shifted position lists, both at C speed. The lexicon and page
+# table live in lexicon.sqlite; postings.bin is memory-mapped.
+#
+#   python search_index.py build
+#   python search_index.py search oswald mexico                  (all terms required, BM25 ranked)
+#   python search_index.py search '"lee harvey oswald"' cia      (exact phrase)
+#   python search_index.py search '"oswald embassy"~10'          (both within 10 words of each other)
+#   python search_index.py search kgb cia --any                  (any term)
+#   python search_index.py bench                                 (p50/p99 latency, appended to bench_history.tsv)
+#
+#   from search_index import SearchIndex
+#   with SearchIndex() as index:
+#       total, hits = index.search('"warren commission" testimony', k=25)   # hits: [(score, document_id, page_number)]
+
+SOURCE_DIR = (Path.cwd().parent / 'corpus' / 'jfk_combined_documents_json').resolve()
+INDEX_DIR = (Path.cwd().parent / 'corpus' / 'search_index').resolve()
+
+K1 = 1.2
+B = 0.75
+PAGE_GAP = 256        # Unused positions between pages
+MAX_SLOP = 200        # Proximity windows must stay shorter than PAGE_GAP
+
+_TOKEN = re.compile(r'[^\W_]+')
+_QUERY = re.compile(r'"([^"]*)"(?:~(\d+))?|(\S+)')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.casefold())
+
+
+def _pack(values):
+    return zlib.compress(array('I', values).tobytes())
+
+
+def _unpack(data):
+    values = array('I')
+    values.frombytes(zlib.decompress(data))
+    return values
+
+
+def build_index(source_dir=SOURCE_DIR, index_dir=INDEX_DIR):
+    """(Re)builds the index from the combine_docs.py output directory."""
+    start = time.perf_counter()
+    postings = {}   # term -> [page ids, term frequencies, position gaps, last position]
+    pages = []      # (document_id, page_number, length)
+    base = 0        # Corpus-wide position of the current page's first token
+    for json_file in sorted(Path(source_dir).glob('*.json')):
+        if json_file.name.startswith('.'):
+            continue
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                document = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Skipping {json_file.name}: {e}")
+            continue
+        for page in document.get('pages', []):
+            page_id = len(pages)
+            tokens = tokenize(page.get('text') or '')
+            pages.append((document.get('document_id', json_file.stem), page.get('page_number', 0), len(tokens)))
+            positions = {}
+            for position, token in enumerate(tokens, start=base):
+                positions.setdefault(token, []).append(position)
+            for token, term_positions in positions.items():
+                entry = postings.get(token)
+                if entry is None:
+                    entry = postings[token] = [array('I'), array('I'), array('I'), 0]
+                entry[0].append(page_id)
+                entry[1].append(len(term_positions))
+                previous = entry[3]
+                for position in term_positions:
+                    entry[2].append(position - previous)
+                    previous = position
+                entry[3] = previous
+            base += len(tokens) + PAGE_GAP
+    parse_seconds = time.perf_counter() - start
+
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    lexicon_tmp = index_dir / 'lexicon.tmp'
+    postings_tmp = index_dir / 'postings.tmp'
+    if lexicon_tmp.exists():
+        lexicon_tmp.unlink()
+    conn = sqlite3.connect(str(lexicon_tmp))
+    conn.executescript("""
+    PRAGMA journal_mode=OFF;
+    PRAGMA synchronous=OFF;
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+    CREATE TABLE pages (id INTEGER PRIMARY KEY, document_id TEXT NOT NULL, page_number INTEGER NOT NULL,
+                        length INTEGER NOT NULL);
+    CREATE TABLE terms (
+        term TEXT PRIMARY KEY,
+        df INTEGER NOT NULL,          -- Pages containing the term
+        cf INTEGER NOT NULL,          -- Occurrences in the corpus
+        offset INTEGER NOT NULL,      -- Into postings.bin: page gaps, then frequencies, then positions
+        page_bytes INTEGER NOT NULL,
+        tf_bytes INTEGER NOT NULL,
+        position_bytes INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """)
+    conn.executemany("INSERT INTO pages VALUES (?, ?, ?, ?)",
+                     ((i, doc_id, page_number, length) for i, (doc_id, page_number, length) in enumerate(pages)))
+
+    terms = []
+    offset = 0
+    with open(postings_tmp, 'wb') as out:
+        for term in sorted(postings):
+            page_ids, tfs, position_gaps, _ = postings.pop(term)
+            page_gaps = [page_ids[0]] + [b - a for a, b in zip(page_ids, page_ids[1:])]
+            blocks = [_pack(page_gaps), _pack(tfs), _pack(position_gaps)]
+            for block in blocks:
+                out.write(block)
+            terms.append((term, len(page_ids), len(position_gaps), offset, *map(len, blocks)))
+            offset += sum(map(len, blocks))
+    conn.executemany("INSERT INTO terms VALUES (?, ?, ?, ?, ?, ?, ?)", terms)
+
+    total_tokens = sum(length for _, _, length in pages)
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ('pages', len(pages)),
+        ('tokens', total_tokens),
+        ('avg_length', total_tokens / len(pages) if pages else 0.0),
+        ('page_gap', PAGE_GAP),
+        ('built_at', datetime.now(timezone.utc).isoformat(timespec='seconds')),
+        ('source', str(source_dir)),
+    ])
+    conn.commit()
+    conn.close()
+    postings_tmp.replace(index_dir / 'postings.bin')
+    lexicon_tmp.replace(index_dir / 'lexicon.sqlite')
+    print(f"Indexed {len(pages)} pages, {len(terms)} terms, {total_tokens} tokens "
+          f"({offset / (1024 * 1024):.1f} MB of postings) in {time.perf_counter() - start:.1f}s "
+          f"(parse {parse_seconds:.1f}s) -> {index_dir}")
+
+
+def parse_query(query):
+    """Splits a query into clauses: (tokens, slop) where slop None is a single term, 0 an exact
+    phrase and N > 0 a proximity clause (all tokens within N words of each other, in any order,
+    N capped at MAX_SLOP). A bare word that tokenizes to several tokens ("U.S.") is a phrase."""
+    clauses = []
+    for phrase, slop, word in _QUERY.findall(query):
+        tokens = tokenize(phrase if phrase or slop else word)
+        if len(tokens) == 1:
+            clauses.append((tokens, None))
+        elif tokens:
+            clauses.append((tokens, min(int(slop), MAX_SLOP) if slop else 0))
+    return clauses
+
+
+def _sorted_contains(values, x):
+    i = bisect.bisect_left(values, x)
+    return i < len(values) and values[i] == x
+
+
+def _window_match(position_lists, slop):
+    """True if some window holds every token with at most slop other words in it."""
+    events = sorted((p, i) for i, positions in enumerate(position_lists) for p in positions)
+    needed = len(position_lists)
+    counts = [0] * needed
+    covered = 0
+    left = 0
+    for position, term in events:
+        counts[term] += 1
+        if counts[term] == 1:
+            covered += 1
+        while covered == needed:
+            start, start_term = events[left]
+            if position - start + 1 - needed <= slop:
+                return True
+            counts[start_term] -= 1
+            if counts[start_term] == 0:
+                covered -= 1
+            left += 1
+    return False
+
+
+class SearchIndex:
+    """Read-only BM25 query API over an index built by build_index."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        index_dir = Path(index_dir)
+        self.conn = sqlite3.connect(f"file:{index_dir / 'lexicon.sqlite'}?mode=ro", uri=True)
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self.page_count = int(meta['pages'])
+        self.avg_length = float(meta['avg_length']) or 1.0
+        lengths = [length for (length,) in self.conn.execute("SELECT length FROM pages ORDER BY id")]
+        # K1 * (1 - B + B * length / avg_length) per page, the length part of the BM25 denominator
+        self.norms = [K1 * (1 - B + B * length / self.avg_length) for length in lengths]
+        # Corpus-wide position of each page's first token, plus one past the last page
+        self.bases = list(accumulate((length + int(meta['page_gap']) for length in lengths), initial=0))
+        self._file = open(index_dir / 'postings.bin', 'rb')
+        self.postings = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if self._file.seek(0, 2) else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.postings, mmap.mmap):
+            self.postings.close()
+        self._file.close()
+        self.conn.close()
+
+    def _term(self, token):
+        return self.conn.execute("SELECT df, offset, page_bytes, tf_bytes, position_bytes FROM terms WHERE term=?",
+                                 (token,)).fetchone()
+
+    def _pages(self, entry):
+        """{page id: term frequency} for a lexicon entry."""
+        _, offset, page_bytes, tf_bytes, _ = entry
+        page_ids = accumulate(_unpack(self.postings[offset:offset + page_bytes]))
+        return dict(zip(page_ids, _unpack(self.postings[offset + page_bytes:offset + page_bytes + tf_bytes])))
+
+    def _positions(self, entry):
+        """Sorted corpus-wide positions of a lexicon entry."""
+        _, offset, page_bytes, tf_bytes, position_bytes = entry
+        start = offset + page_bytes + tf_bytes
+        return list(accumulate(_unpack(self.postings[start:start + position_bytes])))
+
+    def _phrase_pages(self, tokens, entries):
+        """Pages holding the tokens as an exact phrase."""
+        starts = None
+        # Phrase start positions, narrowed from the rarest token's positions (shifted by its offset)
+        for i in sorted(range(len(tokens)), key=lambda i: entries[tokens[i]][0]):
+            positions = self._positions(entries[tokens[i]])
+            if starts is None:
+                starts = set(map(operator.sub, positions, repeat(i)))
+            elif len(starts) * 16 < len(positions):
+                # Few starts left against a long list ("bay of pigs"): binary search instead of a full pass
+                starts = {p for p in starts if _sorted_contains(positions, p + i)}
+            else:
+                starts = starts.intersection(map(operator.sub, positions, repeat(i)))
+            if not starts:
+                return set()
+        return {bisect.bisect_right(self.bases, p) - 1 for p in starts}
+
+    def _proximity_pages(self, tokens, entries, slop, candidates):
+        """Candidate pages with a window holding every token and at most slop other words.
+
+        Every such window contains an occurrence of the rarest token, so only the other tokens'
+        positions within reach of one of those anchors are checked, and a page is left as soon
+        as it matches."""
+        tokens = sorted(set(tokens), key=lambda t: entries[t][0])
+        width = slop + len(tokens) - 1
+        anchors, *others = [self._positions(entries[t]) for t in tokens]
+        bases = self.bases
+        pages = set()
+        i = 0
+        while i < len(anchors):
+            anchor = anchors[i]
+            page = bisect.bisect_right(bases, anchor) - 1
+            next_page = bisect.bisect_left(anchors, bases[page + 1], i)
+            if page in candidates:
+                for anchor in anchors[i:next_page]:
+                    near = []
+                    for positions in others:
+                        lo = bisect.bisect_left(positions, anchor - width)
+                        hi = bisect.bisect_right(positions, anchor + width, lo)
+                        if lo == hi:
+                            break
+                        near.append(positions[lo:hi])
+                    else:
+                        if len(near) == 1 or _window_match([[anchor]] + near, slop):
+                            pages.add(page)
+                            break
+            i = next_page
+        return pages
+
+    def idf(self, df):
+        return math.log(1 + (self.page_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=10, require_all=True):
+        """Returns (exact number of matching pages, top k [(score, document_id, page_number)]).
+
+        Clauses are terms, "exact phrases" and "proximity clauses"~N. By default every clause
+        must match; with require_all=False any one of them is enough. Matching pages are ranked
+        by BM25 over all the query's tokens.
+        """
+        clauses = parse_query(query)
+        entries, tfs = {}, {}
+        for tokens, _ in clauses:
+            for token in tokens:
+                if token not in entries:
+                    entries[token] = self._term(token)
+                    tfs[token] = self._pages(entries[token]) if entries[token] else {}
+
+        matched = None
+        for tokens, slop in clauses:
+            # Pages holding every token of the clause, smallest posting list first
+            lists = sorted((tfs[t] for t in set(tokens)), key=len)
+            candidates = set(lists[0]).intersection(*lists[1:])
+            if require_all and matched is not None:
+                candidates &= matched
+            if slop == 0 and candidates:
+                candidates &= self._phrase_pages(tokens, entries)
+            elif slop and candidates:
+                candidates = self._proximity_pages(tokens, entries, slop, candidates)
+            if matched is None:
+                matched = candidates
+            elif require_all:
+                matched &= candidates
+            else:
+                matched |= candidates
+            if require_all and not matched:
+                break
+        if not matched:
+            return 0, []
+
+        scores = dict.fromkeys(matched, 0.0)
+        norms = self.norms
+        for token, page_tfs in tfs.items():
+            if not page_tfs:
+                continue
+            weight = self.idf(entries[token][0]) * (K1 + 1)
+            if len(page_tfs) < len(scores):
+                for page_id, tf in page_tfs.items():
+                    if page_id in scores:
+                        scores[page_id] += weight * tf / (tf + norms[page_id])
+            else:
+                for page_id in scores:
+                    tf = page_tfs.get(page_id)
+                    if tf:
+                        scores[page_id] += weight * tf / (tf + norms[page_id])
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        hits = []
+        for page_id, score in top:
+            document_id, page_number = self.conn.execute(
+                "SELECT document_id, page_number FROM pages WHERE id=?", (page_id,)).fetchone()
+            hits.append((score, document_id, page_number))
+        return len(matched), hits
+
+    def sample_queries(self, count, seed=0):
+        """Benchmark queries: one to three terms and some phrases drawn from mid-frequency terms."""
+        rng = random.Random(seed)
+        low, high = max(2, self.page_count // 5000), max(3, self.page_count // 5)
+        terms = [row[0] for row in self.conn.execute(
+            "SELECT term FROM terms WHERE df BETWEEN ? AND ? AND length(term) > 2", (low, high))]
+        if not terms:
+            return []
+        queries = []
+        for i in range(count):
+            words = rng.sample(terms, min(len(terms), rng.randint(1, 3)))
+            if i % 4 == 3:
+                queries.append(f'"{" ".join(words[:2])}"~{rng.choice([0, 5, 20])}')
+            else:
+                queries.append(' '.join(words))
+        return queries
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def benchmark(index, queries, k=10, repeat=3, history_path=None):
+    """Times every query repeat times; prints p50/p99/mean and appends them to history_path."""
+    for query in queries[:20]:
+        index.search(query, k)   # Warm the page cache and the lexicon
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50, p99, mean = percentile(timings, 0.5), percentile(timings, 0.99), sum(timings) / len(timings)
+    print(f"{len(queries)} queries x {repeat} over {index.page_count} pages: "
+          f"p50 {p50:.2f} ms  p99 {p99:.2f} ms  mean {mean:.2f} ms  max {timings[-1]:.2f} ms")
+    if history_path:
+        new_file = not Path(history_path).exists()
+        with open(history_path, 'a', encoding='utf-8') as f:
+            if new_file:
+                f.write("timestamp\tpages\tqueries\tp50_ms\tp99_ms\tmean_ms\n")
+            f.write(f"{datetime.now(timezone.utc).isoformat(timespec='seconds')}\t{index.page_count}\t"
+                    f"{len(timings)}\t{p50:.3f}\t{p99:.3f}\t{mean:.3f}\n")
+    return p50, p99
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the BM25 page search index.")
+    parser.add_argument('--index-dir', type=Path, default=INDEX_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Build the index from combine_docs.py output")
+    build.add_argument('--source-dir', type=Path, default=SOURCE_DIR)
+    search = commands.add_parser('search', help="Top pages for a query")
+    search.add_argument('query', nargs='+')
+    search.add_argument('-k', type=int, default=10)
+    search.add_argument('--any', action='store_true', help="Match pages with any clause instead of all of them")
+    bench = commands.add_parser('bench', help="Query latency percentiles")
+    bench.add_argument('--queries', type=Path, help="One query per line (default: sampled from the lexicon)")
+    bench.add_argument('--count', type=int, default=500, help="Sampled queries")
+    bench.add_argument('--repeat', type=int, default=3)
+    bench.add_argument('-k', type=int, default=10)
+    commands.add_parser('info', help="Index size and build details")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.source_dir, args.index_dir)
+    elif args.command == 'info':
+        with SearchIndex(args.index_dir) as index:
+            for key, value in index.conn.execute("SELECT key, value FROM meta"):
+                print(f"{key:<12}{value}")
+            print(f"{'terms':<12}{index.conn.execute('SELECT COUNT(*) FROM terms').fetchone()[0]}")
+            print(f"{'postings':<12}{len(index.postings) / (1024 * 1024):.1f} MB")
+    else:
+        with SearchIndex(args.index_dir) as index:
+            if args.command == 'search':
+                start = time.perf_counter()
+                total, hits = index.search(' '.join(args.query), args.k, require_all=not args.any)
+                elapsed = (time.perf_counter() - start) * 1000
+                for score, document_id, page_number in hits:
+                    print(f"{score:8.3f}  {document_id}\tpage {page_number}")
+                print(f"{total} pages ({elapsed:.1f} ms)")
+            else:
+                if args.queries:
+                    with open(args.queries, 'r', encoding='utf-8') as f:
+                        queries = [line.strip() for line in f if line.strip()]
+                else:
+                    queries = index.sample_queries(args.count)
+                benchmark(index, queries, args.k, args.repeat, Path(args.index_dir) / 'bench_history.tsv')
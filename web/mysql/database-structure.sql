@@ -13,7 +13,9 @@ CREATE TABLE `pages` (
   `document_id` int DEFAULT NULL,
   `page_number` int DEFAULT NULL,
   `text` longtext,
+  `text_hash` char(40) DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `doc_page` (`document_id`,`page_number`),
   KEY `document_id` (`document_id`),
   FULLTEXT KEY `text` (`text`),
   CONSTRAINT `pages_ibfk_1` FOREIGN KEY (`document_id`) REFERENCES `documents` (`id`)
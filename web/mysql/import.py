@@ -1,11 +1,68 @@
 import mysql.connector
+import re
 import json
 import os
 import glob
+import time
+import hashlib
+import argparse
+import zlib
+import tempfile
+from array import array
 from pathlib import Path
+from itertools import accumulate
 import sys
 
 
+# --- Bulk loader ---
+#
+# Loads the corpus in large transactions: documents are upserted in executemany batches with
+# one id lookup per batch, and pages go in as multi-row upserts keyed on UNIQUE (document_id,
+# page_number) (or with LOAD DATA LOCAL INFILE from a generated TSV). The FULLTEXT index is
+# dropped for the load and rebuilt once at the end, so search is unavailable until it finishes.
+#
+#   python import.py                     (full load or reimport, safe to rerun)
+#   python import.py --load-data         (LOAD DATA LOCAL INFILE; needs local_infile=ON on the server)
+#   python import.py --keep-fulltext     (small loads: keep the index live instead of rebuilding it)
+#
+# --- Delta sync ---
+#
+# Every page row carries text_hash, the SHA-1 of its text. --sync compares those against the
+# corpus and only writes the difference: changed pages are updated, new ones inserted and pages
+# (or whole documents) no longer in the corpus deleted, in batches within one transaction. The
+# FULLTEXT index stays in place and InnoDB updates it for just those rows.
+#
+#   python import.py --sync --dry-run    (report what would change)
+#   python import.py --sync
+#
+# --- Trigram index ---
+#
+# After a full load this script rebuilds page_trigrams: every distinct 3-character
+# substring of the page text (lowercased, anything but letters and digits turned into a space,
+# a space added at both ends) -> the sorted pages.id values containing it, stored as deflated
+# little-endian uint32 gaps. index.php uses it two ways:
+#
+#   short words and acronyms ("CIA", "KGB", up to $trigram_max_term_len characters) are looked up
+#   as whole words (" cia" + "cia" + "ia " candidates, checked with REGEXP) instead of FULLTEXT,
+#   and limit the FULLTEXT query to those pages when the query also has longer terms
+#
+#   queries made only of terms under $ft_min_word_len characters ("J F") used to be a LIKE
+#   '%query%' scan over every page; their trigram candidates are checked with LIKE instead.
+#   Needles under 3 characters ("JM") have no trigram and still scan.
+#
+# A sync patches page_trigrams instead of rebuilding it: the old trigrams of the pages it
+# overwrites or deletes are read before the write, the new ones from the pages it wrote, and
+# only the posting lists of those trigrams are rewritten. Syncs touching more than
+# TRIGRAM_PATCH_MAX_PAGES pages rebuild the table as after a full load.
+#
+#   python import.py --trigrams                                  (rebuild just the trigram index)
+#   python import.py --bench-search CIA KGB FBI "oswald CIA" "J F" JM
+#                                            (index.php's queries with and without page_trigrams)
+
+BATCH_SIZE = 1000         # Rows per executemany
+COMMIT_ROWS = 50000       # Pages per transaction
+TRIGRAM_PATCH_MAX_PAGES = 20000   # Above this many changed pages a sync rebuilds page_trigrams instead
+
 # Database configuration
 config = {
     'user': 'root',
@@ -16,84 +73,702 @@ config = {
     'raise_on_warnings': True
 }
 
-# Connect to MySQL
-cnx = mysql.connector.connect(**config)
-cursor = cnx.cursor()
 
+corpus_path = (Path.cwd().parent.parent / 'corpus').resolve()
+# document_id -> original URL, written by download/download.py; joined at load time
+url_index_path = corpus_path / 'document_urls.json'
+# NLP output; with the URL index there is no need for the merge_links_with_json.py copy
+json_folder_path = corpus_path / 'jfk_combined_documents_json_nlp'
+merged_json_folder_path = corpus_path / 'jfk_combined_documents_json_nlp_with_original_url'
+# Columnar page store (text_post_processing/page_store.py); used instead of the JSON folder while it is current
+page_store_path = corpus_path / 'page_store'
 
-#Create 'documents' table if it doesn't exist, now including original_url
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS documents (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    document_id VARCHAR(100) UNIQUE,
-    total_pages INT,
-    original_url VARCHAR(2048)
-) ENGINE=InnoDB;
-""")
 
-# Create 'pages' table if it doesn't exist
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS pages (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    document_id INT,
-    page_number INT,
-    text LONGTEXT,
-    FOREIGN KEY (document_id) REFERENCES documents(id),
-    FULLTEXT(text)
-) ENGINE=InnoDB;
-""")
+def create_tables(cursor):
+    # Create 'documents' table if it doesn't exist, now including original_url
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS documents (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        document_id VARCHAR(100) UNIQUE,
+        total_pages INT,
+        original_url VARCHAR(2048)
+    ) ENGINE=InnoDB;
+    """)
 
+    # Create 'pages' table if it doesn't exist
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS pages (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        document_id INT,
+        page_number INT,
+        text LONGTEXT,
+        text_hash CHAR(40),
+        FOREIGN KEY (document_id) REFERENCES documents(id),
+        UNIQUE KEY doc_page (document_id, page_number),
+        FULLTEXT(text)
+    ) ENGINE=InnoDB;
+    """)
 
+    # Tables created before the unique key: drop duplicate pages (keeping the first) and add it
+    cursor.execute("SHOW INDEX FROM pages WHERE Key_name = 'doc_page'")
+    if not cursor.fetchall():
+        print("Adding UNIQUE (document_id, page_number) to pages")
+        cursor.execute("""
+        DELETE p1 FROM pages p1 JOIN pages p2
+        ON p1.document_id = p2.document_id AND p1.page_number = p2.page_number AND p1.id > p2.id
+        """)
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate pages")
+        cursor.execute("ALTER TABLE pages ADD UNIQUE KEY doc_page (document_id, page_number)")
 
-json_folder_path = (Path.cwd().parent.parent / 'corpus' / 'jfk_combined_documents_json_nlp_with_original_url').resolve()
-print(json_folder_path)
+    # Tables created before text_hash: add it and hash the stored text server side (SHA1 of the
+    # same UTF-8 bytes as page_hash), so the first --sync doesn't rewrite every page
+    cursor.execute("SHOW COLUMNS FROM pages LIKE 'text_hash'")
+    if not cursor.fetchall():
+        print("Adding text_hash to pages")
+        cursor.execute("ALTER TABLE pages ADD COLUMN text_hash CHAR(40)")
+        cursor.execute("UPDATE pages SET text_hash = SHA1(COALESCE(text, ''))")
 
 
+def fulltext_indexes(cursor):
+    cursor.execute("SHOW INDEX FROM pages WHERE Index_type = 'FULLTEXT'")
+    columns = [c[0] for c in cursor.description]
+    return sorted({dict(zip(columns, row))['Key_name'] for row in cursor.fetchall()})
 
 
-# Iterate over each JSON file in the folder
-for json_file in glob.glob(os.path.join(json_folder_path, '*.json')):
-    print(json_file)
-    with open(json_file, 'r', encoding='utf-8') as file:
-        document = json.load(file)
-    
-    doc_id = document['document_id']
-    total_pages = document['total_pages']
-    original_url = document.get('original_url', 'URL_NOT_FOUND')
+def load_url_index():
+    if not url_index_path.exists():
+        return {}
+    with open(url_index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    print(f"{url_index_path}: {len(index['urls'])} URLs fetched {index.get('fetched_at')} from {index.get('source')}")
+    return index['urls']
 
-    # Insert document metadata (ignore if already exists, update original_url)
-    cursor.execute("""
-    INSERT INTO documents (document_id, total_pages, original_url)
-    VALUES (%s, %s, %s)
-    ON DUPLICATE KEY UPDATE total_pages=VALUES(total_pages), original_url=VALUES(original_url)
-    """, (doc_id, total_pages, original_url))
 
-    cnx.commit()
+def load_documents():
+    """Yields (doc_id, total_pages, original_url, [(page_number, text)]) for every document."""
+    url_index = load_url_index()
 
-    # Get the auto-generated id for the current document
-    cursor.execute("SELECT id FROM documents WHERE document_id=%s", (doc_id,))
-    document_db_id = cursor.fetchone()[0]
+    if (page_store_path / 'nlp.parquet').exists():
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / 'text_post_processing'))
+        from page_store import is_current, iter_documents
+    if (page_store_path / 'nlp.parquet').exists() and is_current('nlp', json_folder_path, page_store_path):
+        print(f"Reading {page_store_path}")
+        columns = ['clean_text']
+        if not url_index and (page_store_path / 'urls.parquet').exists():
+            columns.append('original_url')
+        for doc_id, rows in iter_documents(columns, page_store_path):
+            original_url = url_index.get(doc_id) or rows[0].get('original_url') or 'URL_NOT_FOUND'
+            yield doc_id, len(rows), original_url, [(row['page_number'], row['clean_text']) for row in rows]
+        return
 
-    # Insert each page
-    for page in document['pages']:
-        page_number = page['page_number']
-        text = page['text']
+    if (page_store_path / 'nlp.parquet').exists():
+        print(f"{page_store_path} no longer matches {json_folder_path}, ignoring it (rerun clean_text.py "
+              f"or page_store.py ingest)")
+    folder = json_folder_path if url_index or not merged_json_folder_path.exists() else merged_json_folder_path
+    print(folder)
+    # Iterate over each JSON file in the folder
+    for json_file in glob.glob(os.path.join(folder, '*.json')):
+        with open(json_file, 'r', encoding='utf-8') as file:
+            document = json.load(file)
+        doc_id = document['document_id']
+        original_url = url_index.get(doc_id) or document.get('original_url', 'URL_NOT_FOUND')
+        yield (doc_id, document['total_pages'], original_url,
+               [(page['page_number'], page['text']) for page in document['pages']])
 
-        # Avoid inserting duplicate pages
-        cursor.execute("""
-        SELECT COUNT(*) FROM pages 
-        WHERE document_id=%s AND page_number=%s
-        """, (document_db_id, page_number))
-        
-        if cursor.fetchone()[0] == 0:
+
+def page_hash(text):
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def tsv_field(value):
+    """Escapes a value for LOAD DATA's default FIELDS ESCAPED BY '\\\\' format."""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\0', '\\0'))
+
+
+def upsert_documents(cursor, documents, batch_size=BATCH_SIZE):
+    """Upserts [(doc_id, total_pages, original_url)] and returns {doc_id: documents.id}."""
+    for i in range(0, len(documents), batch_size):
+        cursor.executemany("""
+        INSERT INTO documents (document_id, total_pages, original_url)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE total_pages=VALUES(total_pages), original_url=VALUES(original_url)
+        """, documents[i:i + batch_size])
+    doc_ids = [d[0] for d in documents]
+    cursor.execute(f"SELECT document_id, id FROM documents WHERE document_id IN ({','.join(['%s'] * len(doc_ids))})",
+                   doc_ids)
+    return dict(cursor.fetchall())
+
+
+def write_pages(cursor, rows, batch_size=BATCH_SIZE):
+    """Upserts [(documents.id, page_number, text, text_hash)] in executemany batches."""
+    for i in range(0, len(rows), batch_size):
+        cursor.executemany("""
+        INSERT INTO pages (document_id, page_number, text, text_hash)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE text=VALUES(text), text_hash=VALUES(text_hash)
+        """, rows[i:i + batch_size])
+
+
+def page_ids(cursor, keys, batch_size=BATCH_SIZE):
+    """pages.id of each (documents.id, page_number) in keys."""
+    ids = []
+    for i in range(0, len(keys), batch_size):
+        batch = keys[i:i + batch_size]
+        cursor.execute(f"SELECT id FROM pages WHERE (document_id, page_number) IN "
+                       f"({','.join(['(%s, %s)'] * len(batch))})", [value for key in batch for value in key])
+        ids.extend(row[0] for row in cursor.fetchall())
+    return ids
+
+
+def delete_rows(cursor, table, ids, batch_size=BATCH_SIZE):
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({','.join(['%s'] * len(batch))})", batch)
+
+
+def bulk_import(cnx, batch_size=BATCH_SIZE, commit_rows=COMMIT_ROWS, load_data=False, keep_fulltext=False):
+    cursor = cnx.cursor()
+    start = time.perf_counter()
+    create_tables(cursor)
+
+    dropped = [] if keep_fulltext else fulltext_indexes(cursor)
+    for name in dropped:
+        print(f"Dropping FULLTEXT index {name} for the load")
+        cursor.execute(f"ALTER TABLE pages DROP INDEX `{name}`")
+
+    cnx.autocommit = False
+    # Documents are always written before their pages, so the per-row foreign key lookups can go
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    tsv = tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False) \
+        if load_data else None
+
+    documents, pages = [], []
+    totals = {'documents': 0, 'pages': 0}
+    uncommitted = 0
+
+    def flush():
+        nonlocal uncommitted
+        ids = upsert_documents(cursor, documents, batch_size)
+        rows = [(ids[doc_id], page_number, text, page_hash(text)) for doc_id, page_number, text in pages]
+        if tsv:
+            tsv.writelines('\t'.join(tsv_field(v) for v in row) + '\n' for row in rows)
+        else:
+            write_pages(cursor, rows, batch_size)
+        totals['documents'] += len(documents)
+        totals['pages'] += len(rows)
+        uncommitted += len(rows)
+        if uncommitted >= commit_rows:
+            cnx.commit()
+            uncommitted = 0
+            print(f"{totals['documents']} documents, {totals['pages']} pages "
+                  f"({totals['pages'] / (time.perf_counter() - start):.0f} pages/s)")
+        documents.clear()
+        pages.clear()
+
+    try:
+        for doc_id, total_pages, original_url, doc_pages in load_documents():
+            documents.append((doc_id, total_pages, original_url))
+            pages.extend((doc_id, page_number, text) for page_number, text in doc_pages)
+            if len(pages) >= batch_size * 10:
+                flush()
+        if documents:
+            flush()
+        cnx.commit()
+
+        if tsv:
+            tsv.close()
+            load_start = time.perf_counter()
+            # REPLACE resolves clashes on doc_page, making the load an upsert like the executemany path
             cursor.execute("""
-            INSERT INTO pages (document_id, page_number, text)
-            VALUES (%s, %s, %s)
-            """, (document_db_id, page_number, text))
+            LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE pages
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'
+            (document_id, page_number, text, text_hash)
+            """, (tsv.name,))
+            cnx.commit()
+            print(f"LOAD DATA: {totals['pages']} pages in {time.perf_counter() - load_start:.1f}s")
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+        if tsv:
+            tsv.close()
+            os.unlink(tsv.name)
+        load_seconds = time.perf_counter() - start
+        # Rebuilt even after a failed load, so the site's search keeps working
+        for name in dropped:
+            index_start = time.perf_counter()
+            print(f"Rebuilding FULLTEXT index {name}")
+            cursor.execute(f"ALTER TABLE pages ADD FULLTEXT KEY `{name}` (text)")
+            print(f"FULLTEXT index rebuilt in {time.perf_counter() - index_start:.1f}s")
+
+    cursor.close()
+    print(f"Loaded {totals['documents']} documents, {totals['pages']} pages in {load_seconds:.1f}s "
+          f"(total {time.perf_counter() - start:.1f}s)")
+    return totals
+
+
+def sync(cnx, batch_size=BATCH_SIZE, dry_run=False):
+    """Brings the database in line with the corpus by writing only changed, new and removed pages.
+
+    Returns (counts, touched). touched has the pages.id values 'written' (inserted or updated) and
+    'removed', and 'old_trigrams', {pages.id: trigrams} of the overwritten and removed pages as
+    they were before the sync, for update_trigram_index. 'old_trigrams' is None when there was no
+    page_trigrams to patch or more than TRIGRAM_PATCH_MAX_PAGES pages changed; touched is None
+    when a full bulk load ran instead and (None, None) when nothing was synced.
+    """
+    cursor = cnx.cursor()
+    start = time.perf_counter()
+    create_tables(cursor)
+    if not dry_run:
+        cursor.execute("SELECT COUNT(*) FROM pages")
+        if not cursor.fetchone()[0]:
+            print("pages is empty, running a full bulk load instead")
+            cursor.close()
+            return bulk_import(cnx, batch_size), None
+    touched = {'written': set(), 'removed': set(),
+               'old_trigrams': {} if has_table(cnx, 'page_trigrams') else None}
+
+    cursor.execute("SELECT document_id, id, total_pages, original_url FROM documents")
+    db_documents = {row[0]: row[1:] for row in cursor.fetchall()}
+    doc_db_ids = {doc_id: row[0] for doc_id, row in db_documents.items()}
+    cursor.execute("SELECT document_id, page_number, id, text_hash FROM pages")
+    db_pages = {}   # documents.id -> {page_number: (pages.id, text_hash)}
+    for document_db_id, page_number, page_id, text_hash in cursor.fetchall():
+        db_pages.setdefault(document_db_id, {})[page_number] = (page_id, text_hash)
+    print(f"Database: {len(db_documents)} documents, {sum(len(p) for p in db_pages.values())} pages "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    counts = dict.fromkeys(['documents added', 'documents updated', 'documents removed',
+                            'pages added', 'pages updated', 'pages removed', 'pages unchanged'], 0)
+    changes = []
+    doc_writes, page_writes, page_deletes = [], [], []   # page_writes: (doc_id, page_number, text, text_hash)
+    page_overwrites = []   # pages.id of the updated pages in page_writes
+    cnx.autocommit = False
+
+    def remember_old_trigrams(ids):
+        old_trigrams = touched['old_trigrams']
+        if old_trigrams is None or not ids:
+            return
+        if len(old_trigrams) + len(ids) > TRIGRAM_PATCH_MAX_PAGES:
+            touched['old_trigrams'] = None   # Too many to patch; the caller rebuilds
+            return
+        old_trigrams.update(page_trigram_sets(cursor, ids, batch_size))
+
+    def flush():
+        if not dry_run:
+            remember_old_trigrams(page_overwrites + page_deletes)
+            if doc_writes:
+                doc_db_ids.update(upsert_documents(cursor, doc_writes, batch_size))
+            rows = [(doc_db_ids[d], n, text, digest) for d, n, text, digest in page_writes]
+            write_pages(cursor, rows, batch_size)
+            delete_rows(cursor, 'pages', page_deletes, batch_size)
+            touched['written'].update(page_ids(cursor, [row[:2] for row in rows], batch_size))
+            touched['removed'].update(page_deletes)
+        doc_writes.clear()
+        page_writes.clear()
+        page_deletes.clear()
+        page_overwrites.clear()
+
+    try:
+        seen = set()
+        for doc_id, total_pages, original_url, pages in load_documents():
+            seen.add(doc_id)
+            existing = db_documents.get(doc_id)
+            if existing is None:
+                counts['documents added'] += 1
+                doc_writes.append((doc_id, total_pages, original_url))
+            elif existing[1:] != (total_pages, original_url):
+                counts['documents updated'] += 1
+                doc_writes.append((doc_id, total_pages, original_url))
 
+            old_pages = dict(db_pages.get(existing[0], {})) if existing else {}
+            added = updated = 0
+            for page_number, text in pages:
+                digest = page_hash(text)
+                old = old_pages.pop(page_number, None)
+                if old is None:
+                    added += 1
+                elif old[1] != digest:
+                    updated += 1
+                    page_overwrites.append(old[0])
+                else:
+                    counts['pages unchanged'] += 1
+                    continue
+                page_writes.append((doc_id, page_number, text, digest))
+            page_deletes.extend(page_id for page_id, _ in old_pages.values())
+
+            counts['pages added'] += added
+            counts['pages updated'] += updated
+            counts['pages removed'] += len(old_pages)
+            if existing is None:
+                changes.append(f"+ {doc_id} ({added} pages)")
+            elif added or updated or old_pages:
+                changes.append(f"~ {doc_id} (+{added} ~{updated} -{len(old_pages)} pages)")
+            if len(page_writes) >= batch_size * 10:
+                flush()
+
+        if not seen:
+            # An empty or missing corpus would otherwise delete the whole database
+            print("No documents found in the corpus, nothing synced")
+            cnx.rollback()
+            return None, None
+
+        removed = [doc_id for doc_id in db_documents if doc_id not in seen]
+        for doc_id in removed:
+            old_pages = db_pages.get(db_documents[doc_id][0], {})
+            page_deletes.extend(page_id for page_id, _ in old_pages.values())
+            counts['pages removed'] += len(old_pages)
+            changes.append(f"- {doc_id} ({len(old_pages)} pages)")
+        counts['documents removed'] = len(removed)
+        flush()
+        if not dry_run:
+            delete_rows(cursor, 'documents', [db_documents[doc_id][0] for doc_id in removed], batch_size)
+            cnx.commit()
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    for line in changes:
+        print(line)
+    print(', '.join(f"{value} {name}" for name, value in counts.items()))
+    print(f"{'Dry run, nothing written' if dry_run else 'Synced'} in {time.perf_counter() - start:.1f}s")
+    return counts, touched
+
+
+FT_MIN_WORD_LEN = 3        # $ft_min_word_len in web/php/index.php
+TRIGRAM_MAX_TERM_LEN = 4   # $trigram_max_term_len in web/php/index.php
+_NOT_ALNUM = re.compile(r'[\W_]')
+_BOOLEAN_OPERATORS = re.compile(r'[+\-><()~*"@]+')
+
+
+def trigrams(text, pad=True):
+    """Trigrams of the lowercased text with every non letter/digit as a space (and padded with
+    a space at both ends, as pages are indexed)."""
+    text = _NOT_ALNUM.sub(' ', (text or '').lower())
+    if pad:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _pack_ids(page_ids):
+    gaps = array('I', [page_ids[0]] + [b - a for a, b in zip(page_ids, page_ids[1:])])
+    if sys.byteorder == 'big':
+        gaps.byteswap()
+    return zlib.compress(gaps.tobytes())
+
+
+def _unpack_ids(blob):
+    gaps = array('I')
+    gaps.frombytes(zlib.decompress(blob))
+    if sys.byteorder == 'big':
+        gaps.byteswap()
+    return list(accumulate(gaps))
+
+
+def has_table(cnx, name):
+    cursor = cnx.cursor()
+    cursor.execute("SHOW TABLES LIKE %s", (name,))
+    found = bool(cursor.fetchall())
+    cursor.close()
+    return found
+
+
+def build_trigram_index(cnx, batch_bytes=4 * 1024 * 1024):
+    """Rebuilds page_trigrams from the pages table, swapping the new table in atomically."""
+    start = time.perf_counter()
+    postings = {}   # trigram -> pages.id values, ascending
+    cursor = cnx.cursor()
+    cursor.execute("SELECT id, text FROM pages ORDER BY id")
+    page_count = 0
+    for page_id, text in cursor:
+        for trigram in trigrams(text):
+            ids = postings.get(trigram)
+            if ids is None:
+                ids = postings[trigram] = array('I')
+            ids.append(page_id)
+        page_count += 1
+    scan_seconds = time.perf_counter() - start
+
+    cnx.autocommit = False
+    cursor.execute("DROP TABLE IF EXISTS page_trigrams_new")
+    cursor.execute("""
+    CREATE TABLE page_trigrams_new (
+        trigram VARBINARY(12) PRIMARY KEY,
+        page_count INT NOT NULL,
+        pages MEDIUMBLOB NOT NULL
+    ) ENGINE=InnoDB;
+    """)
+    rows, size, total_bytes = [], 0, 0
+    for trigram in sorted(postings):
+        ids = postings.pop(trigram)
+        blob = _pack_ids(ids)
+        rows.append((trigram.encode('utf-8'), len(ids), blob))
+        size += len(blob)
+        if size >= batch_bytes or len(rows) >= BATCH_SIZE:
+            cursor.executemany("INSERT INTO page_trigrams_new (trigram, page_count, pages) VALUES (%s, %s, %s)", rows)
+            total_bytes += size
+            rows, size = [], 0
+    if rows:
+        cursor.executemany("INSERT INTO page_trigrams_new (trigram, page_count, pages) VALUES (%s, %s, %s)", rows)
+        total_bytes += size
     cnx.commit()
 
-cursor.close()
-cnx.close()
+    if has_table(cnx, 'page_trigrams'):
+        cursor.execute("RENAME TABLE page_trigrams TO page_trigrams_old, page_trigrams_new TO page_trigrams")
+        cursor.execute("DROP TABLE page_trigrams_old")
+    else:
+        cursor.execute("RENAME TABLE page_trigrams_new TO page_trigrams")
+    cursor.close()
+    print(f"Trigram index: {page_count} pages, {total_bytes / (1024 * 1024):.1f} MB of postings "
+          f"in {time.perf_counter() - start:.1f}s (scan {scan_seconds:.1f}s)")
+
+
+def page_trigram_sets(cursor, ids, batch_size=BATCH_SIZE):
+    """{pages.id: trigrams of its text} for the given pages."""
+    sets = {}
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        cursor.execute(f"SELECT id, text FROM pages WHERE id IN ({','.join(['%s'] * len(batch))})", batch)
+        sets.update((page_id, trigrams(text)) for page_id, text in cursor.fetchall())
+    return sets
+
+
+def update_trigram_index(cnx, touched, batch_size=BATCH_SIZE):
+    """Patches page_trigrams after a sync (see sync for touched): rewrites only the posting lists
+    of trigrams the changed pages had before or have now. Rebuilds the whole table when the sync
+    couldn't record the old trigrams or wrote more than TRIGRAM_PATCH_MAX_PAGES pages."""
+    written, removed, old_trigrams = touched['written'], touched['removed'], touched['old_trigrams']
+    if not written and not removed:
+        return
+    if old_trigrams is None or len(written) + len(removed) > TRIGRAM_PATCH_MAX_PAGES:
+        build_trigram_index(cnx)
+        return
+    start = time.perf_counter()
+    cursor = cnx.cursor()
+    new_trigrams = page_trigram_sets(cursor, written, batch_size)
+    affected = written | removed
+    postings = {}   # trigram -> pages.id values among the written pages that now contain it
+    for page_id, page_trigrams in new_trigrams.items():
+        for trigram in page_trigrams:
+            postings.setdefault(trigram, []).append(page_id)
+    for page_trigrams in old_trigrams.values():
+        for trigram in page_trigrams:
+            postings.setdefault(trigram, [])
+
+    cnx.autocommit = False
+    try:
+        patched = dropped = 0
+        keys = sorted(postings)
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i:i + batch_size]
+            cursor.execute(f"SELECT trigram, pages FROM page_trigrams WHERE trigram IN "
+                           f"({','.join(['%s'] * len(batch))}) FOR UPDATE", [t.encode('utf-8') for t in batch])
+            stored = {bytes(trigram).decode('utf-8'): blob for trigram, blob in cursor.fetchall()}
+            rows, empty = [], []
+            for trigram in batch:
+                ids = set(_unpack_ids(stored[trigram])) - affected if trigram in stored else set()
+                ids.update(postings[trigram])
+                if ids:
+                    ids = sorted(ids)
+                    rows.append((trigram.encode('utf-8'), len(ids), _pack_ids(ids)))
+                elif trigram in stored:
+                    empty.append(trigram.encode('utf-8'))
+            if rows:
+                cursor.executemany("""
+                INSERT INTO page_trigrams (trigram, page_count, pages) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE page_count=VALUES(page_count), pages=VALUES(pages)
+                """, rows)
+            if empty:
+                cursor.execute(f"DELETE FROM page_trigrams WHERE trigram IN ({','.join(['%s'] * len(empty))})", empty)
+            patched += len(rows)
+            dropped += len(empty)
+        cnx.commit()
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
+    print(f"Trigram index: patched {patched} posting lists and dropped {dropped} for {len(affected)} changed pages "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def trigram_page_ids(cursor, needle, whole_word=False):
+    """Sorted ids of the pages whose text contains needle (case-insensitively), or the word
+    needle with whole_word, found through page_trigrams; the same lookup index.php does. None
+    when the index can't answer the query (needle under 3 characters, or LIKE wildcards)."""
+    lowered = needle.lower()
+    if len(lowered) < 3 or '%' in needle or '_' in needle:
+        return None
+    wanted = trigrams(lowered, pad=whole_word)
+    cursor.execute(f"SELECT pages FROM page_trigrams WHERE trigram IN ({','.join(['%s'] * len(wanted))}) "
+                   f"ORDER BY page_count", [t.encode('utf-8') for t in wanted])
+    blobs = [row[0] for row in cursor.fetchall()]
+    if len(blobs) < len(wanted):
+        return []   # Some trigram occurs on no page
+    candidates = set(_unpack_ids(blobs[0]))
+    for blob in blobs[1:]:
+        candidates.intersection_update(_unpack_ids(blob))
+        if not candidates:
+            return []
+    candidates = sorted(candidates)
+    if not whole_word and len(lowered) == 3 and not _NOT_ALNUM.search(lowered):
+        return candidates   # A 3 letter/digit substring is its own only trigram
+    condition, pattern = ("text REGEXP %s", rf"\b{needle}\b") if whole_word else ("text LIKE %s", f"%{needle}%")
+    verified = []
+    for i in range(0, len(candidates), BATCH_SIZE):
+        batch = candidates[i:i + BATCH_SIZE]
+        cursor.execute(f"SELECT id FROM pages WHERE id IN ({','.join(['%s'] * len(batch))}) AND {condition}",
+                       batch + [pattern])
+        verified.extend(row[0] for row in cursor.fetchall())
+    return sorted(verified)
+
+
+def plan_search(query):
+    """Splits a query the way index.php does: (FULLTEXT terms, trigram word terms, short terms)."""
+    fulltext, words, short = [], [], []
+    for term in query.split():
+        if len(term) < FT_MIN_WORD_LEN:
+            short.append(term)
+            continue
+        term = _BOOLEAN_OPERATORS.sub('', term)
+        if term and len(term) <= TRIGRAM_MAX_TERM_LEN and not _NOT_ALNUM.search(term):
+            words.append(term)
+        elif term:
+            fulltext.append(term)
+    return fulltext, words, short
+
+
+def run_search(cursor, query, use_trigrams=True, per_page=25):
+    """Answers a query as index.php does, with or without page_trigrams.
+
+    Returns (path, total pages, [(document_id, page_number)] of the first results page)."""
+    fulltext, words, short = plan_search(query)
+    page_ids, id_filter = None, ''
+    if words and use_trigrams:
+        found = None
+        for word in words:
+            ids = set(trigram_page_ids(cursor, word, whole_word=True))
+            found = ids if found is None else found & ids
+        if fulltext:
+            path = "trigram words + FULLTEXT"
+            id_filter = f" AND p.id IN ({','.join(map(str, sorted(found))) or '0'})"
+        else:
+            path = "trigram words"
+            page_ids = sorted(found)
+    elif words:
+        fulltext += words
+    if fulltext:
+        if not words or not use_trigrams:
+            path = "FULLTEXT"
+        boolean = ' '.join(f"+{term}" for term in fulltext)
+        cursor.execute(f"""
+        SELECT COUNT(*) FROM pages p JOIN documents d ON p.document_id = d.id
+        WHERE MATCH(p.text) AGAINST(%s IN BOOLEAN MODE){id_filter}
+        """, (boolean,))
+        total = cursor.fetchone()[0]
+        cursor.execute(f"""
+        SELECT d.document_id, p.page_number, p.text, MATCH(p.text) AGAINST(%s IN NATURAL LANGUAGE MODE) AS relevance
+        FROM pages p JOIN documents d ON p.document_id = d.id
+        WHERE MATCH(p.text) AGAINST(%s IN BOOLEAN MODE){id_filter}
+        ORDER BY relevance DESC, p.id LIMIT %s
+        """, (query, boolean, per_page))
+        return path, total, [row[:2] for row in cursor.fetchall()]
+    if page_ids is None and short and use_trigrams:
+        page_ids = trigram_page_ids(cursor, query)
+        path = "trigram substring"
+    if page_ids is None:
+        path = "LIKE scan"
+        cursor.execute("SELECT COUNT(*) FROM pages p JOIN documents d ON p.document_id = d.id WHERE p.text LIKE %s",
+                       (f"%{query}%",))
+        total = cursor.fetchone()[0]
+        cursor.execute("""
+        SELECT d.document_id, p.page_number, p.text FROM pages p JOIN documents d ON p.document_id = d.id
+        WHERE p.text LIKE %s ORDER BY p.id LIMIT %s
+        """, (f"%{query}%", per_page))
+        return path, total, [row[:2] for row in cursor.fetchall()]
+    rows = []
+    if page_ids:
+        first = page_ids[:per_page]
+        cursor.execute(f"""
+        SELECT d.document_id, p.page_number, p.text FROM pages p JOIN documents d ON p.document_id = d.id
+        WHERE p.id IN ({','.join(['%s'] * len(first))}) ORDER BY p.id
+        """, first)
+        rows = [row[:2] for row in cursor.fetchall()]
+    return path, len(page_ids), rows
+
+
+def benchmark_search(cnx, queries, per_page=25, repeat=3):
+    """Times each query the way index.php answers it before page_trigrams (FULLTEXT for 3+
+    character terms, a LIKE scan when every term is shorter) and with it, COUNT plus the first
+    page of results, best of repeat runs."""
+    cursor = cnx.cursor(buffered=True)
+    for query in queries:
+        timings = {}
+        for use_trigrams in (False, True):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                path, total, rows = run_search(cursor, query, use_trigrams, per_page)
+                elapsed = (time.perf_counter() - start) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[use_trigrams] = (path, total, best)
+        (old_path, old_total, old_ms), (new_path, new_total, new_ms) = timings[False], timings[True]
+        print(f"{query!r}: before {old_path} {old_total} pages {old_ms:.1f} ms; "
+              f"after {new_path} {new_total} pages {new_ms:.1f} ms ({old_ms / max(new_ms, 1e-3):.1f}x)")
+    cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the MySQL tables and bulk load the corpus.")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows per executemany")
+    parser.add_argument('--commit-rows', type=int, default=COMMIT_ROWS, help="Pages per transaction")
+    parser.add_argument('--load-data', action='store_true',
+                        help="Load pages with LOAD DATA LOCAL INFILE from a generated TSV")
+    parser.add_argument('--keep-fulltext', action='store_true',
+                        help="Keep the FULLTEXT index during the load instead of dropping and rebuilding it")
+    parser.add_argument('--sync', action='store_true',
+                        help="Only write pages whose content changed, was added or was removed since the last load")
+    parser.add_argument('--dry-run', action='store_true', help="With --sync: report the changes, write nothing")
+    parser.add_argument('--skip-trigrams', action='store_true',
+                        help="Don't rebuild (after a load) or patch (after --sync) the trigram index")
+    parser.add_argument('--trigrams', action='store_true', help="Only rebuild the trigram index")
+    parser.add_argument('--bench-search', nargs='+', metavar='QUERY',
+                        help="Time index.php's search for these queries with and without page_trigrams, then exit")
+    args = parser.parse_args()
+    if args.dry_run and not args.sync:
+        parser.error("--dry-run requires --sync")
 
-print("Import complete with original URLs!")
+    # Connect to MySQL
+    cnx = mysql.connector.connect(**config, allow_local_infile=args.load_data)
+    # CREATE/DROP ... IF [NOT] EXISTS leave a note when there is nothing to do, which raise_on_warnings
+    # turns into an error; without this a second run against existing tables fails
+    cursor = cnx.cursor()
+    cursor.execute("SET SESSION sql_notes = 0")
+    cursor.close()
+    try:
+        if args.bench_search:
+            benchmark_search(cnx, args.bench_search)
+        elif args.trigrams:
+            build_trigram_index(cnx)
+        elif args.sync:
+            counts, touched = sync(cnx, args.batch_size, args.dry_run)
+            if counts and not args.dry_run and not args.skip_trigrams:
+                if touched is None or not has_table(cnx, 'page_trigrams'):
+                    build_trigram_index(cnx)
+                else:
+                    update_trigram_index(cnx, touched, args.batch_size)
+        else:
+            bulk_import(cnx, args.batch_size, args.commit_rows, args.load_data, args.keep_fulltext)
+            if not args.skip_trigrams:
+                build_trigram_index(cnx)
+            print("Import complete with original URLs!")
+    finally:
+        cnx.close()
@@ -61,10 +61,94 @@ function highlight_terms(string $text, array $terms): string {
     }, $text);
 }
 
+/**
+ * Finds pages through the page_trigrams table built by web/mysql/import.py. Text is indexed lowercased,
+ * with every character that is not a letter or digit turned into a space and a space added at both ends,
+ * so " cia" and "ia " only occur where a word starts or ends. Candidate pages hold every trigram of the
+ * needle and only those are checked against the page text (LIKE, or REGEXP for whole words).
+ * Needles under 3 characters can't be looked up and return null: the caller scans instead.
+ * @param mysqli $mysqli The database connection.
+ * @param string $needle The substring (or word) to find, case-insensitively.
+ * @param bool $whole_word Match $needle (letters and digits only) as a whole word instead of a substring.
+ * @return array|null Sorted page ids, or null if the index can't answer (needle too short, LIKE wildcards, no table).
+ */
+function trigram_page_ids(mysqli $mysqli, string $needle, bool $whole_word = false): ?array {
+    $lowered = mb_strtolower($needle, 'UTF-8');
+    if (mb_strlen($lowered, 'UTF-8') < 3 || strpbrk($needle, '%_') !== false) {
+        return null;
+    }
+    $normalized = preg_replace('/[^\p{L}\p{N}]/u', ' ', $lowered);
+    if ($whole_word) {
+        $normalized = ' ' . $normalized . ' ';
+    }
+    $length = mb_strlen($normalized, 'UTF-8');
+    $trigrams = [];
+    for ($i = 0; $i + 3 <= $length; $i++) {
+        $trigrams[mb_substr($normalized, $i, 3, 'UTF-8')] = true;
+    }
+    $trigrams = array_map('strval', array_keys($trigrams));
+
+    try {
+        $placeholders = implode(',', array_fill(0, count($trigrams), '?'));
+        $stmt = $mysqli->prepare("SELECT pages FROM page_trigrams WHERE trigram IN ($placeholders) ORDER BY page_count");
+        if (!$stmt) return null;
+        $stmt->bind_param(str_repeat('s', count($trigrams)), ...$trigrams);
+        if (!$stmt->execute()) return null;
+        $blobs = array_column($stmt->get_result()->fetch_all(MYSQLI_NUM), 0);
+        $stmt->close();
+    } catch (mysqli_sql_exception $e) {
+        return null; // No trigram index yet, use the LIKE scan
+    }
+    if (count($blobs) < count($trigrams)) {
+        return []; // Some trigram occurs on no page
+    }
+
+    // Each blob is zlib-compressed little-endian uint32 gaps between ascending page ids
+    $candidates = null;
+    foreach ($blobs as $blob) {
+        $ids = [];
+        $id = 0;
+        foreach (unpack('V*', gzuncompress($blob)) as $gap) {
+            $id += $gap;
+            $ids[$id] = true;
+        }
+        $candidates = ($candidates === null) ? $ids : array_intersect_key($candidates, $ids);
+        if (empty($candidates)) {
+            return [];
+        }
+    }
+    $candidates = array_keys($candidates);
+    sort($candidates, SORT_NUMERIC);
+    if (!$whole_word && $length === 3 && $normalized === $lowered) {
+        return $candidates; // A 3 letter/digit substring is its own only trigram, nothing to verify
+    }
+
+    $verified = [];
+    if ($whole_word) {
+        $condition = 'text REGEXP ?';
+        $pattern = '\b' . $needle . '\b';
+    } else {
+        $condition = 'text LIKE ?';
+        $pattern = '%' . $needle . '%';
+    }
+    foreach (array_chunk($candidates, 1000) as $chunk) {
+        $stmt = $mysqli->prepare("SELECT id FROM pages WHERE id IN (" . implode(',', array_map('intval', $chunk)) . ") AND $condition");
+        if (!$stmt) return null;
+        $stmt->bind_param('s', $pattern);
+        if (!$stmt->execute()) return null;
+        foreach ($stmt->get_result()->fetch_all(MYSQLI_NUM) as $row) {
+            $verified[] = (int)$row[0];
+        }
+        $stmt->close();
+    }
+    sort($verified, SORT_NUMERIC);
+    return $verified;
+}
 
 // --- Configuration ---
 $results_per_page = 25;
 $ft_min_word_len = 3; // MySQL FULLTEXT index min word length (adjust if your MySQL config differs)
+$trigram_max_term_len = 4; // Letter/digit terms from $ft_min_word_len up to this length (CIA, KGB, FBI) are matched as whole words through page_trigrams
 
 
 // --- Input Processing ---
@@ -73,6 +157,7 @@ $page = isset($_GET['page']) ? max(1, (int)$_GET['page']) : 1;
 
 $original_terms = preg_split('/\s+/', $query, -1, PREG_SPLIT_NO_EMPTY);
 $boolean_query_parts = [];
+$trigram_terms = [];      // Short words and acronyms looked up in page_trigrams instead of FULLTEXT
 $final_search_query = ''; // This will hold the query string passed to SQL
 $query_mode_sql = "";     // This will hold 'IN BOOLEAN MODE', 'IN NATURAL LANGUAGE MODE', or be empty
 $query_explanation = "Natural Language Search"; // User-friendly explanation
@@ -91,6 +176,9 @@ if (!empty($original_terms)) {
             $term_sanitized = preg_replace('/[+\-><()~*\"@]+/', '', $term);
             // Only add non-empty terms after sanitization
             if (!empty($term_sanitized)) {
+                if (mb_strlen($term_sanitized) <= $trigram_max_term_len && preg_match('/^[\p{L}\p{N}]+$/u', $term_sanitized)) {
+                    $trigram_terms[] = $term_sanitized;
+                }
                 // Prepending '+' makes the term mandatory in boolean mode
                 $boolean_query_parts[] = '+' . $term_sanitized;
             }
@@ -113,6 +201,7 @@ if (!empty($original_terms)) {
         $query_mode_sql = ""; // No specific mode for LIKE
         $use_like_fallback = true;
         $query_explanation = "LIKE Fallback (due to short terms)";
+        // Needles under 3 characters can't use page_trigrams and still scan every page
     } else {
         // If the query had terms, but they were all sanitized away (e.g., query was just "+++")
         // Or if something unexpected happened, fall back to Natural Language with original query.
@@ -132,6 +221,8 @@ $total_results = 0;
 $total_pages = 0; // Initialize to 0
 $offset = 0;
 $error_message = null; // To store any execution errors
+$indexed_page_ids = null; // Page ids, in id order, when page_trigrams answers the whole query
+$id_filter_sql = '';       // Restricts a FULLTEXT query to the pages holding its trigram terms
 
 // --- Database Interaction (Only if a valid query exists) ---
 if ($query !== '' && $final_search_query !== '') {
@@ -142,7 +233,35 @@ if ($query !== '' && $final_search_query !== '') {
         // to multiple documents, but it's needed if the WHERE clause depends on the documents table.
         // If the WHERE is only on 'pages.text', counting directly on 'pages' might be faster.
         // However, keeping the JOIN for consistency with the SELECT logic.
-        if ($use_like_fallback) {
+        if (!empty($trigram_terms)) {
+            // Pages containing every short word/acronym as a whole word; null if page_trigrams isn't there
+            $word_page_ids = null;
+            foreach ($trigram_terms as $term) {
+                $ids = trigram_page_ids($mysqli, $term, true);
+                if ($ids === null) {
+                    $word_page_ids = null;
+                    break;
+                }
+                $word_page_ids = ($word_page_ids === null) ? $ids : array_values(array_intersect($word_page_ids, $ids));
+            }
+            if ($word_page_ids !== null) {
+                $fulltext_parts = array_values(array_diff($boolean_query_parts, array_map(fn($t) => '+' . $t, $trigram_terms)));
+                if (empty($fulltext_parts)) {
+                    $indexed_page_ids = $word_page_ids;
+                } else {
+                    // The remaining long terms still go through FULLTEXT, limited to the candidate pages
+                    $final_search_query = implode(' ', $fulltext_parts);
+                    $id_filter_sql = ' AND p.id IN (' . implode(',', array_map('intval', $word_page_ids ?: [0])) . ')';
+                }
+            }
+        } elseif ($use_like_fallback) {
+            $indexed_page_ids = trigram_page_ids($mysqli, $query);
+        }
+        if ($indexed_page_ids !== null) {
+            // Counted by the trigram lookup, no statement needed
+            $count_stmt = null;
+            $total_results = count($indexed_page_ids);
+        } elseif ($use_like_fallback) {
             $count_sql = "SELECT COUNT(*)
                           FROM pages p
                           JOIN documents d ON p.document_id = d.id -- Assuming join is on d.id (PK) = p.document_id (FK)
@@ -155,18 +274,20 @@ if ($query !== '' && $final_search_query !== '') {
             $count_sql = "SELECT COUNT(*)
                           FROM pages p
                           JOIN documents d ON p.document_id = d.id -- Assuming join is on d.id (PK) = p.document_id (FK)
-                          WHERE MATCH(p.text) AGAINST(? {$query_mode_sql})";
+                          WHERE MATCH(p.text) AGAINST(? {$query_mode_sql}){$id_filter_sql}";
             $count_stmt = $mysqli->prepare($count_sql);
             if (!$count_stmt) throw new Exception("Count statement preparation failed (MATCH): " . $mysqli->error);
             $count_stmt->bind_param('s', $final_search_query);
         }
 
-        if (!$count_stmt->execute()) {
-             throw new Exception("Count statement execution failed: " . $count_stmt->error);
+        if ($count_stmt !== null) {
+            if (!$count_stmt->execute()) {
+                 throw new Exception("Count statement execution failed: " . $count_stmt->error);
+            }
+            $count_stmt->bind_result($total_results);
+            $count_stmt->fetch();
+            $count_stmt->close();
         }
-        $count_stmt->bind_result($total_results);
-        $count_stmt->fetch();
-        $count_stmt->close();
 
     } catch (Exception $e) {
         $error_message = "Error counting results: " . $e->getMessage();
@@ -189,7 +310,25 @@ if ($query !== '' && $final_search_query !== '') {
     // --- Fetch Results for the Current Page ---
     if ($total_results > 0 && $error_message === null) {
         try {
-            if ($use_like_fallback) {
+            if ($indexed_page_ids !== null) {
+                $page_ids = array_map('intval', array_slice($indexed_page_ids, $offset, $results_per_page));
+                $select_sql = "
+                    SELECT
+                        d.id AS document_sql_id,
+                        d.document_id,
+                        d.original_url,
+                        p.page_number,
+                        p.text,
+                        1 AS relevance
+                    FROM pages p
+                    JOIN documents d ON p.document_id = d.id
+                    WHERE p.id IN (" . implode(',', $page_ids ?: [0]) . ")
+                    ORDER BY p.id ASC             -- Page order, like the LIKE scan
+                ";
+                $stmt = $mysqli->prepare($select_sql);
+                if (!$stmt) throw new Exception("Select statement preparation failed (trigram): " . $mysqli->error);
+
+            } elseif ($use_like_fallback) {
                  $select_sql = "
                     SELECT
                         d.id AS document_sql_id,  -- The database's internal ID for the document row
@@ -219,7 +358,7 @@ if ($query !== '' && $final_search_query !== '') {
                         MATCH(p.text) AGAINST(? IN NATURAL LANGUAGE MODE) AS relevance
                     FROM pages p
                     JOIN documents d ON p.document_id = d.id -- ADJUST JOIN condition if needed
-                    WHERE MATCH(p.text) AGAINST(? {$query_mode_sql})
+                    WHERE MATCH(p.text) AGAINST(? {$query_mode_sql}){$id_filter_sql}
                     ORDER BY relevance DESC, p.id ASC -- Order by relevance, then ID as tie-breaker
                     LIMIT ? OFFSET ?
                 ";